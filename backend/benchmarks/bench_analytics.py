@@ -0,0 +1,92 @@
+"""
+Benchmark the fused analytics engine against the original implementation.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_analytics --rows 1000000 --repeat 3
+
+Both implementations run on the same synthetic equipment frame, once on a
+pre-cleaned frame (the analytics engine alone, each side on its own cleaning)
+and once end-to-end including clean_dataframe, where the baseline uses its
+frozen copy of the original cleaning. The script checks that their outputs agree before reporting
+timings.
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from datasets.analytics import analyze_clean_dataframe, analyze_dataframe, clean_dataframe
+from benchmarks.legacy_analytics import legacy_analyze_clean_dataframe, legacy_analyze_dataframe, legacy_clean_dataframe
+
+TYPES = ['Pump', 'Valve', 'Reactor', 'Compressor', 'Heat Exchanger', 'Mixer', 'Sensor', 'Storage Tank']
+
+
+def make_frame(rows, nan_rate=0.01, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Equipment Name': [f'Unit-{i}' for i in range(rows)],
+        'Type': rng.choice(TYPES, size=rows),
+        'Flowrate': rng.gamma(2.0, 50.0, size=rows).round(2),
+        'Pressure': rng.normal(5.0, 1.5, size=rows).round(3),
+        'Temperature': rng.normal(110.0, 25.0, size=rows).round(1),
+    })
+    for col in ('Flowrate', 'Pressure', 'Temperature'):
+        df.loc[rng.random(rows) < nan_rate, col] = np.nan
+    return df
+
+
+def assert_close(a, b, path='analytics'):
+    if isinstance(a, dict):
+        assert isinstance(b, dict) and a.keys() == b.keys(), f'{path}: keys differ'
+        for k in a:
+            assert_close(a[k], b[k], f'{path}.{k}')
+    elif isinstance(a, list):
+        assert isinstance(b, list) and len(a) == len(b), f'{path}: lengths differ'
+        for i, (x, y) in enumerate(zip(a, b)):
+            assert_close(x, y, f'{path}[{i}]')
+    elif isinstance(a, float) and isinstance(b, float):
+        assert math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9), f'{path}: {a} != {b}'
+    else:
+        assert a == b, f'{path}: {a!r} != {b!r}'
+
+
+def best_of(fn, frame, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        df = frame.copy()
+        start = time.perf_counter()
+        result = fn(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--nan-rate', type=float, default=0.01)
+    args = parser.parse_args(argv)
+
+    frame = make_frame(args.rows, nan_rate=args.nan_rate)
+
+    print(f'rows={args.rows:,}  repeat={args.repeat}')
+    cases = [
+        ('engine (pre-cleaned)', legacy_analyze_clean_dataframe, legacy_clean_dataframe(frame.copy()),
+         analyze_clean_dataframe, clean_dataframe(frame.copy())),
+        ('end-to-end', legacy_analyze_dataframe, frame, analyze_dataframe, frame),
+    ]
+    for label, legacy_fn, legacy_data, fused_fn, fused_data in cases:
+        legacy_time, legacy = best_of(legacy_fn, legacy_data, args.repeat)
+        fused_time, fused = best_of(fused_fn, fused_data, args.repeat)
+        assert_close(legacy, fused)
+        print(f'{label}:')
+        print(f'  legacy: {legacy_time * 1000:9.1f} ms')
+        print(f'  fused:  {fused_time * 1000:9.1f} ms')
+        print(f'  speedup: {legacy_time / fused_time:8.2f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Synthetic equipment CSVs for benchmarks.
+
+    python -m benchmarks.datagen out.csv --rows 1000000 --types 8 --nan-rate 0.01 --junk-rate 0.001
+
+--extra-cols adds unrelated tag/reading columns, like a wide plant export,
+which ingest has to skip over.
+
+Files are written in chunks, so even 10M-row inputs are generated in
+bounded memory. The same arguments and seed always produce the same bytes.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+BASE_TYPES = ['Pump', 'Valve', 'Reactor', 'Compressor', 'Heat Exchanger', 'Mixer', 'Sensor', 'Storage Tank']
+JUNK_VALUES = np.array(['n/a', '--', 'ERR', '12,5', '?'], dtype=object)
+
+
+def type_names(cardinality):
+    names = BASE_TYPES[:cardinality]
+    return names + [f'Unit Type {i:03d}' for i in range(len(names), cardinality)]
+
+
+def make_chunk(start, rows, types=8, nan_rate=0.01, junk_rate=0.0, seed=0, extra_cols=0):
+    """Rows [start, start + rows) of the synthetic dataset as a raw (uncleaned) frame."""
+    rng = np.random.default_rng([seed, start])
+    df = pd.DataFrame({
+        'Equipment Name': [f'Unit-{i}' for i in range(start, start + rows)],
+        'Type': rng.choice(type_names(types), size=rows),
+        'Flowrate': rng.gamma(2.0, 50.0, size=rows).round(2),
+        'Pressure': rng.normal(5.0, 1.5, size=rows).round(3),
+        'Temperature': rng.normal(110.0, 25.0, size=rows).round(1),
+    })
+    for col in ('Flowrate', 'Pressure', 'Temperature'):
+        df.loc[rng.random(rows) < nan_rate, col] = np.nan
+        junk = rng.random(rows) < junk_rate
+        if junk.any():
+            # junk strings force the column to object dtype, like a messy plant export
+            df[col] = df[col].astype(object)
+            df.loc[junk, col] = rng.choice(JUNK_VALUES, size=int(junk.sum()))
+    for i in range(extra_cols):
+        # alternate text tags and numeric readings
+        if i % 2:
+            df[f'Reading {i:03d}'] = rng.normal(0.0, 1.0, size=rows).round(4)
+        else:
+            df[f'Tag {i:03d}'] = rng.choice(['A-1', 'B-22', 'C-333', 'OK', 'ALARM'], size=rows)
+    return df
+
+
+def generate_csv(path, rows, types=8, nan_rate=0.01, junk_rate=0.0, seed=0, chunk_rows=500_000, extra_cols=0):
+    """Write a synthetic equipment CSV with `rows` data rows to path."""
+    with open(path, 'w', newline='') as out:
+        for start in range(0, max(rows, 1), chunk_rows):
+            n = min(chunk_rows, rows - start)
+            chunk = make_chunk(start, n, types, nan_rate, junk_rate, seed, extra_cols)
+            chunk.to_csv(out, index=False, header=(start == 0))
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--types', type=int, default=8, help='distinct equipment types')
+    parser.add_argument('--nan-rate', type=float, default=0.01)
+    parser.add_argument('--junk-rate', type=float, default=0.001, help='fraction of non-numeric junk per numeric column')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--extra-cols', type=int, default=0, help='unrelated columns to pad each row with')
+    args = parser.parse_args(argv)
+    generate_csv(args.path, args.rows, args.types, args.nan_rate, args.junk_rate, args.seed,
+                 extra_cols=args.extra_cols)
+
+
+if __name__ == '__main__':
+    main()
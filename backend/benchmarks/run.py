@@ -0,0 +1,275 @@
+"""
+Benchmark suite for the dataset pipeline.
+
+Run from the backend directory:
+
+    python -m benchmarks.run --rows 10000 100000 1000000 --output bench.json
+    python -m benchmarks.run --rows 10000 100000 1000000 --compare bench.json --threshold 0.15
+
+Synthetic CSVs (see benchmarks.datagen) are generated once per parameter set
+into --workdir. Every (size, stage) case then runs in a fresh spawned
+process, so import costs, caches and peak RSS do not leak between cases.
+
+Stages:
+    read            validate_and_read_csv
+    clean           clean_dataframe
+    analyze         analyze_dataframe
+    charts          generate_charts
+    pdf             create_pdf_report (charts included)
+    ingest          process_csv_path end to end, with an empty media root each run
+    table_page      table view, first page (Django test client)
+    table_deep      table view, last page
+    table_sort      table view, last page sorted by temperature desc
+    table_filter    table view, filtered cursor page
+    table_columns   table view, 5000-row page with layout=columns
+    table_arrow     table view, 5000-row page as an Arrow IPC stream
+
+Each result records the best and median wall time over --repeat runs, and
+the peak RSS reached while the stage ran. Where Linux allows resetting the
+high-water mark, setup memory is excluded. With --compare, any stage whose
+best time grew by more than --threshold (and by at least --min-delta
+seconds) against the baseline JSON counts as a regression, and the exit
+status is 1.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.datagen import generate_csv, type_names
+from datasets.pipeline import peak_rss_mb, reset_peak_rss
+
+STAGES = [
+    'read', 'clean', 'analyze', 'charts', 'pdf', 'ingest',
+    'table_page', 'table_deep', 'table_sort', 'table_filter', 'table_columns', 'table_arrow',
+]
+DB_STAGES = {'ingest', 'table_page', 'table_deep', 'table_sort', 'table_filter', 'table_columns', 'table_arrow'}
+
+
+def _setup_django(media_root, with_db):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chemical_visualizer.settings')
+    import django
+    django.setup()
+    from django.test.utils import override_settings
+    override_settings(MEDIA_ROOT=media_root).enable()
+    if with_db:
+        from django.test.utils import setup_databases, setup_test_environment
+        setup_test_environment()
+        setup_databases(verbosity=0, interactive=False)
+
+
+def _table_stage(stage, ctx):
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+    from django.urls import reverse
+    from datasets.columnar import load_columnar, write_columnar
+    from datasets.models import Dataset
+
+    user = get_user_model().objects.create_user(username='bench', password='bench')
+    dataset = Dataset.objects.create(filename='bench.csv', uploaded_by=user)
+    write_columnar(ctx['clean'], dataset.id)
+    client = Client()
+    client.force_login(user)
+    url = reverse('dataset-table', args=[dataset.id])
+    last_page = max(1, -(-len(ctx['clean']) // 50))
+
+    if stage == 'table_page':
+        params = {'page': 1, 'page_size': 50}
+    elif stage == 'table_deep':
+        params = {'page': last_page, 'page_size': 50}
+    elif stage == 'table_sort':
+        # the sort index is a one-off per dataset; time the steady state
+        load_columnar(dataset.id).sort_order('temperature')
+        params = {'page': last_page, 'page_size': 50, 'sort': 'temperature', 'order': 'desc'}
+    elif stage == 'table_filter':
+        params = {'cursor': '', 'page_size': 50, 'type': type_names(ctx['types'])[0], 'flowrate__gte': 100}
+    elif stage == 'table_columns':
+        params = {'page': 1, 'page_size': 5000, 'layout': 'columns'}
+    else:
+        params = {'page': 1, 'page_size': 5000, 'format': 'arrow'}
+
+    def run(_):
+        resp = client.get(url, params)
+        assert resp.status_code == 200, resp.content[:200]
+    return (lambda: None), run
+
+
+def _prepare(stage, ctx):
+    """Return (before, timed): before() builds fresh inputs outside the timer, timed(inputs) is measured."""
+    from django.test.utils import override_settings
+    from django.utils import timezone
+    from datasets.analytics import analyze_dataframe, clean_dataframe
+    from datasets.models import Dataset
+    from datasets.utils import create_pdf_report, generate_charts, process_csv_path, validate_and_read_csv
+
+    if stage == 'read':
+        return (lambda: None), (lambda _: validate_and_read_csv(ctx['csv']))
+    if stage == 'ingest':
+        return (lambda: tempfile.mkdtemp(dir=ctx['media_root'])), (
+            lambda media: _in_settings(override_settings(MEDIA_ROOT=media), process_csv_path, ctx['csv'], 'bench.csv')
+        )
+
+    raw, _ = validate_and_read_csv(ctx['csv'])
+    if stage == 'clean':
+        return raw.copy, clean_dataframe
+    if stage == 'analyze':
+        return raw.copy, analyze_dataframe
+
+    ctx['clean'] = clean_dataframe(raw.copy())
+    if stage == 'charts':
+        return (lambda: tempfile.mkdtemp(dir=ctx['media_root'])), (lambda tmpdir: generate_charts(ctx['clean'], tmpdir))
+    if stage == 'pdf':
+        analytics = analyze_dataframe(raw)
+
+        def new_dataset():
+            return Dataset(id=uuid.uuid4(), filename='bench.csv', uploaded_at=timezone.now(),
+                           total_rows=len(ctx['clean']), analytics=analytics)
+        return new_dataset, (lambda dataset: create_pdf_report(dataset, ctx['clean']))
+    return _table_stage(stage, ctx)
+
+
+def _in_settings(override, fn, *args):
+    with override:
+        return fn(*args)
+
+
+def _run_case(spec):
+    """Entry point of the per-case worker process."""
+    media_root = tempfile.mkdtemp(prefix='bench-media-')
+    ctx = dict(spec, media_root=media_root)
+    _setup_django(media_root, spec['stage'] in DB_STAGES)
+
+    # silence the pipeline's progress prints
+    with contextlib.redirect_stdout(io.StringIO()):
+        before, timed = _prepare(spec['stage'], ctx)
+        timed(before())  # warm-up: imports, font caches, first-touch page faults
+        setup_rss = peak_rss_mb()
+        reset = reset_peak_rss()
+        timings = []
+        for _ in range(spec['repeat']):
+            inputs = before()
+            start = time.perf_counter()
+            timed(inputs)
+            timings.append(time.perf_counter() - start)
+        peak = peak_rss_mb()
+
+    return {
+        'stage': spec['stage'],
+        'rows': spec['rows'],
+        'best': min(timings),
+        'median': statistics.median(timings),
+        'runs': timings,
+        'peak_rss_mb': round(peak, 1),
+        'setup_rss_mb': round(setup_rss, 1),
+        'peak_rss_excludes_setup': reset,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _environment():
+    import numpy
+    import pandas
+    return {
+        'git': _git_revision(),
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'pandas': pandas.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def compare(results, baseline, threshold, min_delta):
+    """Print a comparison against a baseline run; returns the list of regressed (rows, stage) cases."""
+    base = {(r['rows'], r['stage']): r for r in baseline['results']}
+    regressions = []
+    print(f"\ncompared with {baseline['environment'].get('git') or 'baseline'} (threshold {threshold:.0%}):")
+    for r in results:
+        old = base.get((r['rows'], r['stage']))
+        if old is None:
+            continue
+        ratio = r['best'] / old['best'] if old['best'] else float('inf')
+        regressed = ratio > 1 + threshold and r['best'] - old['best'] > min_delta
+        if regressed:
+            regressions.append((r['rows'], r['stage']))
+        flag = 'REGRESSION' if regressed else ''
+        print(f"  {r['rows']:>10,} {r['stage']:<13} {old['best'] * 1000:10.1f} -> {r['best'] * 1000:10.1f} ms "
+              f"({ratio:5.2f}x) {flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--types', type=int, default=8, help='distinct equipment types')
+    parser.add_argument('--nan-rate', type=float, default=0.01)
+    parser.add_argument('--junk-rate', type=float, default=0.001)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--extra-cols', type=int, default=0, help='unrelated columns per row (wide plant exports)')
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'fossee-bench'),
+                        help='where generated CSVs are kept between runs')
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--compare', help='baseline JSON from an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.15, help='allowed slowdown before a regression (0.15 = 15%%)')
+    parser.add_argument('--min-delta', type=float, default=0.005, help='ignore slowdowns smaller than this many seconds')
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = []
+    print(f"{'rows':>10} {'stage':<13} {'best ms':>10} {'median ms':>10} {'peak MB':>9}")
+    for rows in args.rows:
+        csv_path = os.path.join(
+            args.workdir,
+            f'equipment-{rows}-t{args.types}-n{args.nan_rate}-j{args.junk_rate}-s{args.seed}-x{args.extra_cols}.csv',
+        )
+        if not os.path.exists(csv_path):
+            generate_csv(csv_path + '.tmp', rows, args.types, args.nan_rate, args.junk_rate, args.seed,
+                         extra_cols=args.extra_cols)
+            os.replace(csv_path + '.tmp', csv_path)
+
+        for stage in args.stages:
+            spec = {'stage': stage, 'rows': rows, 'csv': csv_path, 'types': args.types, 'repeat': args.repeat}
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                result = pool.submit(_run_case, spec).result()
+            results.append(result)
+            print(f"{rows:>10,} {stage:<13} {result['best'] * 1000:10.1f} {result['median'] * 1000:10.1f} "
+                  f"{result['peak_rss_mb']:9.1f}", flush=True)
+
+    report = {
+        'environment': _environment(),
+        'parameters': {k: v for k, v in vars(args).items() if k not in ('output', 'compare', 'workdir')},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold, args.min_delta):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -27,6 +27,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'datasets.middleware.JSONGZipMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -84,12 +85,20 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'datasets.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
 }
 
 # CORS for local dev
 CORS_ALLOW_ALL_ORIGINS = True
+# Let browser clients revalidate dataset reads (ETag / If-None-Match)
+from corsheaders.defaults import default_headers
+CORS_ALLOW_HEADERS = (*default_headers, 'if-none-match', 'if-modified-since')
+CORS_EXPOSE_HEADERS = ['ETag', 'Last-Modified']
 
 # Simple JWT settings
 from datetime import timedelta
@@ -109,3 +118,44 @@ CSRF_TRUSTED_ORIGINS = [
     "https://fosee-backend-dm3m.onrender.com",
     "https://fosee.vercel.app",
 ]
+
+# Dataset ingest: queue uploads for `manage.py run_jobs` instead of processing in the request.
+# Clients can also opt in per request with ?async=true.
+DATASETS_ASYNC_UPLOADS = os.environ.get('DATASETS_ASYNC_UPLOADS', '0') == '1'
+DATASETS_JOB_WORKERS = int(os.environ.get('DATASETS_JOB_WORKERS', '0')) or None
+# Running jobs touch updated_at this often; run_jobs requeues RUNNING jobs with no beat for the stale window.
+DATASETS_JOB_HEARTBEAT_SECONDS = float(os.environ.get('DATASETS_JOB_HEARTBEAT_SECONDS', '30'))
+DATASETS_JOB_STALE_SECONDS = float(os.environ.get('DATASETS_JOB_STALE_SECONDS', '300'))
+
+# Uploads at or above this size are ingested in bounded chunks instead of loaded whole.
+DATASETS_STREAMING_THRESHOLD_BYTES = int(os.environ.get('DATASETS_STREAMING_THRESHOLD_BYTES', str(256 * 1024 * 1024)))
+DATASETS_STREAMING_CHUNK_ROWS = int(os.environ.get('DATASETS_STREAMING_CHUNK_ROWS', '200000'))
+# Assumed expansion of a gzip/bz2/zstd upload when weighing it against the streaming threshold
+DATASETS_COMPRESSED_SIZE_FACTOR = int(os.environ.get('DATASETS_COMPRESSED_SIZE_FACTOR', '10'))
+# Max rows handed to the PDF chart renderer for streamed datasets
+DATASETS_REPORT_SAMPLE_ROWS = int(os.environ.get('DATASETS_REPORT_SAMPLE_ROWS', '200000'))
+
+# Processes used to render PDF report charts concurrently (0 = min(6, CPU count); 1 = in-process)
+DATASETS_CHART_WORKERS = int(os.environ.get('DATASETS_CHART_WORKERS', '0'))
+
+# Resumable chunked uploads: the largest file accepted, and how long an unfinished upload is kept after its last chunk
+DATASETS_UPLOAD_MAX_BYTES = int(os.environ.get('DATASETS_UPLOAD_MAX_BYTES', str(20 * 1024 ** 3)))
+DATASETS_UPLOAD_EXPIRY_HOURS = float(os.environ.get('DATASETS_UPLOAD_EXPIRY_HOURS', '24'))
+
+# Batch uploads: processes ingesting the files (0 = CPU count; 1 = in-process) and the most CSVs one batch may hold
+DATASETS_BATCH_WORKERS = int(os.environ.get('DATASETS_BATCH_WORKERS', '0'))
+DATASETS_BATCH_MAX_FILES = int(os.environ.get('DATASETS_BATCH_MAX_FILES', '1000'))
+
+# Content-addressed cache of analytics, charts and PDFs under MEDIA_ROOT/cache (LRU-evicted past this size)
+DATASETS_CACHE_MAX_BYTES = int(os.environ.get('DATASETS_CACHE_MAX_BYTES', str(2 * 1024 * 1024 * 1024)))
+
+# Datasets kept after each upload, newest first (0 = keep every upload)
+DATASETS_KEEP_LATEST = int(os.environ.get('DATASETS_KEEP_LATEST', '5'))
+
+# gzip level for stored CSVs (cleaned data and raw upload copies); 1 favours ingest speed, 9 disk space
+DATASETS_GZIP_LEVEL = int(os.environ.get('DATASETS_GZIP_LEVEL', '1'))
+
+# Hand report/clean-CSV downloads to the front proxy: '' (serve from Django), 'x-accel-redirect' (nginx) or
+# 'x-sendfile' (Apache/lighttpd). For nginx, DATASETS_SENDFILE_PREFIX is an `internal` location aliased to MEDIA_ROOT.
+DATASETS_SENDFILE = os.environ.get('DATASETS_SENDFILE', '').lower()
+DATASETS_SENDFILE_PREFIX = os.environ.get('DATASETS_SENDFILE_PREFIX', '/protected-media/')
@@ -1,6 +1,7 @@
 from django.contrib import admin
+from django.utils.html import format_html, format_html_join
 import os
-from .models import Dataset
+from .models import Dataset, Job, UploadSession
 
 @admin.register(Dataset)
 class DatasetAdmin(admin.ModelAdmin):
@@ -10,8 +11,9 @@ class DatasetAdmin(admin.ModelAdmin):
         'uploaded_at_display',
         'uploaded_by_display',
         'total_rows_display',
+        'ingest_time_display',
     )
-    readonly_fields = ('uploaded_at_display',)
+    readonly_fields = ('uploaded_at_display', 'ingest_timings_display')
 
     def filename_display(self, obj):
         # Prefer a 'filename' attribute, otherwise try FileField 'csv_file' or 'cleaned_csv'
@@ -54,3 +56,40 @@ class DatasetAdmin(admin.ModelAdmin):
         # as fallback, try counting a stored CSV (expensive) but safe to omit
         return '(n/a)'
     total_rows_display.short_description = 'Total Rows'
+
+    def ingest_time_display(self, obj):
+        timings = obj.ingest_timings
+        if not timings:
+            return '(n/a)'
+        return f"{timings['total_ms'] / 1000:.2f} s ({timings['mode']})"
+    ingest_time_display.short_description = 'Ingest Time'
+
+    def ingest_timings_display(self, obj):
+        # one row per pipeline stage: wall time and peak RSS
+        timings = obj.ingest_timings
+        if not timings:
+            return '(not recorded)'
+        rows = format_html_join(
+            '', '<tr><td>{}</td><td>{}</td><td>{}</td></tr>',
+            ((name, f"{stage['ms']:.1f} ms", f"{stage['peak_mb']:.1f} MB") for name, stage in timings['stages'].items()),
+        )
+        return format_html(
+            '<table><tr><th>Stage</th><th>Wall time</th><th>Peak RSS</th></tr>{}'
+            '<tr><td>total ({})</td><td>{}</td><td></td></tr></table>',
+            rows, timings['mode'], f"{timings['total_ms']:.1f} ms",
+        )
+    ingest_timings_display.short_description = 'Ingest Stages'
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'kind', 'status', 'stage', 'progress', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('dataset_id_reserved', 'created_at', 'updated_at', 'started_at', 'finished_at')
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'status', 'size', 'uploaded_by', 'created_at', 'updated_at')
+    list_filter = ('status',)
+    readonly_fields = ('dataset_id_reserved', 'created_at', 'updated_at')
@@ -3,6 +3,45 @@ import numpy as np
 
 NUMERIC_COLS = ['flowrate', 'pressure', 'temperature']
 REQUIRED_COLS = ['equipment name', 'type'] + NUMERIC_COLS
+# What astype(str) makes of a missing type (NaN, None, pd.NA); never counted as a type
+MISSING_TYPE_LABELS = frozenset({'nan', 'None', '<NA>'})
+
+
+def _stripped_text(series: pd.Series) -> pd.Series:
+    """series.astype(str).str.strip(); categoricals strip each distinct label once."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # code -1 (missing) picks the trailing 'nan', as astype(str) would give
+        labels = np.append(series.cat.categories.astype(str).str.strip().to_numpy(dtype=object), 'nan')
+        return pd.Series(labels[series.cat.codes.to_numpy()], index=series.index, name=series.name)
+    return series.astype(str).str.strip()
+
+
+def encode_text(series: pd.Series) -> pd.Series:
+    """
+    series.astype(str).str.strip() as a categorical: each distinct label is
+    stripped once and rows hold integer codes. Labels are ordered by first
+    appearance, so value_counts breaks ties as it would on the plain strings.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # code -1 (missing) picks the trailing 'nan', as astype(str) would give
+        labels = np.append(series.cat.categories.astype(str).str.strip().to_numpy(dtype=object), 'nan')
+        # stripping can make labels collide (' Pump' and 'Pump'): merge them
+        merged, uniques = pd.factorize(labels)
+        codes = merged[series.cat.codes.to_numpy()]
+        order = pd.unique(codes)
+        remap = np.empty(len(uniques), dtype=codes.dtype)
+        remap[order] = np.arange(len(order))
+        codes, uniques = remap[codes], uniques[order]
+    else:
+        codes, uniques = pd.factorize(series.astype(str).str.strip().to_numpy(dtype=object))
+    return pd.Series(pd.Categorical.from_codes(codes, categories=uniques), index=series.index, name=series.name)
+
+
+def row_values(series: pd.Series):
+    """Per-row values to index by position; a categorical is not expanded to one object per row."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.array
+    return series.to_numpy(dtype=object)
 
 
 def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
@@ -20,9 +59,9 @@ def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     for col in NUMERIC_COLS:
         df[col] = pd.to_numeric(df[col], errors='coerce')
 
-    # Trim whitespace on text
-    df['equipment name'] = df['equipment name'].astype(str).str.strip()
-    df['type'] = df['type'].astype(str).str.strip()
+    # Trim whitespace on text; types stay dictionary-encoded (few labels, many rows)
+    df['equipment name'] = _stripped_text(df['equipment name'])
+    df['type'] = encode_text(df['type'])
 
     # Option: drop rows that are completely empty
     df = df.dropna(how='all')
@@ -30,86 +69,150 @@ def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def _missing_values(df: pd.DataFrame):
-    return df.isna().sum().to_dict()
+def _numeric_block(df: pd.DataFrame) -> np.ndarray:
+    """Copy the numeric columns once into a float64 block, column-major so each column is contiguous."""
+    block = np.empty((len(df), len(NUMERIC_COLS)), dtype='float64', order='F')
+    for j, col in enumerate(NUMERIC_COLS):
+        block[:, j] = df[col].to_numpy(dtype='float64', na_value=np.nan)
+    return block
 
 
-def _basic_stats(df: pd.DataFrame):
-    stats = {}
-    for col in NUMERIC_COLS:
-        series = df[col].dropna()
-        stats[col] = {
-            'mean': float(series.mean()) if len(series) > 0 else None,
-            'median': float(series.median()) if len(series) > 0 else None,
-            'std': float(series.std()) if len(series) > 0 else None,
-            'min': float(series.min()) if len(series) > 0 else None,
-            'max': float(series.max()) if len(series) > 0 else None,
-            'count': int(series.count()),
-        }
-    return stats
+def _lerp_quantile(ordered: np.ndarray, q: float):
+    """Linear-interpolated quantile (numpy's default method) from an array partitioned at the needed ranks."""
+    virtual = q * (len(ordered) - 1)
+    lo = int(np.floor(virtual))
+    hi = min(lo + 1, len(ordered) - 1)
+    t = virtual - lo
+    a, b = ordered[lo], ordered[hi]
+    diff = b - a
+    return b - diff * (1 - t) if t >= 0.5 else a + diff * t
 
 
-def _type_distribution(df: pd.DataFrame):
-    return df['type'].value_counts(dropna=True).to_dict()
+def _column_stats(values: np.ndarray, k: int = 5):
+    """
+    Moments, quantiles and top/bottom-k thresholds of the non-missing values of
+    one column. A single multi-rank partition supplies min, max, the quartiles
+    and the k-th smallest/largest values.
+    """
+    n = len(values)
+    if n == 0:
+        return {'mean': None, 'median': None, 'std': None, 'min': None, 'max': None, 'count': 0}, None
+
+    ranks = {0, n - 1, min(k, n) - 1, max(n - k, 0)}
+    for q in (0.25, 0.5, 0.75):
+        virtual = q * (n - 1)
+        ranks.update((int(np.floor(virtual)), min(int(np.floor(virtual)) + 1, n - 1)))
+    ordered = np.partition(values, sorted(ranks))
+
+    mean = values.mean()
+    std = float(np.sqrt(np.dot(values - mean, values - mean) / (n - 1))) if n > 1 else None
+    stats = {
+        'mean': float(mean),
+        'median': float(_lerp_quantile(ordered, 0.5)),
+        'std': std,
+        'min': float(ordered[0]),
+        'max': float(ordered[n - 1]),
+        'count': int(n),
+    }
+    extras = {
+        'q1': _lerp_quantile(ordered, 0.25),
+        'q3': _lerp_quantile(ordered, 0.75),
+        'kth_low': ordered[min(k, n) - 1],
+        'kth_high': ordered[max(n - k, 0)],
+    }
+    return stats, extras
 
 
-def _top_values(df: pd.DataFrame, n=5):
+def _k_extreme(values: np.ndarray, rows: np.ndarray, n: int, threshold, largest: bool):
+    """
+    Positions (into values) of the n largest/smallest values, ties broken by
+    original row order like DataFrame.nlargest/nsmallest(keep='first').
+    threshold is the n-th largest/smallest value, so only a handful of
+    candidates need sorting.
+    """
+    if len(values) == 0:
+        return np.array([], dtype=np.intp)
+    if largest:
+        candidates = np.flatnonzero(values >= threshold)
+        keys = -values[candidates]
+    else:
+        candidates = np.flatnonzero(values <= threshold)
+        keys = values[candidates]
+    order = np.lexsort((rows[candidates], keys))
+    return candidates[order[:n]]
+
+
+def _correlation_matrix(block: np.ndarray, valid: np.ndarray):
+    """
+    Pairwise-complete Pearson correlation, matching DataFrame.corr(). All
+    pairs come from four k x k products over the masked, mean-shifted block
+    instead of re-filtering the data for every pair.
+    """
+    k = block.shape[1]
+    mask = valid.astype('float64')
+    counts = valid.sum(axis=0)
+    shift = np.where(counts > 0, np.nansum(block, axis=0) / np.maximum(counts, 1), 0.0)
+    z = np.where(valid, block - shift, 0.0)
+
+    n = mask.T @ mask                 # rows where both i and j are present
+    sx = z.T @ mask                   # sum of z_i over those rows
+    sxx = (z * z).T @ mask            # sum of z_i^2 over those rows
+    sxy = z.T @ z                     # sum of z_i * z_j
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sx.T / n
+        var = sxx - sx * sx / n
+        corr = cov / np.sqrt(var * var.T)
+    corr = np.clip(corr, -1.0, 1.0)
+    corr[(n < 2) | ~np.isfinite(corr)] = np.nan
+
     out = {}
-    for col in NUMERIC_COLS:
-        s = df[['equipment name', col]].dropna(subset=[col])
-        top = s.nlargest(n, col).to_dict(orient='records')
-        low = s.nsmallest(n, col).to_dict(orient='records')
-        out[col] = {'top': top, 'low': low}
+    for j, col in enumerate(NUMERIC_COLS):
+        out[col] = {row: (0.0 if np.isnan(corr[i, j]) else float(corr[i, j])) for i, row in enumerate(NUMERIC_COLS)}
     return out
 
 
-def _histogram(df: pd.DataFrame, col: str, bins=10):
-    series = df[col].dropna()
-    if series.empty:
+def _histogram(values: np.ndarray, bins=10):
+    if len(values) == 0:
         return {'bins': [], 'counts': []}
-    counts, edges = np.histogram(series, bins=bins)
-    bins_list = [float(e) for e in edges]
-    return {'bins': bins_list, 'counts': [int(c) for c in counts]}
+    counts, edges = np.histogram(values, bins=bins)
+    return {'bins': [float(e) for e in edges], 'counts': [int(c) for c in counts]}
 
 
-def _outliers_iqr(df: pd.DataFrame):
-    outliers = {}
-    for col in NUMERIC_COLS:
-        series = df[col].dropna()
-        if series.empty:
-            outliers[col] = {'count': 0, 'examples': []}
-            continue
-        q1 = series.quantile(0.25)
-        q3 = series.quantile(0.75)
-        iqr = q3 - q1
-        low = q1 - 1.5 * iqr
-        high = q3 + 1.5 * iqr
-        mask = (df[col] < low) | (df[col] > high)
-        examples = df.loc[mask, ['equipment name', 'type', col]].head(10).to_dict(orient='records')
-        outliers[col] = {'count': int(mask.sum()), 'examples': examples}
-    return outliers
+def known_types(counts):
+    """Type counts without the labels of missing types, as value_counts(dropna=True) on the raw column."""
+    return {t: c for t, c in counts.items() if t not in MISSING_TYPE_LABELS}
+
+
+def _type_distribution(df: pd.DataFrame):
+    # counted on the codes for a categorical; labels no row uses are left out
+    counts = df['type'].value_counts(dropna=True)
+    return known_types(counts[counts > 0].to_dict())
 
 
-def _correlation(df: pd.DataFrame):
-    corr = df[NUMERIC_COLS].corr()
-    return corr.fillna(0).to_dict()
+def generate_insights(df: pd.DataFrame, corr=None):
+    block = _numeric_block(df)
+    if corr is None:
+        corr = _correlation_matrix(block, ~np.isnan(block))
+    return _insights(block, corr)
 
 
-def generate_insights(df: pd.DataFrame):
+def _insights(block: np.ndarray, corr):
     insights = []
+    flow = block[:, NUMERIC_COLS.index('flowrate')]
+    temp = block[:, NUMERIC_COLS.index('temperature')]
+
     # zero flowrate
-    zero_flow = df[df['flowrate'] == 0]
-    if len(zero_flow) > 0:
-        insights.append(f"{len(zero_flow)} equipment items have zero flowrate")
+    zero_flow = int(np.count_nonzero(flow == 0))
+    if zero_flow > 0:
+        insights.append(f"{zero_flow} equipment items have zero flowrate")
 
     # high temp alert
-    high_temp = df[df['temperature'] > 100]
-    if len(high_temp) > 0:
-        insights.append(f"{len(high_temp)} rows have temperature > 100")
+    high_temp = int(np.count_nonzero(temp > 100))
+    if high_temp > 0:
+        insights.append(f"{high_temp} rows have temperature > 100")
 
-    # correlation hint
-    corr = _correlation(df)
-    # inspect flowrate vs temperature
+    # correlation hint: inspect flowrate vs temperature
     ft = corr.get('flowrate', {}).get('temperature', 0)
     if abs(ft) > 0.6:
         insights.append('Strong correlation detected between Flowrate and Temperature')
@@ -133,32 +236,76 @@ def replace_special_floats(obj):
 
 
 def analyze_dataframe(df: pd.DataFrame):
-    df_clean = clean_dataframe(df)
+    return analyze_clean_dataframe(clean_dataframe(df))
+
+
+def analyze_clean_dataframe(df_clean: pd.DataFrame):
+    """
+    Compute the analytics payload from an already-cleaned frame in one pass
+    over a single float64 block: each numeric column is masked for NaN once
+    and the compressed values feed the moments, quantiles, IQR outliers,
+    top/bottom-k and histogram.
+    """
     total = len(df_clean)
-    missing = _missing_values(df_clean)
-    stats = _basic_stats(df_clean)
-    type_dist = _type_distribution(df_clean)
-    outliers = _outliers_iqr(df_clean)
-    corr = _correlation(df_clean)
-    top_values = _top_values(df_clean, n=5)
-    histograms = {
-        'flowrate': _histogram(df_clean, 'flowrate'),
-        'pressure': _histogram(df_clean, 'pressure'),
-        'temperature': _histogram(df_clean, 'temperature'),
+
+    block = _numeric_block(df_clean)
+    valid = ~np.isnan(block)
+    names = row_values(df_clean['equipment name'])
+    types = row_values(df_clean['type'])
+
+    missing = {
+        'equipment name': int(df_clean['equipment name'].isna().sum()),
+        'type': int(df_clean['type'].isna().sum()),
     }
-    insights = generate_insights(df_clean)
+    stats = {}
+    outliers = {}
+    top_values = {}
+    histograms = {}
+
+    for j, col in enumerate(NUMERIC_COLS):
+        rows = np.flatnonzero(valid[:, j])
+        values = block[rows, j]
+        missing[col] = int(total - len(rows))
+
+        stats[col], extras = _column_stats(values)
+
+        if extras is None:
+            outliers[col] = {'count': 0, 'examples': []}
+        else:
+            iqr = extras['q3'] - extras['q1']
+            low = extras['q1'] - 1.5 * iqr
+            high = extras['q3'] + 1.5 * iqr
+            hits = rows[(values < low) | (values > high)]
+            outliers[col] = {
+                'count': int(len(hits)),
+                'examples': [
+                    {'equipment name': names[r], 'type': types[r], col: float(block[r, j])}
+                    for r in hits[:10]
+                ],
+            }
+
+        top = _k_extreme(values, rows, 5, extras and extras['kth_high'], largest=True)
+        low = _k_extreme(values, rows, 5, extras and extras['kth_low'], largest=False)
+        top_values[col] = {
+            'top': [{'equipment name': names[rows[i]], col: float(values[i])} for i in top],
+            'low': [{'equipment name': names[rows[i]], col: float(values[i])} for i in low],
+        }
+        histograms[col] = _histogram(values)
+
+    corr = _correlation_matrix(block, valid)
+    insights = _insights(block, corr)
 
     raw_analytics = {
         'row_count': int(total),
-        'missing_values': missing,
+        'missing_values': {c: missing[c] for c in REQUIRED_COLS},
         'stats': stats,
-        'type_distribution': type_dist,
+        'type_distribution': _type_distribution(df_clean),
         'outliers': outliers,
         'correlation_matrix': corr,
         'top_values': top_values,
         'histograms': histograms,
         'insights': insights,
     }
-    
+
     # Sanitize to ensure valid JSON for SQLite
     return replace_special_floats(raw_analytics)
@@ -0,0 +1,178 @@
+"""
+Batch ingest: many CSVs in one request, processed in parallel.
+
+A batch is a list of uploaded files. Each one is a CSV (plain, or gzip, bz2
+or zstd compressed) or an archive (.zip, .tar, .tar.gz/.tgz, .tar.bz2,
+.tar.xz). The CSV members of an archive are ingested one by one under their
+path in the archive. Other members are skipped, and so are directories and
+hidden or __MACOSX entries.
+
+Every CSV goes through the normal pipeline (utils.process_csv_path) in a
+pool of DATASETS_BATCH_WORKERS spawned processes. Each file is independent,
+so throughput scales with cores until the disk or the database saturates.
+Inside a worker, charts render in-process (one worker per core already), and
+old-dataset trimming and cache eviction run once after the whole batch
+rather than racing between workers. That trim never deletes the batch's own
+datasets, so every id returned stays fetchable even when the batch is larger
+than DATASETS_KEEP_LATEST; older datasets go instead.
+
+Results come back in input order: {'filename', 'id', 'summary',
+'coercion_errors'} for a created dataset, {'filename', 'error'} for a file
+that failed. One bad file never fails the rest.
+
+This module imports nothing from Django at module level, so spawned workers
+can unpickle its functions before django.setup().
+"""
+import logging
+import multiprocessing
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+# Compressed CSVs are ingested as they are; compression.py tells them apart by content
+CSV_SUFFIXES = ('.csv', '.csv.gz', '.csv.bz2', '.csv.zst')
+
+
+def _is_csv_member(name):
+    parts = name.replace('\\', '/').split('/')
+    if '__MACOSX' in parts or any(p.startswith('.') for p in parts if p):
+        return False
+    return name.lower().endswith(CSV_SUFFIXES)
+
+
+def _copy_to(src, dest):
+    with open(dest, 'wb') as out:
+        shutil.copyfileobj(src, out, 1024 * 1024)
+    return dest
+
+
+def _archive_members(f, name):
+    """(member name, file object) for each CSV in an archive upload."""
+    lower = name.lower()
+    if lower.endswith('.zip'):
+        with zipfile.ZipFile(f) as zf:
+            for info in zf.infolist():
+                if not info.is_dir() and _is_csv_member(info.filename):
+                    with zf.open(info) as member:
+                        yield info.filename, member
+    else:
+        with tarfile.open(fileobj=f, mode='r:*') as tf:
+            for info in tf:
+                # regular files only: links and devices never leave the archive
+                if info.isfile() and _is_csv_member(info.name):
+                    with tf.extractfile(info) as member:
+                        yield info.name, member
+
+
+def is_archive(name):
+    return name.lower().endswith(('.zip',) + TAR_SUFFIXES)
+
+
+def unpack_uploads(files, workdir, max_files):
+    """
+    Write each CSV of the uploads into workdir under a generated name.
+    Returns a list of (filename, path or None, error or None). Raises
+    ValueError when the batch holds more than max_files entries.
+    """
+    items = []
+
+    def add(filename, src=None, error=None):
+        if len(items) >= max_files:
+            raise ValueError(f'A batch can hold at most {max_files} CSV files.')
+        path = _copy_to(src, os.path.join(workdir, f'{len(items):06d}.csv')) if src is not None else None
+        items.append((filename, path, error))
+
+    for f in files:
+        name = getattr(f, 'name', None) or 'uploaded.csv'
+        if not is_archive(name):
+            add(name, f)
+            continue
+        found = 0
+        try:
+            for member, src in _archive_members(f, name):
+                add(f'{name}/{member}', src)
+                found += 1
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+            add(name, error=f'Unreadable archive: {e}')
+            continue
+        if not found:
+            add(name, error='No CSV files in archive.')
+    return items
+
+
+def _init_worker(overrides):
+    # Spawned processes start from a clean interpreter and need Django configured
+    import django
+    django.setup()
+    from django.conf import settings
+    for key, value in overrides.items():
+        setattr(settings, key, value)
+
+
+def _ingest_file(task):
+    filename, path, uploader_id = task
+    from django.contrib.auth import get_user_model
+
+    from .utils import process_csv_path
+
+    try:
+        uploader = get_user_model().objects.filter(pk=uploader_id).first() if uploader_id is not None else None
+        dataset, coercion_errors, summary, _ = process_csv_path(path, filename, uploader=uploader, cleanup=False)
+    except ValueError as e:
+        return {'filename': filename, 'error': str(e)}
+    except Exception as e:
+        logger.exception('Processing error while ingesting %s', filename)
+        return {'filename': filename, 'error': f'Processing error: {e}'}
+    return {'filename': filename, 'id': str(dataset.id), 'summary': summary, 'coercion_errors': coercion_errors}
+
+
+def batch_workers(count):
+    """Processes to use for count files: DATASETS_BATCH_WORKERS, or the CPU count when 0."""
+    from django.conf import settings
+    workers = settings.DATASETS_BATCH_WORKERS or os.cpu_count() or 1
+    return max(1, min(workers, count))
+
+
+def ingest_uploads(files, uploader=None):
+    """Ingest every CSV in the uploaded files; one result dict per CSV, in order."""
+    from django.conf import settings
+    from django.db import connections
+
+    from .utils import cleanup_media
+
+    workdir = tempfile.mkdtemp(prefix='datasets-batch-')
+    try:
+        items = unpack_uploads(files, workdir, settings.DATASETS_BATCH_MAX_FILES)
+        results = [None] * len(items)
+        tasks = []
+        for i, (filename, path, error) in enumerate(items):
+            if error:
+                results[i] = {'filename': filename, 'error': error}
+            else:
+                tasks.append((i, (filename, path, getattr(uploader, 'pk', None))))
+
+        workers = batch_workers(len(tasks))
+        if workers > 1:
+            # Children open their own DB connections
+            connections.close_all()
+            overrides = {'MEDIA_ROOT': settings.MEDIA_ROOT, 'DATASETS_CHART_WORKERS': 1}
+            # spawn: safe to use from threaded servers and never inherits DB connections
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_worker, initargs=(overrides,)) as pool:
+                done = pool.map(_ingest_file, [task for _, task in tasks])
+                for (i, _), result in zip(tasks, done):
+                    results[i] = result
+        else:
+            for i, task in tasks:
+                results[i] = _ingest_file(task)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    cleanup_media(keep=[r['id'] for r in results if 'id' in r])
+    return results
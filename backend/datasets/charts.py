@@ -0,0 +1,154 @@
+"""
+Chart rendering for PDF reports.
+
+Each chart is drawn with the object-oriented Figure/FigureCanvasAgg API (no
+pyplot global state), so charts can render concurrently in a process pool.
+This module deliberately imports nothing from Django so spawned workers stay
+cheap to start.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+DPI = 120
+RC = {'font.size': 10, 'figure.titlesize': 12, 'axes.titlesize': 11}
+
+_pool = None
+_pool_workers = 0
+
+
+def _new_figure(figsize):
+    # callers hold matplotlib.rc_context(RC) for the whole render
+    fig = Figure(figsize=figsize, dpi=DPI)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _save(fig, path):
+    fig.tight_layout()
+    fig.savefig(path, bbox_inches='tight')
+    return path
+
+
+def render_type_distribution(path, labels, counts):
+    with matplotlib.rc_context(RC):
+        fig = _new_figure((7, 5))
+        ax = fig.add_subplot()
+        ax.bar(range(len(labels)), counts, width=0.5, color='#6366f1', alpha=0.9, edgecolor='white')
+        ax.set_xticks(range(len(labels)))
+        ax.set_xticklabels(labels, rotation=45, ha='right')
+        ax.set_title('Equipment Inventory by Category', fontweight='bold', pad=20)
+        ax.set_xlabel('Equipment Type', labelpad=10)
+        ax.set_ylabel('Unit Count', labelpad=10)
+        ax.grid(axis='y', linestyle='--', alpha=0.3)
+        return _save(fig, path)
+
+
+def render_scatter(path, x, y):
+    with matplotlib.rc_context(RC):
+        fig = _new_figure((7, 5))
+        ax = fig.add_subplot()
+        ax.scatter(x, y, color='#fb7185', alpha=0.6, edgecolors='none', s=40)
+        ax.set_title('Operational Correlation: Flowrate vs. Temperature', fontweight='bold', pad=20)
+        ax.set_xlabel('Measured Temperature (°C)', labelpad=10)
+        ax.set_ylabel('Measured Flowrate (units/hr)', labelpad=10)
+        ax.grid(True, linestyle=':', alpha=0.4)
+        return _save(fig, path)
+
+
+def render_histogram(path, edges, counts, label, color):
+    with matplotlib.rc_context(RC):
+        fig = _new_figure((7, 4))
+        ax = fig.add_subplot()
+        # counts are binned by the caller, so only the bin totals cross the process boundary
+        ax.hist(edges[:-1], bins=edges, weights=counts, color=color, alpha=0.8, edgecolor='white')
+        ax.set_title(f'{label} Frequency Distribution', fontweight='bold', pad=15)
+        ax.set_xlabel(label, labelpad=8)
+        ax.set_ylabel('Frequency', labelpad=8)
+        ax.grid(axis='y', linestyle='--', alpha=0.2)
+        return _save(fig, path)
+
+
+def render_correlation(path, matrix, labels):
+    with matplotlib.rc_context(RC):
+        fig = _new_figure((6, 5))
+        ax = fig.add_subplot()
+        im = ax.imshow(matrix, cmap='RdBu_r', vmin=-1, vmax=1)
+        fig.colorbar(im, ax=ax, fraction=0.046, pad=0.04)
+
+        ax.set_xticks(range(len(labels)))
+        ax.set_xticklabels([c.title() for c in labels], rotation=0)
+        ax.set_yticks(range(len(labels)))
+        ax.set_yticklabels([c.title() for c in labels])
+
+        # Annotate values
+        for i in range(len(labels)):
+            for j in range(len(labels)):
+                val = matrix[i][j]
+                ax.text(j, i, f"{val:.2f}", ha='center', va='center',
+                        color='white' if abs(val) > 0.5 else 'black', fontweight='bold')
+
+        ax.set_title('Parameter Correlation Heatmap', fontweight='bold', pad=20)
+        return _save(fig, path)
+
+
+RENDERERS = {
+    'type_distribution': render_type_distribution,
+    'scatter': render_scatter,
+    'histogram': render_histogram,
+    'correlation': render_correlation,
+}
+
+
+def _render_task(task):
+    key, renderer, kwargs = task
+    try:
+        return key, RENDERERS[renderer](**kwargs), None
+    except Exception as e:
+        return key, None, str(e)
+
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        # spawn: safe to use from threaded servers and never inherits DB connections
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        _pool_workers = workers
+    return _pool
+
+
+def render_charts(tasks, workers=1):
+    """
+    Render (key, renderer, kwargs) tasks and return {key: png_path} for the
+    charts that succeeded. With workers > 1 the charts render concurrently in a
+    reusable process pool, so wall time tracks the slowest chart.
+    """
+    global _pool
+    results = None
+    if workers > 1 and len(tasks) > 1:
+        try:
+            results = list(_get_pool(workers).map(_render_task, tasks))
+        except (BrokenProcessPool, OSError) as e:
+            print(f"[PDF] Chart pool unavailable, rendering in-process: {e}")
+            _pool = None
+    if results is None:
+        results = [_render_task(t) for t in tasks]
+
+    images = {}
+    for key, path, error in results:
+        if error:
+            print(f"[PDF] Failure rendering chart {key}: {error}")
+        elif path and os.path.exists(path):
+            images[key] = path
+    return images
+
+
+def default_workers():
+    return max(1, min(6, os.cpu_count() or 1))
@@ -0,0 +1,611 @@
+import io
+import itertools
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from django.conf import settings
+
+from .analytics import NUMERIC_COLS, REQUIRED_COLS
+
+# Bump when the on-disk layout changes so stale caches get rebuilt
+COLUMNAR_VERSION = 3
+META_FILE = 'meta.json'
+# Query results computed from the columns (scatter samples, ...); dropped whenever rows change
+DERIVED_DIR = 'derived'
+# Rows looked at to decide whether a text column is worth dictionary-encoding
+DICTIONARY_SAMPLE_ROWS = 65536
+
+
+def columnar_dir(dataset_id):
+    # stored under media/columnar/<uuid>/
+    return os.path.join(settings.MEDIA_ROOT, 'columnar', str(dataset_id))
+
+
+def _column_file(col):
+    return col.replace(' ', '_') + '.npy'
+
+
+def _labels_file(col):
+    return col.replace(' ', '_') + '.labels.npy'
+
+
+def _offsets_file(col):
+    return col.replace(' ', '_') + '.offsets.npy'
+
+
+def _plain_text(series):
+    return series.fillna('').astype(str).tolist()
+
+
+def _text_buffers(values):
+    """(int64 offsets, uint8 UTF-8 bytes) for a list of strings; value i is bytes[offsets[i]:offsets[i + 1]]."""
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+def _encodes_well(series):
+    """
+    Whether a text column is worth dictionary-encoding. Categoricals (the
+    type) always are. Other columns are encoded when at most half the values
+    in the first DICTIONARY_SAMPLE_ROWS are distinct: mostly-unique names
+    would only gain a codes file on top of the same strings.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return True
+    sample = series.iloc[:DICTIONARY_SAMPLE_ROWS]
+    return sample.nunique(dropna=False) * 2 <= len(sample)
+
+
+def _dictionary_encode(series):
+    """(int32 codes, unicode labels) for a text column; missing values get the label ''."""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype('category')
+    codes = series.cat.codes.to_numpy().astype(np.int32)
+    labels = series.cat.categories.astype(str).to_numpy(dtype=object)
+    missing = codes < 0
+    if missing.any():
+        blank = np.flatnonzero(labels == '')
+        if len(blank):
+            codes[missing] = blank[0]
+        else:
+            codes[missing] = len(labels)
+            labels = np.append(labels, '')
+    return codes, np.array(labels.tolist(), dtype=str)
+
+
+def _save_labels(path, labels):
+    # written beside and swapped in: the file may be hard-linked from the report cache
+    tmp = f"{path}.tmp-{uuid.uuid4().hex}.npy"
+    np.save(tmp, labels, allow_pickle=False)
+    os.replace(tmp, path)
+
+
+def text_matches(values, op, value):
+    """Boolean mask of text values passing an 'eq', 'in' or 'contains' filter."""
+    if op == 'eq':
+        return values == value
+    if op == 'in':
+        return np.isin(values, value)
+    return np.char.find(np.char.lower(values), value) >= 0
+
+
+def _extend_npy(path, arr):
+    """Append arr to the .npy file at path, rewriting it if the header cannot hold the new length."""
+    unshare_file(path)
+    if not _append_npy(path, arr):
+        combined = np.concatenate([np.load(path, allow_pickle=False), arr])
+        tmp = f"{path}.tmp-{uuid.uuid4().hex}.npy"
+        np.save(tmp, combined, allow_pickle=False)
+        os.replace(tmp, path)
+
+
+def swap_into_place(tmp_target, target):
+    """
+    Move a finished cache directory to target. An existing copy is renamed
+    aside first and deleted afterwards, so a concurrent rebuild that lands
+    in between is set aside too rather than failing the rename.
+    """
+    while True:
+        if os.path.exists(target):
+            aside = f"{target}.old-{uuid.uuid4().hex}"
+            try:
+                os.replace(target, aside)
+            except FileNotFoundError:
+                continue
+            shutil.rmtree(aside, ignore_errors=True)
+        try:
+            os.replace(tmp_target, target)
+            return
+        except OSError:
+            # another writer swapped its copy in after our rename; set that aside too
+            if not os.path.exists(target):
+                raise
+
+
+def _source_signature(path):
+    if not path or not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime': st.st_mtime}
+
+
+def write_columnar(df: pd.DataFrame, dataset_id, source_path=None):
+    """
+    Persist a cleaned dataframe as one .npy file per column so readers can
+    memory-map just the slices they need instead of re-parsing the CSV.
+    Numeric columns are stored as float64 (NaN for missing). Text columns
+    that repeat their values (always the type) are dictionary-encoded:
+    int32 codes per row plus a <col>.labels.npy table of the distinct values,
+    so filters and sorts work on the codes. Others (mostly-unique names) are
+    stored as their UTF-8 bytes back to back plus a <col>.offsets.npy of
+    row boundaries, so one long value does not widen every row.
+    """
+    target = columnar_dir(dataset_id)
+    tmp_target = f"{target}.tmp-{uuid.uuid4().hex}"
+    os.makedirs(tmp_target, exist_ok=True)
+
+    try:
+        columns = {}
+        for col in REQUIRED_COLS:
+            fname = _column_file(col)
+            if col in NUMERIC_COLS:
+                arr = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+            elif _encodes_well(df[col]):
+                arr, labels = _dictionary_encode(df[col])
+                np.save(os.path.join(tmp_target, _labels_file(col)), labels, allow_pickle=False)
+            else:
+                offsets, arr = _text_buffers(_plain_text(df[col]))
+                np.save(os.path.join(tmp_target, _offsets_file(col)), offsets, allow_pickle=False)
+            np.save(os.path.join(tmp_target, fname), arr, allow_pickle=False)
+            columns[col] = {'file': fname, 'dtype': arr.dtype.str}
+            if col not in NUMERIC_COLS:
+                key, name = ('labels', _labels_file(col)) if arr.dtype.kind == 'i' else ('offsets', _offsets_file(col))
+                columns[col][key] = name
+
+        meta = {
+            'version': COLUMNAR_VERSION,
+            'rows': int(len(df)),
+            'columns': columns,
+            'source': _source_signature(source_path),
+        }
+        with open(os.path.join(tmp_target, META_FILE), 'w') as f:
+            json.dump(meta, f)
+
+        # Swap the finished directory into place so readers never see a partial cache
+        swap_into_place(tmp_target, target)
+    finally:
+        if os.path.exists(tmp_target):
+            shutil.rmtree(tmp_target, ignore_errors=True)
+    return target
+
+
+def write_columnar_chunks(chunks, dataset_id, rows, source_path=None):
+    """
+    Streaming variant of write_columnar: fill pre-sized memory-mapped .npy
+    files from an iterable of cleaned chunks, so the full frame never has to
+    be held in memory. rows must be known up front. Whether a text column is
+    encoded is decided on the first chunk; an encoded column's labels are
+    collected as they turn up and written at the end. Plain text columns
+    grow chunk by chunk.
+    """
+    target = columnar_dir(dataset_id)
+    tmp_target = f"{target}.tmp-{uuid.uuid4().hex}"
+    os.makedirs(tmp_target, exist_ok=True)
+
+    try:
+        chunks = iter(chunks)
+        first = next(chunks, None)
+        columns = {}
+        outputs = {}
+        # label -> code for each encoded text column, across all chunks
+        dictionaries = {}
+        # bytes written so far to each plain text column
+        text_sizes = {}
+        for col in REQUIRED_COLS:
+            fname = _column_file(col)
+            path = os.path.join(tmp_target, fname)
+            if col in NUMERIC_COLS or (first is not None and _encodes_well(first[col])):
+                dtype = np.dtype('float64' if col in NUMERIC_COLS else np.int32)
+                if rows:
+                    outputs[col] = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(rows,))
+                else:
+                    np.save(path, np.empty(0, dtype=dtype), allow_pickle=False)
+                columns[col] = {'file': fname, 'dtype': dtype.str}
+                if col not in NUMERIC_COLS:
+                    dictionaries[col] = {}
+                    columns[col]['labels'] = _labels_file(col)
+            else:
+                np.save(path, np.empty(0, dtype=np.uint8), allow_pickle=False)
+                np.save(os.path.join(tmp_target, _offsets_file(col)), np.zeros(1, dtype=np.int64), allow_pickle=False)
+                text_sizes[col] = 0
+                columns[col] = {'file': fname, 'dtype': np.dtype(np.uint8).str, 'offsets': _offsets_file(col)}
+
+        offset = 0
+        for chunk in itertools.chain([first] if first is not None else [], chunks):
+            n = len(chunk)
+            for col, out in outputs.items():
+                if col in NUMERIC_COLS:
+                    out[offset:offset + n] = pd.to_numeric(chunk[col], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+                elif col in dictionaries:
+                    codes, labels = _dictionary_encode(chunk[col])
+                    table = dictionaries[col]
+                    # chunk code -> dataset code
+                    remap = np.array([table.setdefault(label, len(table)) for label in labels.tolist()], dtype=np.int32)
+                    out[offset:offset + n] = remap[codes] if len(remap) else codes
+            for col in text_sizes:
+                offsets, data = _text_buffers(_plain_text(chunk[col]))
+                _extend_npy(os.path.join(tmp_target, columns[col]['file']), data)
+                _extend_npy(os.path.join(tmp_target, columns[col]['offsets']), offsets[1:] + text_sizes[col])
+                text_sizes[col] += len(data)
+            offset += n
+        if offset != rows:
+            raise ValueError(f'Columnar copy expected {rows} rows but received {offset}')
+        for out in outputs.values():
+            out.flush()
+        outputs.clear()
+        for col, table in dictionaries.items():
+            np.save(os.path.join(tmp_target, _labels_file(col)), np.array(list(table), dtype=str), allow_pickle=False)
+
+        meta = {
+            'version': COLUMNAR_VERSION,
+            'rows': int(rows),
+            'columns': columns,
+            'source': _source_signature(source_path),
+        }
+        with open(os.path.join(tmp_target, META_FILE), 'w') as f:
+            json.dump(meta, f)
+
+        swap_into_place(tmp_target, target)
+    finally:
+        if os.path.exists(tmp_target):
+            shutil.rmtree(tmp_target, ignore_errors=True)
+    return target
+
+
+def unshare_file(path):
+    """Give path its own inode if it is hard-linked (e.g. from the report cache) so it can be written in place."""
+    if os.path.exists(path) and os.stat(path).st_nlink > 1:
+        tmp = f"{path}.tmp-{uuid.uuid4().hex}"
+        shutil.copy2(path, tmp)
+        os.replace(tmp, path)
+
+
+def _append_npy(path, arr):
+    """
+    Append a 1-d array to a .npy file in place. numpy pads headers so the
+    length can grow without moving the data; returns False if this header
+    cannot hold the new shape.
+    """
+    with open(path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, fortran, dtype = read_header(f)
+        data_offset = f.tell()
+        header = io.BytesIO()
+        write_header = np.lib.format.write_array_header_1_0 if version == (1, 0) else np.lib.format.write_array_header_2_0
+        write_header(header, {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': fortran,
+                              'shape': (shape[0] + len(arr),)})
+        if len(header.getvalue()) != data_offset:
+            return False
+        f.seek(0, os.SEEK_END)
+        f.write(np.ascontiguousarray(arr, dtype=dtype).tobytes())
+        f.flush()
+        # rewrite the header last so concurrent readers only ever see complete rows
+        f.seek(0)
+        f.write(header.getvalue())
+    return True
+
+
+def append_columnar(dataset_id, df: pd.DataFrame, source_path=None):
+    """
+    Append cleaned rows to an existing columnar copy without rewriting it.
+    Each column file grows at the end (a plain text column's bytes and
+    offsets both do); an encoded column's labels file is rewritten only when
+    the rows bring new labels. Sort indexes, sorted values and derived
+    results are dropped and rebuilt on the next read that needs them.
+    """
+    frame = load_columnar(dataset_id)
+    if frame is None:
+        raise ValueError('Columnar copy missing; cannot append.')
+    meta = frame.meta
+    for col, info in meta['columns'].items():
+        path = os.path.join(frame.path, info['file'])
+        if col in NUMERIC_COLS:
+            _extend_npy(path, pd.to_numeric(df[col], errors='coerce').to_numpy(dtype='float64', na_value=np.nan))
+        elif 'labels' in info:
+            codes, labels = _dictionary_encode(df[col])
+            known = np.asarray(frame.column(col).labels)
+            remap = pd.Index(known).get_indexer(labels)
+            new = remap < 0
+            if new.any():
+                remap[new] = len(known) + np.arange(int(new.sum()))
+                _save_labels(os.path.join(frame.path, info['labels']), np.concatenate([known, labels[new]]))
+            _extend_npy(path, remap.astype(np.int32)[codes] if len(remap) else codes)
+        else:
+            offsets, data = _text_buffers(_plain_text(df[col]))
+            size = int(frame.column(col).offsets[-1])
+            # bytes first, then the offsets that make them visible
+            _extend_npy(path, data)
+            _extend_npy(os.path.join(frame.path, info['offsets']), offsets[1:] + size)
+        for suffix in ('.order.npy', '.sorted.npy'):
+            stale = path.replace('.npy', suffix)
+            if os.path.exists(stale):
+                os.remove(stale)
+    shutil.rmtree(os.path.join(frame.path, DERIVED_DIR), ignore_errors=True)
+
+    meta['rows'] = frame.rows + len(df)
+    meta['source'] = _source_signature(source_path)
+    meta_path = os.path.join(frame.path, META_FILE)
+    tmp = f"{meta_path}.tmp-{uuid.uuid4().hex}"
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, meta_path)
+    return load_columnar(dataset_id)
+
+
+class EncodedColumn:
+    """
+    A dictionary-encoded text column: memory-mapped int32 codes into a table
+    of distinct labels. Indexing decodes only the selected rows.
+    """
+
+    def __init__(self, codes, labels):
+        self.codes = codes
+        self.labels = labels
+        self._matches = {}
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def dtype(self):
+        return self.labels.dtype
+
+    def __getitem__(self, key):
+        return np.asarray(self.labels[np.asarray(self.codes[key])])
+
+    def matches(self, op, value):
+        """Boolean per label for a text filter ('eq', 'in' or 'contains'); index it with codes."""
+        key = (op, tuple(value) if isinstance(value, list) else value)
+        if key not in self._matches:
+            self._matches[key] = text_matches(np.asarray(self.labels), op, value)
+        return self._matches[key]
+
+    def sort_keys(self):
+        """Per-row integers that order like the labels themselves."""
+        rank = np.empty(len(self.labels), dtype=np.int64)
+        rank[np.argsort(self.labels, kind='stable')] = np.arange(len(self.labels))
+        return rank[self.codes]
+
+
+class TextColumn:
+    """
+    A variable-width text column: memory-mapped UTF-8 bytes of every value
+    back to back plus rows + 1 offsets into them. Indexing decodes only the
+    selected rows, as a numpy unicode array.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def dtype(self):
+        return np.dtype(str)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            start, end = self.offsets[key], self.offsets[key + 1]
+            return bytes(self.data[start:end]).decode('utf-8')
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                # arrow reads the two buffers as they are, without a per-row slice
+                bounds = np.ascontiguousarray(self.offsets[start:max(stop, start) + 1])
+                values = pa.LargeStringArray.from_buffers(len(bounds) - 1, pa.py_buffer(bounds), pa.py_buffer(self.data))
+                return values.to_numpy(zero_copy_only=False).astype(str)
+            key = np.arange(start, stop, step)
+        rows = np.asarray(key)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        if len(rows) == 0:
+            return np.empty(0, dtype=str)
+        lo, hi = int(rows.min()), int(rows.max()) + 1
+        if hi - lo <= 4 * len(rows):
+            # dense selections (filter scans, sorted pages of small frames) decode the span in one read
+            return self[lo:hi][rows - lo]
+        starts, ends = np.asarray(self.offsets[rows]), np.asarray(self.offsets[rows + 1])
+        values = [bytes(self.data[a:b]).decode('utf-8') for a, b in zip(starts.tolist(), ends.tolist())]
+        return np.array(values, dtype=str)
+
+    def sort_keys(self):
+        """Per-row values to argsort; the whole column decoded."""
+        return self[:]
+
+
+class ColumnarFrame:
+    """Read-only view over a columnar cache; columns are memory-mapped lazily."""
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self.rows = meta['rows']
+        self._arrays = {}
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def columns(self):
+        return list(self.meta['columns'].keys())
+
+    def column(self, col):
+        """
+        A column's memory-mapped values; a dictionary-encoded text column as
+        an EncodedColumn, a plain one as a TextColumn.
+        """
+        if col not in self._arrays:
+            info = self.meta['columns'][col]
+            values = np.load(os.path.join(self.path, info['file']), mmap_mode='r', allow_pickle=False)
+            if 'labels' in info:
+                labels = np.load(os.path.join(self.path, info['labels']), mmap_mode='r', allow_pickle=False)
+                values = EncodedColumn(values, labels)
+            elif 'offsets' in info:
+                offsets = np.load(os.path.join(self.path, info['offsets']), mmap_mode='r', allow_pickle=False)
+                values = TextColumn(offsets, values)
+            self._arrays[col] = values
+        return self._arrays[col]
+
+    def slice(self, start, end):
+        data = {col: np.asarray(self.column(col)[start:end]) for col in self.columns}
+        return pd.DataFrame(data, columns=self.columns)
+
+    def take(self, indices):
+        data = {col: np.asarray(self.column(col)[indices]) for col in self.columns}
+        return pd.DataFrame(data, columns=self.columns)
+
+    def to_frame(self):
+        return self.slice(0, self.rows)
+
+    def derived_path(self, name):
+        """Path for a result derived from this data; the directory is cleared on append."""
+        path = os.path.join(self.path, DERIVED_DIR)
+        os.makedirs(path, exist_ok=True)
+        return os.path.join(path, name)
+
+    def sort_order(self, col):
+        """
+        Stable ascending argsort of a column (missing values last), built on
+        first use and persisted next to the column so later sorted reads only
+        memory-map it.
+        """
+        info = self.meta['columns'][col]
+        path = os.path.join(self.path, info['file'].replace('.npy', '.order.npy'))
+        if not os.path.exists(path):
+            values = self.column(col)
+            if isinstance(values, (EncodedColumn, TextColumn)):
+                values = values.sort_keys()
+            order = np.argsort(values, kind='stable')
+            order = order.astype(np.int32 if self.rows < 2 ** 31 else np.int64)
+            tmp = f"{path}.tmp-{uuid.uuid4().hex}.npy"
+            np.save(tmp, order, allow_pickle=False)
+            os.replace(tmp, path)
+        return np.load(path, mmap_mode='r', allow_pickle=False)
+
+    def sorted_values(self, col):
+        """
+        Ascending non-missing values of a numeric column, persisted as
+        <col>.sorted.npy so histograms and quantiles can binary-search them.
+        """
+        info = self.meta['columns'][col]
+        path = os.path.join(self.path, info['file'].replace('.npy', '.sorted.npy'))
+        if not os.path.exists(path):
+            values = np.asarray(self.column(col))
+            values = np.sort(values[~np.isnan(values)])
+            tmp = f"{path}.tmp-{uuid.uuid4().hex}.npy"
+            np.save(tmp, values, allow_pickle=False)
+            os.replace(tmp, path)
+        return np.load(path, mmap_mode='r', allow_pickle=False)
+
+    def _missing_tail(self, col, order):
+        # NaNs sort last, so they form a suffix of the order; binary search for where it starts
+        values = self.column(col)
+        if values.dtype.kind != 'f':
+            return self.rows
+        lo, hi = 0, self.rows
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if np.isnan(values[order[mid]]):
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def sorted_positions(self, col, start, end, ascending=True):
+        """Row indices for positions [start, end) of the column's sort order."""
+        order = self.sort_order(col)
+        start, end = max(start, 0), min(end, self.rows)
+        if start >= end:
+            return np.empty(0, dtype=np.int64)
+        if ascending:
+            return np.asarray(order[start:end])
+        # Descending reads the present values back to front and keeps missing values last
+        present = self._missing_tail(col, order)
+        positions = np.arange(start, end)
+        mirrored = np.where(positions < present, present - 1 - positions, positions)
+        return np.asarray(order[mirrored])
+
+    def sorted_slice(self, col, start, end, ascending=True):
+        return self.take(self.sorted_positions(col, start, end, ascending=ascending))
+
+
+def presort_columns(dataset_id):
+    """Build the sorted numeric columns at ingest so the first histogram or quantile request is already cheap."""
+    frame = load_columnar(dataset_id)
+    if frame is not None:
+        for col in NUMERIC_COLS:
+            frame.sorted_values(col)
+    return frame
+
+
+def load_columnar(dataset_id, source_path=None):
+    """Return a ColumnarFrame for the dataset, or None if the cache is missing or stale."""
+    path = columnar_dir(dataset_id)
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != COLUMNAR_VERSION:
+        return None
+    if source_path is not None and meta.get('source') != _source_signature(source_path):
+        return None
+    return ColumnarFrame(path, meta)
+
+
+def open_columnar(dataset):
+    """
+    Load the columnar cache for a dataset, building it from the cleaned CSV
+    on first access (datasets uploaded before the cache existed).
+    """
+    source_path, cleaned = None, False
+    for field, is_clean in ((dataset.cleaned_csv, True), (dataset.csv_file, False)):
+        if field and os.path.exists(os.path.join(settings.MEDIA_ROOT, field.name)):
+            source_path, cleaned = os.path.join(settings.MEDIA_ROOT, field.name), is_clean
+            break
+
+    frame = load_columnar(dataset.id, source_path=source_path)
+    if frame is not None:
+        return frame
+
+    if source_path is None:
+        return None
+
+    from .analytics import clean_dataframe
+    from .parsing import clean_read_options, read_required_columns
+    # Text is read as text, exactly as at ingest; pandas decompresses the cleaned CSV by extension
+    if cleaned:
+        df = clean_dataframe(pd.read_csv(source_path, **clean_read_options()))
+    else:
+        df = clean_dataframe(read_required_columns(source_path))
+    write_columnar(df, dataset.id, source_path=source_path)
+    return load_columnar(dataset.id)
+
+
+def remove_columnar(dataset_id):
+    path = columnar_dir(dataset_id)
+    if os.path.exists(path):
+        shutil.rmtree(path, ignore_errors=True)
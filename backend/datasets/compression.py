@@ -0,0 +1,101 @@
+"""
+gzip storage for the CSVs kept under MEDIA_ROOT.
+
+The cleaned CSV (clean/<id>.csv.gz) and the copy of the raw upload
+(uploads/<id>.csv.gz) are written gzip-compressed at
+DATASETS_GZIP_LEVEL. The cleaned file is served as-is to clients that
+accept gzip, so downloads cost neither CPU nor recompression.
+
+Writers leave the filename and timestamp out of the gzip header, so the same
+data always produces the same bytes; the report cache keys on them. Appends
+add a new gzip member, and multi-member files are valid gzip that pandas,
+Python's gzip module, browsers and requests all read as one stream. Readers go
+by extension, so uncompressed files from older uploads keep working.
+
+Uploads may themselves be compressed with gzip, bz2 or zstd, whatever their
+name. sniff_compression tells them apart by magic bytes, and the parser
+decompresses while it reads, so the plain CSV never touches the disk. The
+original is kept as-is under the matching suffix (uploads/<id>.csv.bz2, ...)
+instead of being recompressed. zstd needs the zstandard package; it is in
+requirements.txt, and a server installed without it refuses zstd uploads
+with a 400 instead of failing to start.
+"""
+import contextlib
+import gzip
+import io
+import os
+import shutil
+import uuid
+
+from django.conf import settings
+from django.middleware.gzip import re_accepts_gzip
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - in requirements.txt; only zstd uploads need it
+    zstandard = None
+
+GZIP_SUFFIX = '.gz'
+# Leading bytes of each container pandas can decompress, and the suffix a raw upload keeps
+MAGIC_NUMBERS = ((b'\x1f\x8b', 'gzip'), (b'\x28\xb5\x2f\xfd', 'zstd'), (b'BZh', 'bz2'))
+RAW_SUFFIXES = {'gzip': GZIP_SUFFIX, 'bz2': '.bz2', 'zstd': '.zst'}
+
+
+def is_gzip(path):
+    return str(path).endswith(GZIP_SUFFIX)
+
+
+def sniff_compression(path):
+    """'gzip', 'bz2' or 'zstd' when the file at path is compressed (by its magic bytes), else None."""
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    for magic, method in MAGIC_NUMBERS:
+        # bz2 streams continue with the block size digit, which keeps a CSV starting 'BZh' plain
+        if head.startswith(magic) and (method != 'bz2' or head[3:4].isdigit()):
+            if method == 'zstd' and zstandard is None:
+                raise ValueError('zstd-compressed uploads need the zstandard package on the server.')
+            return method
+    return None
+
+
+def expanded_size(path):
+    """Likely size of the CSV once decompressed: compressed uploads count DATASETS_COMPRESSED_SIZE_FACTOR times."""
+    size = os.path.getsize(path)
+    return size * settings.DATASETS_COMPRESSED_SIZE_FACTOR if sniff_compression(path) else size
+
+
+@contextlib.contextmanager
+def _gzip_writer(raw, mode):
+    # No filename or timestamp in the header, so equal data always gives equal bytes
+    with gzip.GzipFile(filename='', mode=mode, fileobj=raw, compresslevel=settings.DATASETS_GZIP_LEVEL, mtime=0) as gz:
+        yield gz
+
+
+@contextlib.contextmanager
+def open_csv_text(path, mode='r'):
+    """Text handle for reading ('r'), writing ('w') or appending ('a') a CSV, compressed or not by extension."""
+    with open(path, mode + 'b') as raw:
+        if not is_gzip(path):
+            with io.TextIOWrapper(raw, encoding='utf-8', newline='') as text:
+                yield text
+            return
+        with (_gzip_writer(raw, mode + 'b') if mode != 'r' else gzip.GzipFile(fileobj=raw, mode='rb')) as gz:
+            with io.TextIOWrapper(gz, encoding='utf-8', newline='') as text:
+                yield text
+
+
+def compress_file(src_path, dest_path):
+    """Write a gzip copy of src_path to dest_path (atomically) and return dest_path."""
+    tmp = f'{dest_path}.tmp-{uuid.uuid4().hex}'
+    try:
+        with open(src_path, 'rb') as src, open(tmp, 'wb') as raw, _gzip_writer(raw, 'wb') as out:
+            shutil.copyfileobj(src, out, 1024 * 1024)
+        os.replace(tmp, dest_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return dest_path
+
+
+def accepts_gzip(request):
+    return bool(re_accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
@@ -0,0 +1,91 @@
+"""
+On-demand histograms and quantiles for numeric columns.
+
+Both read the column's sorted values, which are persisted next to the columnar
+copy at ingest (see ColumnarFrame.sorted_values). A histogram with any bin
+count and range takes one np.searchsorted over its bin edges, and a quantile
+takes two array lookups. Neither needs the CSV, so their cost is
+O(bins log n) however large the dataset.
+
+Results match np.histogram and np.quantile (linear interpolation) on the
+non-missing values.
+"""
+import numpy as np
+
+from .analytics import NUMERIC_COLS
+
+DEFAULT_BINS = 10
+MAX_BINS = 1000
+MAX_QUANTILES = 100
+
+
+def _column(params):
+    col = (params.get('col') or '').lower()
+    if col not in NUMERIC_COLS:
+        raise ValueError(f'col must be one of {", ".join(NUMERIC_COLS)}.')
+    return col
+
+
+def parse_histogram_params(params):
+    """(col, bins, range or None) from query parameters; raises ValueError for malformed ones."""
+    col = _column(params)
+    try:
+        bins = int(params.get('bins', DEFAULT_BINS))
+    except (TypeError, ValueError):
+        raise ValueError('bins must be an integer.')
+    if not 1 <= bins <= MAX_BINS:
+        raise ValueError(f'bins must be between 1 and {MAX_BINS}.')
+
+    value_range = None
+    if params.get('range'):
+        try:
+            lo, hi = (float(v) for v in params['range'].split(','))
+        except ValueError:
+            raise ValueError('range must be two numbers, e.g. range=0,100.')
+        if not (np.isfinite(lo) and np.isfinite(hi) and lo < hi):
+            raise ValueError('range must be finite with the lower bound first.')
+        value_range = (lo, hi)
+    return col, bins, value_range
+
+
+def parse_quantile_params(params):
+    """(col, [q, ...]) with every q in [0, 1]; raises ValueError for malformed ones."""
+    col = _column(params)
+    try:
+        qs = [float(q) for q in (params.get('q') or '0.25,0.5,0.75').split(',') if q.strip()]
+    except ValueError:
+        raise ValueError('q must be a comma-separated list of numbers.')
+    if not qs or len(qs) > MAX_QUANTILES or not all(0 <= q <= 1 for q in qs):
+        raise ValueError(f'q must hold 1 to {MAX_QUANTILES} values between 0 and 1.')
+    return col, qs
+
+
+def histogram(sorted_values, bins, value_range=None):
+    """{'bins': edges, 'counts': counts} like analytics histograms, from ascending non-missing values."""
+    n = len(sorted_values)
+    if value_range is None:
+        if not n:
+            return {'bins': [], 'counts': []}
+        lo, hi = float(sorted_values[0]), float(sorted_values[-1])
+        if lo == hi:
+            # same widening np.histogram applies to a constant column
+            lo, hi = lo - 0.5, hi + 0.5
+    else:
+        lo, hi = value_range
+    edges = np.linspace(lo, hi, bins + 1)
+    # np.histogram bins are half-open except the last, which includes its right edge
+    positions = np.searchsorted(sorted_values, edges, side='left')
+    positions[-1] = np.searchsorted(sorted_values, edges[-1], side='right')
+    return {'bins': edges.tolist(), 'counts': np.diff(positions).tolist()}
+
+
+def quantiles(sorted_values, qs):
+    """Linearly interpolated quantiles of ascending non-missing values; None for an empty column."""
+    n = len(sorted_values)
+    if not n:
+        return [None] * len(qs)
+    positions = np.asarray(qs) * (n - 1)
+    below = np.floor(positions).astype(np.int64)
+    above = np.minimum(below + 1, n - 1)
+    lo, hi = np.asarray(sorted_values[below]), np.asarray(sorted_values[above])
+    return (lo + (hi - lo) * (positions - below)).tolist()
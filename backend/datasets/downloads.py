@@ -0,0 +1,136 @@
+"""
+File downloads (PDF reports, cleaned CSVs) with byte ranges and optional
+proxy offload.
+
+Single byte ranges follow RFC 7233: `Range: bytes=a-b`, `bytes=a-` and
+`bytes=-n` get a 206 with Content-Range. An unsatisfiable range gets a 416.
+If-Range is honoured against the dataset's ETag or Last-Modified, so a
+resumed download restarts from zero if the data changed in between. A
+multi-range request is answered with the whole file, which the RFC allows.
+The range covers the bytes as sent: for a CSV stored gzip-compressed and
+served with Content-Encoding: gzip, those are the compressed bytes.
+
+When DATASETS_SENDFILE is set, the view only authorises the request. The
+front proxy then streams the file itself and handles ranges, so no Python
+worker is held for the transfer:
+
+    x-accel-redirect  nginx; X-Accel-Redirect is DATASETS_SENDFILE_PREFIX plus
+                      the path under MEDIA_ROOT (an `internal` location
+                      aliased to MEDIA_ROOT)
+    x-sendfile        Apache mod_xsendfile / lighttpd; X-Sendfile is the
+                      absolute path
+"""
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.http import parse_etags, parse_http_date_safe, quote_etag
+
+from .http_cache import dataset_etag, dataset_last_modified
+
+SENDFILE_MODES = ('x-accel-redirect', 'x-sendfile')
+
+
+class _FileSpan:
+    """Read-only view of length bytes of an open file from its current position."""
+
+    def __init__(self, f, length):
+        self._file = f
+        self._remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single `bytes=` range of a size-byte file, or
+    None to send the whole file (no header, malformed, or several ranges).
+    Raises ValueError when the range cannot be satisfied.
+    """
+    unit, _, spec = (header or '').partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, sep, last = spec.strip().partition('-')
+    if not sep or not (first or last):
+        return None
+    try:
+        first, last = (int(v) if v else None for v in (first, last))
+    except ValueError:
+        return None
+    if not size:
+        raise ValueError('empty file')
+    if first is None:
+        # suffix range: the final `last` bytes
+        if last == 0:
+            raise ValueError('empty suffix range')
+        return max(size - last, 0), size - 1
+    if last is not None and last < first:
+        return None
+    if first >= size:
+        raise ValueError('range starts past the end of the file')
+    return first, size - 1 if last is None else min(last, size - 1)
+
+
+def _if_range_matches(request, pk):
+    value = request.META.get('HTTP_IF_RANGE')
+    if not value:
+        return True
+    if value.startswith(('"', 'W/')):
+        etag = dataset_etag(request, pk=pk)
+        # If-Range needs a strong match
+        return etag is not None and not value.startswith('W/') and quote_etag(etag) in parse_etags(value)
+    since = parse_http_date_safe(value)
+    modified = dataset_last_modified(request, pk=pk)
+    return since is not None and modified is not None and int(modified.timestamp()) == since
+
+
+def _offload(path, content_type):
+    response = HttpResponse(content_type=content_type)
+    if settings.DATASETS_SENDFILE == 'x-sendfile':
+        response['X-Sendfile'] = os.path.abspath(path)
+    else:
+        relative = os.path.relpath(path, settings.MEDIA_ROOT).replace('\\', '/')
+        response['X-Accel-Redirect'] = settings.DATASETS_SENDFILE_PREFIX.rstrip('/') + '/' + quote(relative)
+    return response
+
+
+def serve_file(request, pk, path, content_type, content_encoding=None):
+    """
+    Response for a stored file of dataset pk, sent unchanged (content_encoding
+    names its coding, if any), honouring Range or handing off to the proxy.
+    The caller adds Content-Disposition.
+    """
+    if settings.DATASETS_SENDFILE in SENDFILE_MODES:
+        response = _offload(path, content_type)
+    else:
+        size = os.path.getsize(path)
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size) if _if_range_matches(request, pk) else None
+        except ValueError:
+            response = HttpResponse(status=416, content_type=content_type)
+            response['Content-Range'] = f'bytes */{size}'
+            response['Accept-Ranges'] = 'bytes'
+            return response
+
+        f = open(path, 'rb')
+        if byte_range is None:
+            response = FileResponse(f, content_type=content_type)
+        else:
+            start, end = byte_range
+            f.seek(start)
+            response = FileResponse(_FileSpan(f, end - start + 1), status=206, content_type=content_type)
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    if content_encoding:
+        response['Content-Encoding'] = content_encoding
+    return response
@@ -0,0 +1,67 @@
+"""
+Conditional GET for the per-dataset read endpoints.
+
+A dataset only changes when rows are appended, which bumps Dataset.revision
+and sets modified_at. Every read response therefore gets a strong ETag built
+from the dataset id, its revision, the request path and query, the
+negotiated media type and whether gzip is accepted. It also gets a
+Last-Modified date and `Cache-Control: private, no-cache`. Clients keep the
+body, revalidate with If-None-Match or If-Modified-Since, and receive a
+bodiless 304 until the data changes. The check runs after DRF
+authentication, so anonymous requests still get 401 rather than 304.
+"""
+import hashlib
+from functools import wraps
+
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .compression import accepts_gzip
+from .models import Dataset
+from .report_cache import REPORT_TEMPLATE_VERSION
+
+# Bump when a read endpoint's response format changes so clients drop their copies
+REPRESENTATION_VERSION = 1
+
+
+def _dataset_version(request, pk):
+    # etag and last-modified are both asked for; look the dataset up once per request
+    cached = getattr(request, '_dataset_version', None)
+    if cached is None or cached[0] != pk:
+        row = Dataset.objects.filter(pk=pk).values_list('revision', 'uploaded_at', 'modified_at').first()
+        cached = (pk, row)
+        request._dataset_version = cached
+    return cached[1]
+
+
+def dataset_etag(request, *args, pk=None, **kwargs):
+    row = _dataset_version(request, pk)
+    if row is None:
+        return None
+    query = sorted((k, v) for k, values in request.GET.lists() for v in values)
+    raw = repr((
+        str(pk), row[0], request.path, query, getattr(request, 'accepted_media_type', None), accepts_gzip(request),
+        REPRESENTATION_VERSION, REPORT_TEMPLATE_VERSION,
+    ))
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def dataset_last_modified(request, *args, pk=None, **kwargs):
+    row = _dataset_version(request, pk)
+    if row is None:
+        return None
+    return row[2] or row[1]
+
+
+def conditional_dataset_get(method):
+    """Decorate an APIView.get(self, request, pk) with ETag/Last-Modified handling and revalidation hints."""
+    guarded = method_decorator(condition(etag_func=dataset_etag, last_modified_func=dataset_last_modified))(method)
+
+    @wraps(method)
+    def get(self, request, *args, **kwargs):
+        response = guarded(self, request, *args, **kwargs)
+        if response.status_code in (200, 206, 304):
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return get
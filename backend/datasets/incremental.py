@@ -0,0 +1,197 @@
+"""
+Incremental appends to an existing dataset.
+
+Alongside Dataset.analytics every dataset keeps the mergeable state it was
+derived from in media/state/<id>.json: counts, moments, co-moments,
+histogram bins, quantile sketches and top-k candidates. An append cleans only
+the new rows and folds them into that state. It then extends the cleaned CSV
+and the columnar copy in place and republishes the analytics, so its cost
+tracks the number of new rows rather than the size of the dataset.
+
+Appends to one dataset are serialized by an exclusive lock on
+media/state/<id>.lock, held across the whole read-modify-write; the database
+row lock alone does nothing on SQLite and cannot cover the files. The new
+rows and state are written to temp files first. The rows are then added to
+the cleaned CSV, the columnar copy extended, the Dataset saved and the state
+file replaced. If any of that fails, the cleaned CSV is truncated back to its
+old length and the columnar copy dropped (it is rebuilt from the CSV on next
+read), so files and row never disagree.
+
+After an append, medians, quartile-based outlier bounds and re-binned
+histograms come from the quantile sketch. They stay exact while a column
+holds fewer values than the sketch capacity; see streaming.py for the
+tolerances beyond that.
+"""
+import json
+import os
+import shutil
+import uuid
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import NUMERIC_COLS, clean_dataframe
+from .columnar import append_columnar, open_columnar, remove_columnar, unshare_file
+from .compression import GZIP_SUFFIX, is_gzip, open_csv_text
+from .locks import file_lock
+from .models import Dataset
+from .streaming import AnalyticsAccumulator, iter_columnar_slices
+
+
+def state_path(dataset_id):
+    return os.path.join(settings.MEDIA_ROOT, 'state', f'{dataset_id}.json')
+
+
+def lock_path(dataset_id):
+    return os.path.join(settings.MEDIA_ROOT, 'state', f'{dataset_id}.lock')
+
+
+def dataset_lock(dataset_id):
+    """Exclusive lock on a dataset's files, across threads and processes."""
+    return file_lock(lock_path(dataset_id))
+
+
+def _stage_state(dataset_id, state):
+    path = state_path(dataset_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.tmp-{uuid.uuid4().hex}'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    return tmp
+
+
+def _point_at_state(dataset):
+    dataset.analytics_state.name = os.path.relpath(state_path(dataset.id), settings.MEDIA_ROOT).replace('\\', '/')
+
+
+def write_state(dataset, state):
+    """Atomically persist accumulator state for a dataset and point the model at it."""
+    path = state_path(dataset.id)
+    os.replace(_stage_state(dataset.id, state), path)
+    _point_at_state(dataset)
+    return path
+
+
+def state_from_frame(df_clean, analytics):
+    """State for an in-memory ingest; histograms and outliers are taken from the exact analytics."""
+    acc = AnalyticsAccumulator()
+    acc.update(df_clean)
+    acc.histograms = analytics.get('histograms')
+    acc.outliers = analytics.get('outliers')
+    return acc.to_state()
+
+
+def load_state(dataset, frame):
+    """
+    Accumulator for a dataset, rebuilt from the columnar copy when the state
+    file is missing (datasets ingested before appends existed) or out of step
+    with the data.
+    """
+    if dataset.analytics_state:
+        path = os.path.join(settings.MEDIA_ROOT, dataset.analytics_state.name)
+        try:
+            with open(path) as f:
+                acc = AnalyticsAccumulator.from_state(json.load(f))
+            if acc.rows == len(frame):
+                return acc
+        except (OSError, ValueError, KeyError):
+            pass
+
+    acc = AnalyticsAccumulator()
+    for start in range(0, len(frame), settings.DATASETS_STREAMING_CHUNK_ROWS):
+        acc.update(frame.slice(start, start + settings.DATASETS_STREAMING_CHUNK_ROWS))
+    acc.second_pass(iter_columnar_slices(frame, settings.DATASETS_STREAMING_CHUNK_ROWS))
+    return acc
+
+
+def read_rows(infile=None, rows=None):
+    """
+    New rows from an uploaded CSV or a list of dicts, with canonical column
+    names. A CSV is parsed as uploads are (see parsing.py): only the
+    required columns, with names and types as text.
+    """
+    from .parsing import canonical_column_map, typed_read_options
+
+    if infile is None:
+        df = pd.DataFrame.from_records(rows or [])
+        return df.rename(columns=canonical_column_map(df.columns))
+    try:
+        header = pd.read_csv(infile, nrows=0).columns
+        infile.seek(0)
+        col_map = canonical_column_map(header)
+        df = pd.read_csv(infile, low_memory=False, **typed_read_options(col_map))
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise ValueError(f'Error reading CSV: {e}')
+    return df.rename(columns=col_map)
+
+
+def _stage_rows(clean_path, clean):
+    """The rows as a temp file to concatenate onto clean_path: a gzip member for a gzip file."""
+    tmp = f'{clean_path}.tmp-{uuid.uuid4().hex}' + (GZIP_SUFFIX if is_gzip(clean_path) else '')
+    with open_csv_text(tmp, 'w') as out:
+        clean.to_csv(out, index=False, header=False)
+    return tmp
+
+
+def append_rows(dataset, df):
+    """
+    Append raw rows (canonical column names) to a dataset. Returns
+    (dataset, rows appended after cleaning, coercion errors, analytics).
+    """
+    coercion_errors = {col: int(pd.to_numeric(df[col], errors='coerce').isna().sum()) for col in NUMERIC_COLS}
+    clean = clean_dataframe(df)
+
+    # The file lock serializes appends to this dataset on every backend; the transaction rolls back the row
+    with dataset_lock(dataset.pk), transaction.atomic():
+        dataset = Dataset.objects.select_for_update().get(pk=dataset.pk)
+        frame = open_columnar(dataset)
+        if frame is None or not dataset.cleaned_csv:
+            raise ValueError('Dataset files are missing on the server; cannot append.')
+        acc = load_state(dataset, frame)
+        acc.append(clean)
+        analytics = acc.to_analytics()
+
+        clean_path = os.path.join(settings.MEDIA_ROOT, dataset.cleaned_csv.name)
+        staged = [_stage_rows(clean_path, clean), _stage_state(dataset.id, acc.to_state())]
+        unshare_file(clean_path)
+        clean_size = os.path.getsize(clean_path)
+        try:
+            # a gzip file grows by one more member
+            with open(clean_path, 'ab') as out, open(staged[0], 'rb') as rows:
+                shutil.copyfileobj(rows, out, 1024 * 1024)
+            append_columnar(dataset.id, clean, source_path=clean_path)
+
+            _point_at_state(dataset)
+            dataset.analytics = analytics
+            # rows cleaning kept, as the state and the columnar copy count them
+            dataset.total_rows = (dataset.total_rows or 0) + len(clean)
+            dataset.avg_flowrate, dataset.avg_pressure, dataset.avg_temperature = (
+                acc.columns[col].mean if acc.columns[col].count else None for col in NUMERIC_COLS
+            )
+            dataset.type_distribution = analytics['type_distribution']
+            # New ETags for every read endpoint; clients holding the old ones refetch
+            dataset.revision += 1
+            dataset.modified_at = timezone.now()
+            # The data no longer matches the cached artifacts, and the PDF is rebuilt on next download
+            dataset.content_hash = None
+            pdf_name = dataset.summary_pdf.name if dataset.summary_pdf else None
+            dataset.summary_pdf = None
+            dataset.save()
+            os.replace(staged[1], state_path(dataset.id))
+        except Exception:
+            with open(clean_path, 'r+b') as f:
+                f.truncate(clean_size)
+            remove_columnar(dataset.id)
+            raise
+        finally:
+            for tmp in staged:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+    if pdf_name:
+        pdf_path = os.path.join(settings.MEDIA_ROOT, pdf_name)
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
+    return dataset, len(clean), coercion_errors, analytics
@@ -0,0 +1,175 @@
+"""
+Background ingest jobs.
+
+Uploads can be queued as Job rows in the regular database (SQLite by default),
+so no external broker is needed. `python manage.py run_jobs` starts a pool of
+worker processes that claim queued jobs and run the ingest pipeline.
+
+Workers ingest with cleanup off and trim old datasets and evict the report
+cache after each job through cleanup_media, which runs in one process at a
+time and never trims the dataset the job just created.
+
+While a job runs, a heartbeat thread touches its updated_at every
+DATASETS_JOB_HEARTBEAT_SECONDS, so requeue_stale_jobs only picks up jobs
+whose worker stopped beating, not jobs that are merely slow.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .models import Job
+from .utils import cleanup_media, ensure_media_dirs, process_csv_path
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_upload(uploaded_file, uploader=None):
+    """Persist the raw upload in its final location and queue it for processing."""
+    uploads_dir, _ = ensure_media_dirs()
+    job = Job(
+        kind=Job.KIND_UPLOAD,
+        filename=getattr(uploaded_file, 'name', 'uploaded.csv'),
+        uploaded_by=uploader,
+    )
+    dest = os.path.join(uploads_dir, f"{job.dataset_id_reserved}.csv")
+    with open(dest, 'wb') as out:
+        for chunk in uploaded_file.chunks():
+            out.write(chunk)
+    job.source_file.name = os.path.relpath(dest, settings.MEDIA_ROOT).replace('\\', '/')
+    job.save()
+    return job
+
+
+def enqueue_path(dest, filename, dataset_id, uploader=None):
+    """Queue a raw upload that is already in its final location, media/uploads/<dataset_id>.csv."""
+    job = Job(kind=Job.KIND_UPLOAD, filename=filename, uploaded_by=uploader, dataset_id_reserved=dataset_id)
+    job.source_file.name = os.path.relpath(dest, settings.MEDIA_ROOT).replace('\\', '/')
+    job.save()
+    return job
+
+
+def claim_next_job():
+    """Atomically move the oldest queued job to running; returns None when idle."""
+    while True:
+        job = Job.objects.filter(status=Job.STATUS_QUEUED).order_by('created_at').first()
+        if job is None:
+            return None
+        # Conditional update so two workers can never claim the same row
+        claimed = Job.objects.filter(pk=job.pk, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING, stage='starting', started_at=timezone.now(), updated_at=timezone.now()
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def _update_progress(job, stage, percent):
+    Job.objects.filter(pk=job.pk).update(stage=stage, progress=percent, updated_at=timezone.now())
+
+
+def _touch(job):
+    Job.objects.filter(pk=job.pk, status=Job.STATUS_RUNNING).update(updated_at=timezone.now())
+
+
+@contextmanager
+def _heartbeat(job, interval=None):
+    """Touch the job's updated_at every interval seconds until the block exits."""
+    interval = interval or settings.DATASETS_JOB_HEARTBEAT_SECONDS
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(interval):
+                try:
+                    _touch(job)
+                except Exception:
+                    logger.exception('Heartbeat for job %s failed', job.id)
+        finally:
+            # The thread has its own connection; don't leak it
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'job-{job.id}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_job(job):
+    """Execute a claimed job, recording stage/progress and the final outcome."""
+    src_path = os.path.join(settings.MEDIA_ROOT, job.source_file.name)
+    try:
+        with _heartbeat(job):
+                dataset, coercion_errors, summary, _ = process_csv_path(
+                src_path,
+                job.filename,
+                uploader=job.uploaded_by,
+                dataset_id=job.dataset_id_reserved,
+                progress=lambda stage, percent: _update_progress(job, stage, percent),
+                cleanup=False,
+            )
+    except Exception as e:
+        logger.exception('Job %s failed', job.id)
+        # The dataset was never created, so the raw file would be orphaned
+        try:
+            os.remove(src_path)
+        except OSError:
+            pass
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.STATUS_FAILED, stage='failed', error=str(e),
+            finished_at=timezone.now(), updated_at=timezone.now(),
+        )
+        return False
+
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.STATUS_DONE, stage='done', progress=100, dataset=dataset,
+        result={'id': str(dataset.id), 'summary': summary, 'coercion_errors': coercion_errors},
+        finished_at=timezone.now(), updated_at=timezone.now(),
+    )
+    return True
+
+
+def requeue_stale_jobs(max_age=None):
+    """Put back jobs whose worker died mid-run (no heartbeat for max_age).
+
+    max_age defaults to DATASETS_JOB_STALE_SECONDS, several heartbeat intervals,
+    so a running job is never requeued however long it takes.
+    """
+    if max_age is None:
+        max_age = timedelta(seconds=settings.DATASETS_JOB_STALE_SECONDS)
+    cutoff = timezone.now() - max_age
+    return Job.objects.filter(status=Job.STATUS_RUNNING, updated_at__lt=cutoff).update(
+        status=Job.STATUS_QUEUED, stage='queued', progress=0, updated_at=timezone.now()
+    )
+
+
+def worker_loop(poll_interval=1.0, once=False):
+    """Claim and run jobs until stopped; with once=True, drain the queue and return."""
+    processed = 0
+    while True:
+        close_old_connections()
+        job = claim_next_job()
+        if job is None:
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+        cleanup_media(keep=[job.dataset_id_reserved])
+        processed += 1
+
+
+def _worker_process_main(poll_interval):
+    # Spawned processes start from a clean interpreter and need Django configured
+    import django
+    django.setup()
+    worker_loop(poll_interval=poll_interval)
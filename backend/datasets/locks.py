@@ -0,0 +1,43 @@
+"""
+Exclusive locks on lock files under MEDIA_ROOT.
+
+Several processes can work on the same media tree: the web server, the
+`run_jobs` workers and batch-ingest pools. SQLite has no row locks and the
+database cannot cover file writes, so read-modify-write sequences on those
+files (appends to a dataset, trimming old datasets) hold a lock on a file
+instead: flock on POSIX, msvcrt.locking on Windows.
+"""
+import contextlib
+import os
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on path (created if missing), across threads and processes."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK itself gives up after ten seconds
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
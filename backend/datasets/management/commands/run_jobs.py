@@ -0,0 +1,45 @@
+import multiprocessing
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from datasets.jobs import requeue_stale_jobs, worker_loop, _worker_process_main
+
+
+class Command(BaseCommand):
+    help = 'Run background workers that process queued dataset uploads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=getattr(settings, 'DATASETS_JOB_WORKERS', None) or os.cpu_count() or 1,
+            help='Number of worker processes (default: DATASETS_JOB_WORKERS or CPU count).',
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Process queued jobs in this process and exit.')
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale job(s).')
+
+        if options['once']:
+            processed = worker_loop(once=True)
+            self.stdout.write(self.style.SUCCESS(f'Processed {processed} job(s).'))
+            return
+
+        workers = max(1, options['workers'])
+        # Children open their own DB connections
+        connections.close_all()
+        ctx = multiprocessing.get_context('spawn')
+        procs = [ctx.Process(target=_worker_process_main, args=(options['poll_interval'],), daemon=True) for _ in range(workers)]
+        for p in procs:
+            p.start()
+        self.stdout.write(self.style.SUCCESS(f'Started {workers} job worker(s). Press Ctrl+C to stop.'))
+        try:
+            for p in procs:
+                p.join()
+        except KeyboardInterrupt:
+            for p in procs:
+                p.terminate()
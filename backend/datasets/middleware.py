@@ -0,0 +1,14 @@
+from django.middleware.gzip import GZipMiddleware
+
+
+class JSONGZipMiddleware(GZipMiddleware):
+    """
+    gzip for API JSON only (table pages, summaries, ...). Downloads are left
+    alone: cleaned CSVs are stored precompressed and served with their own
+    Content-Encoding, and PDFs are already deflated internally.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or not response.get('Content-Type', '').startswith('application/json'):
+            return response
+        return super().process_response(request, response)
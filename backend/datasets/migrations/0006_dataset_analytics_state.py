@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:03
+
+import datasets.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datasets', '0005_dataset_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='analytics_state',
+            field=models.FileField(blank=True, null=True, upload_to=datasets.models.analytics_state_path),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datasets', '0008_dataset_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='ingest_timings',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
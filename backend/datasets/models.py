@@ -16,10 +16,15 @@ def clean_csv_path(instance, filename):
     return f'clean/{instance.id}.csv'
 
 
+def analytics_state_path(instance, filename):
+    # mergeable analytics state for appends, stored under media/state/<uuid>.json
+    return f'state/{instance.id}.json'
+
+
 class Dataset(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     # allow null temporarily so migrations can be created safely for existing DBs
-    filename = models.CharField(max_length=255, null=True, blank=True)
+    filename = models.CharField(max_length=255, null=True, blank=True, db_index=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     uploaded_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
     csv_file = models.FileField(upload_to=upload_csv_path, null=True, blank=True)
@@ -33,9 +38,114 @@ class Dataset(models.Model):
 
     summary_pdf = models.FileField(upload_to=report_path, null=True, blank=True)
     analytics = models.JSONField(null=True, blank=True)
+    # sha256 of the cleaned data + report template version; keys the shared report cache
+    content_hash = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+    analytics_state = models.FileField(upload_to=analytics_state_path, null=True, blank=True)
+    # bumped whenever the rows change (appends); part of every read endpoint's ETag
+    revision = models.PositiveIntegerField(default=0)
+    modified_at = models.DateTimeField(null=True, blank=True)
+    # wall time and peak memory of each ingest stage (see datasets/pipeline.py)
+    ingest_timings = models.JSONField(null=True, blank=True)
 
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # keyset paging of the catalog walks (uploaded_at, id) newest first
+            models.Index(fields=['-uploaded_at', '-id'], name='dataset_recent_idx'),
+            models.Index(fields=['uploaded_by', '-uploaded_at'], name='dataset_uploader_recent_idx'),
+        ]
 
     def __str__(self):
         return f"Dataset {self.filename} ({self.id})"
+
+
+def incoming_path(instance, filename):
+    # raw uploads waiting for a worker, stored under media/uploads/<dataset uuid>.csv
+    return f'uploads/{instance.dataset_id_reserved}.csv'
+
+
+class Job(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    KIND_UPLOAD = 'upload'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=32, default=KIND_UPLOAD)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    stage = models.CharField(max_length=64, default='queued')
+    progress = models.IntegerField(default=0)
+
+    filename = models.CharField(max_length=255, null=True, blank=True)
+    source_file = models.FileField(upload_to=incoming_path, null=True, blank=True)
+    # the dataset id is chosen up front so the raw file lands in its final place once
+    dataset_id_reserved = models.UUIDField(default=uuid.uuid4, editable=False)
+    dataset = models.ForeignKey(Dataset, null=True, blank=True, on_delete=models.SET_NULL)
+    uploaded_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"Job {self.kind} {self.status} ({self.id})"
+
+
+class UploadSession(models.Model):
+    """A resumable chunked upload (see datasets/uploads.py); its bytes land in media/uploads/<dataset id>.csv.part."""
+    STATUS_OPEN = 'open'
+    STATUS_FINALIZED = 'finalized'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_OPEN, 'Open'),
+        (STATUS_FINALIZED, 'Finalized'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_OPEN, db_index=True)
+    filename = models.CharField(max_length=255, null=True, blank=True)
+    size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+    # as for Job, the dataset id is chosen up front so the bytes are written in their final place
+    dataset_id_reserved = models.UUIDField(default=uuid.uuid4, editable=False)
+    dataset = models.ForeignKey(Dataset, null=True, blank=True, on_delete=models.SET_NULL)
+    job = models.ForeignKey(Job, null=True, blank=True, on_delete=models.SET_NULL)
+    uploaded_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    error = models.TextField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"Upload {self.filename} {self.status} ({self.id})"
+
+
+class UploadChunk(models.Model):
+    """One received chunk of an UploadSession and the sha256 it was verified against."""
+    session = models.ForeignKey(UploadSession, related_name='chunks', on_delete=models.CASCADE)
+    index = models.IntegerField()
+    sha256 = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'index'], name='upload_chunk_unique_index'),
+        ]
@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class DatasetCursorPagination(CursorPagination):
+    """
+    Keyset paging over the catalog, newest first. The cursor carries the last
+    uploaded_at seen, so page 200 costs the same indexed range scan as page 1
+    and uploads arriving meanwhile never shift or repeat rows.
+    """
+    ordering = ('-uploaded_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 200
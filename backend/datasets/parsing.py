@@ -0,0 +1,163 @@
+"""
+Typed, column-pruned CSV parsing for uploads.
+
+The header is read on its own first and mapped to the five required
+columns, so the parse only materializes those, with explicit dtypes:
+
+    equipment name  text
+    type            category (a few distinct labels, not a string per row)
+    numerics        float, as inferred by the parser
+
+Wide plant exports no longer pay to convert and hold dozens of unrelated
+columns. pyarrow's multi-threaded CSV reader is used when pyarrow is
+installed, with the text columns declared string so that names such as
+'007' or '1e5' come back as written, as they do from the C parser. Files
+it rejects, such as ragged rows that the C parser pads with NaN, are read
+again with the C engine, so nothing that parsed before stops parsing. gzip, bz2 and zstd uploads are decompressed as they are read
+(see compression.py).
+
+A numeric column that holds junk ('n/a', '--', '12,5', ...) comes back as
+strings. coerce_numeric converts it in Arrow: anything shaped like a plain
+decimal is cast in bulk, and only the odd remainder goes through
+pd.to_numeric. Values and coercion-error counts are therefore exactly
+those of pd.to_numeric(errors='coerce').
+"""
+import numpy as np
+import pandas as pd
+from pandas._libs.parsers import STR_NA_VALUES
+
+from .analytics import NUMERIC_COLS, REQUIRED_COLS
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:  # pragma: no cover - pyarrow is in requirements.txt
+    pa = None
+
+# Signed decimal with optional exponent and surrounding blanks; Arrow's cast agrees with float() on these
+PLAIN_NUMBER = r'^\s*[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?\s*$'
+
+
+def canonical_column_map(columns):
+    """Map original header names to the canonical lowercase names, raising if any are missing."""
+    cols_lower = [str(c).strip().lower() for c in columns]
+    missing = [c for c in REQUIRED_COLS if c not in cols_lower]
+    if missing:
+        raise ValueError(f'Missing required columns: {missing}. Found columns: {list(columns)}')
+
+    col_map = {}
+    for orig in columns:
+        lower = str(orig).strip().lower()
+        if lower in REQUIRED_COLS:
+            col_map[orig] = lower
+    return col_map
+
+
+def sniff_columns(path):
+    """{original header: canonical name} for the required columns, from the header row alone."""
+    from .compression import sniff_compression
+
+    # OSError and EOFError come from a corrupt or truncated compressed upload
+    try:
+        header = pd.read_csv(path, nrows=0, compression=sniff_compression(path)).columns
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError, OSError, EOFError) as e:
+        raise ValueError(f'Error reading CSV: {e}')
+    return canonical_column_map(header)
+
+
+def typed_read_options(col_map):
+    """read_csv keyword arguments that parse only the mapped columns, with their dtypes."""
+    dtype = {}
+    for orig, name in col_map.items():
+        if name == 'equipment name':
+            dtype[orig] = str
+        elif name == 'type':
+            dtype[orig] = 'category'
+    return {'usecols': list(col_map), 'dtype': dtype}
+
+
+def clean_read_options():
+    """
+    read_csv keyword arguments for a cleaned CSV (canonical header): text
+    exactly as cleaning wrote it, 'nan' and '007' included, and blank
+    numerics as NaN.
+    """
+    return {
+        'dtype': {'equipment name': str, 'type': str},
+        'keep_default_na': False,
+        'na_values': {col: sorted(STR_NA_VALUES) for col in NUMERIC_COLS},
+    }
+
+
+def _read_arrow(path, col_map, compression):
+    """
+    The mapped columns through pyarrow's multi-threaded reader. Text columns
+    are declared string up front: pandas' pyarrow engine only applies dtype
+    after Arrow has inferred '007' as the number 7. Missing values are those
+    the C parser recognizes.
+    """
+    column_types = {}
+    for orig, name in col_map.items():
+        if name == 'equipment name':
+            column_types[orig] = pa.string()
+        elif name == 'type':
+            column_types[orig] = pa.dictionary(pa.int32(), pa.string())
+    options = pa_csv.ConvertOptions(
+        include_columns=list(col_map), column_types=column_types,
+        null_values=sorted(STR_NA_VALUES), strings_can_be_null=True,
+    )
+    with pa.input_stream(path, compression=compression) as stream:
+        return pa_csv.read_csv(stream, convert_options=options).to_pandas()
+
+
+def read_required_columns(path):
+    """The required columns of a CSV under their canonical names; numerics may still hold junk strings."""
+    from .compression import sniff_compression
+
+    col_map = sniff_columns(path)
+    compression = sniff_compression(path)
+    df = None
+    if pa is not None:
+        try:
+            df = _read_arrow(path, col_map, compression)
+        except Exception:
+            df = None
+    if df is None:
+        try:
+            df = pd.read_csv(path, low_memory=False, compression=compression, **typed_read_options(col_map))
+        except Exception as e:
+            raise ValueError(f'Error reading CSV: {e}')
+    df = df.rename(columns=col_map)
+    # missing names as NaN, which the rest of the pipeline (and astype(str)) expects
+    names = df['equipment name'].to_numpy(dtype=object, copy=True)
+    names[pd.isna(names)] = np.nan
+    df['equipment name'] = names
+    return df
+
+
+def _arrow_strings(series):
+    if pa is None or series.dtype != object:
+        return None
+    try:
+        return pa.array(series.to_numpy(dtype=object), type=pa.string(), from_pandas=True)
+    except (TypeError, pa.ArrowException):
+        # mixed objects (the C engine leaves some as floats): pandas handles those
+        return None
+
+
+def coerce_numeric(series):
+    """Float64 Series like pd.to_numeric(series, errors='coerce')."""
+    if series.dtype.kind in 'fiu':
+        return series.astype('float64')
+    strings = _arrow_strings(series)
+    if strings is None:
+        return pd.to_numeric(series, errors='coerce').astype('float64')
+    plain = pc.match_substring_regex(strings, PLAIN_NUMBER)
+    values = pc.cast(pc.utf8_trim_whitespace(pc.if_else(plain, strings, None)), pa.float64())
+    values = values.to_numpy(zero_copy_only=False)
+    odd = np.flatnonzero(~plain.fill_null(True).to_numpy(zero_copy_only=False))
+    if len(odd):
+        # 'inf', '1_000', non-str objects, ...: whatever pandas makes of them
+        values[odd] = pd.to_numeric(series.iloc[odd], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    return pd.Series(values, index=series.index, name=series.name)
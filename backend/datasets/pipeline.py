@@ -0,0 +1,87 @@
+"""
+Upload ingest as explicit, timed stages.
+
+    parse    read the required columns and coerce the numerics (parsing.py)
+    clean    normalize the frame and write the cleaned CSV, whose bytes key the
+             report cache
+    analyze  analytics of the cleaned frame, or the cached copy; the legacy
+             summary and the append state are read off them
+    persist  columnar copy, sorted columns, cache entries, the Dataset row, the
+             stored upload and its append state
+    render   the PDF report
+
+Each stage consumes what the previous one produced, once. The raw frame is
+cleaned once, and analytics, summary, charts and PDF all read that result.
+Chunked ingest of large uploads parses, cleans and runs the first analytics
+pass together, chunk by chunk, and records that pass as parse. A byte-identical
+re-upload skips to persist.
+
+The wall time and peak resident memory of every stage are stored in
+Dataset.ingest_timings and shown in the admin. Peak memory is the process
+high-water mark. On Linux it is reset at the start of each stage
+(/proc/self/clear_refs), so it belongs to that stage. Elsewhere it can only
+grow from stage to stage. In a threaded server, concurrent requests share the
+figure.
+"""
+import contextlib
+import resource
+import sys
+import time
+
+STAGES = ('parse', 'clean', 'analyze', 'persist', 'render')
+
+
+def reset_peak_rss():
+    """Reset the process's peak RSS; False where the platform can't."""
+    # Linux: writing 5 to clear_refs resets VmHWM, the peak resident set size
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class StageTimings:
+    """Wall time and peak RSS per stage of one ingest; entering a stage again adds to it."""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.stages = {}
+        self._start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        reset_peak_rss()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            entry = self.stages.setdefault(name, {'ms': 0.0, 'peak_mb': 0.0})
+            entry['ms'] += elapsed
+            entry['peak_mb'] = max(entry['peak_mb'], peak_rss_mb())
+
+    def as_dict(self):
+        """JSON for Dataset.ingest_timings, stages in pipeline order."""
+        return {
+            'mode': self.mode,
+            'total_ms': round((time.perf_counter() - self._start) * 1000, 1),
+            'stages': {
+                name: {'ms': round(self.stages[name]['ms'], 1), 'peak_mb': round(self.stages[name]['peak_mb'], 1)}
+                for name in STAGES if name in self.stages
+            },
+        }
@@ -0,0 +1,199 @@
+"""
+Server-side filtering and keyset (cursor) paging over a dataset's columnar copy.
+
+Filters are plain query parameters:
+
+    type=Pump                  exact equipment type
+    type__in=Pump,Valve        any of several types
+    flowrate__gte=10           numeric ranges: __gt, __gte, __lt, __lte on
+    temperature__lt=90.5       flowrate, pressure and temperature
+    name__contains=pump        case-insensitive substring of the equipment name
+
+Masks are evaluated with vectorized numpy operations on memory-mapped
+columns. On dictionary-encoded text columns a text filter tests each
+distinct label once and selects rows by their codes. A cursor records a
+position in the (optionally sorted) row order, so the next page resumes
+scanning exactly where the previous one stopped instead of re-counting
+every earlier match.
+"""
+import base64
+import hashlib
+import json
+
+import numpy as np
+
+from .analytics import NUMERIC_COLS
+from .columnar import EncodedColumn, text_matches
+
+RANGE_OPS = {
+    'gt': np.greater,
+    'gte': np.greater_equal,
+    'lt': np.less,
+    'lte': np.less_equal,
+}
+
+# Rows examined per step when scanning for a page; grows for selective filters
+MIN_SCAN_BLOCK = 4096
+# Rows examined per step of a full export
+EXPORT_BLOCK_ROWS = 65536
+DEFAULT_PAGE_SIZE = 50
+# Largest table page; bigger reads go through the export endpoint
+MAX_PAGE_SIZE = 10000
+
+
+def parse_page_params(params):
+    """(page, page_size) from query parameters; raises ValueError for malformed or out-of-range ones."""
+    try:
+        page = int(params.get('page', 1))
+        page_size = int(params.get('page_size', DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        raise ValueError('page and page_size must be integers.')
+    if page < 1:
+        raise ValueError('page must be 1 or more.')
+    if not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f'page_size must be between 1 and {MAX_PAGE_SIZE}.')
+    return page, page_size
+
+
+def parse_filters(params):
+    """Turn query parameters into (column, op, value) filters; raises ValueError for malformed ones."""
+    filters = []
+    for key in sorted(params.keys()):
+        value = params.get(key)
+        if key == 'type':
+            filters.append(('type', 'eq', value.strip()))
+        elif key == 'type__in':
+            filters.append(('type', 'in', [v.strip() for v in value.split(',') if v.strip()]))
+        elif key == 'name__contains':
+            filters.append(('equipment name', 'contains', value.strip().lower()))
+        elif '__' in key:
+            col, op = key.rsplit('__', 1)
+            if col in NUMERIC_COLS and op in RANGE_OPS:
+                try:
+                    filters.append((col, op, float(value)))
+                except (TypeError, ValueError):
+                    raise ValueError(f'{key} must be a number, got {value!r}')
+    return filters
+
+
+def filter_mask(frame, filters, rows):
+    """Boolean mask of which of the given row indices pass every filter."""
+    mask = np.ones(len(rows), dtype=bool)
+    for col, op, value in filters:
+        column = frame.column(col)
+        if op in RANGE_OPS:
+            # NaN never satisfies a range, so missing readings drop out
+            mask &= RANGE_OPS[op](column[rows], value)
+        elif isinstance(column, EncodedColumn):
+            # decided once per distinct label, then looked up by code
+            mask &= column.matches(op, value)[column.codes[rows]]
+        else:
+            mask &= text_matches(column[rows], op, value)
+    return mask
+
+
+def _order_positions(frame, start, end, sort=None, ascending=True):
+    if sort:
+        return frame.sorted_positions(sort, start, end, ascending=ascending)
+    return np.arange(start, min(end, frame.rows))
+
+
+def offset_page(frame, filters, start, end, sort=None, ascending=True):
+    """Row indices for match positions [start, end) plus the total number of matches."""
+    if not filters:
+        return _order_positions(frame, start, end, sort, ascending), frame.rows
+    order = _order_positions(frame, 0, frame.rows, sort, ascending)
+    matches = order[filter_mask(frame, filters, order)]
+    return matches[start:end], len(matches)
+
+
+def scan_page(frame, filters, position, page_size, sort=None, ascending=True):
+    """
+    Collect up to page_size matching row indices starting at position in the
+    row order. Returns (indices, next_position); next_position is None once
+    the order is exhausted.
+    """
+    found = []
+    count = 0
+    block = max(MIN_SCAN_BLOCK, page_size * 4)
+    while position < frame.rows and count < page_size:
+        end = min(position + block, frame.rows)
+        rows = _order_positions(frame, position, end, sort, ascending)
+        hits = np.flatnonzero(filter_mask(frame, filters, rows)) if filters else np.arange(len(rows))
+        need = page_size - count
+        if len(hits) > need:
+            hits = hits[:need]
+            end = position + int(hits[-1]) + 1
+        found.append(rows[hits])
+        count += len(hits)
+        position = end
+        block *= 2
+    indices = np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+    return indices, (position if position < frame.rows else None)
+
+
+def page_arrays(frame, rows):
+    """{column: ndarray} for a row selector (slice or index array)."""
+    return {col: np.asarray(frame.column(col)[rows]) for col in frame.columns}
+
+
+def blank_missing(values):
+    """Column values as a list, with missing numeric readings as ''."""
+    if values.dtype.kind == 'f':
+        missing = np.isnan(values)
+        values = values.astype(object)
+        values[missing] = ''
+    return values.tolist()
+
+
+def page_payload(frame, rows, layout='rows'):
+    """
+    Table page for a row selector (slice or index array). 'rows' gives the
+    usual list of dicts with missing readings as ''. 'columns' gives
+    {column: values} with numeric columns left as numpy arrays (missing ->
+    null), so no per-row objects are built at all.
+    """
+    data = page_arrays(frame, rows)
+    if layout == 'columns':
+        return {col: values if values.dtype.kind == 'f' else values.tolist() for col, values in data.items()}
+
+    lists = [blank_missing(values) for values in data.values()]
+    names = frame.columns
+    return [dict(zip(names, row)) for row in zip(*lists)]
+
+
+def query_signature(filters, sort=None, ascending=True):
+    raw = json.dumps([filters, sort, ascending], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def encode_cursor(position, signature):
+    raw = json.dumps({'p': int(position), 'q': signature}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, signature):
+    """Position encoded in a cursor; raises ValueError if it is malformed or from another query."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        position = int(data['p'])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError('Invalid cursor.')
+    if data.get('q') != signature or position < 0:
+        raise ValueError('Cursor does not match this query; start again without a cursor.')
+    return position
+
+
+def iter_matches(frame, filters, sort=None, ascending=True, block=None):
+    """
+    Every matching row index in output order, yielded as one array per fixed
+    block of the row order, so a full scan never holds more than a block.
+    """
+    block = block or EXPORT_BLOCK_ROWS
+    for start in range(0, frame.rows, block):
+        rows = _order_positions(frame, start, start + block, sort, ascending)
+        if filters:
+            rows = rows[filter_mask(frame, filters, rows)]
+        if len(rows):
+            yield rows
@@ -0,0 +1,295 @@
+"""
+Content-addressed cache for derived dataset artifacts.
+
+Entries live under media/cache/<key>/, where key is the sha256 of the
+cleaned CSV bytes together with REPORT_TEMPLATE_VERSION and the ingest mode.
+An entry holds the analytics JSON and its mergeable state, the chart PNGs,
+the cleaned CSV with its columnar copy, and the rendered PDFs. A second index,
+media/cache/uploads/<upload key>.json, points byte-identical re-uploads
+straight at their entry, so they skip parsing entirely. The upload key
+hashes raw_digest: the sha256 of the upload's per-block sha256s
+(DIGEST_BLOCK_BYTES blocks). Resumable uploads verify each chunk's sha256 as
+it arrives, so they get the digest without reading the file again.
+
+Files are hard-linked between datasets and the cache where the filesystem
+allows it, so a cached file must never be rewritten in place. Always write a
+new file and os.replace it. Entries are evicted least-recently-used (by
+directory mtime) once the cache exceeds DATASETS_CACHE_MAX_BYTES.
+"""
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+from django.conf import settings
+
+from .columnar import columnar_dir, swap_into_place
+
+# Bump whenever the analytics, charts, PDF layout or columnar layout change so old entries stop matching
+REPORT_TEMPLATE_VERSION = 4
+
+# Block size of raw_digest, and so the chunk size of resumable uploads; changing it changes every upload key
+DIGEST_BLOCK_BYTES = 8 * 1024 * 1024
+
+ANALYTICS_FILE = 'analytics.json'
+CHARTS_FILE = 'charts.json'
+CLEAN_FILE = 'clean.csv.gz'
+STATE_FILE = 'state.json'
+
+
+def cache_root():
+    return os.path.join(settings.MEDIA_ROOT, 'cache')
+
+
+def entry_dir(key):
+    return os.path.join(cache_root(), key)
+
+
+def _sha256(path, prefix):
+    h = hashlib.sha256(prefix.encode())
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def content_key(clean_path, mode):
+    """Key for the cleaned data; mode ('memory' or 'stream') is mixed in because the analytics differ."""
+    return _sha256(clean_path, f'report:{REPORT_TEMPLATE_VERSION}:{mode}\n')
+
+
+def combine_digests(block_digests):
+    """raw_digest from the hex sha256 of each DIGEST_BLOCK_BYTES block, in order."""
+    h = hashlib.sha256()
+    for digest in block_digests:
+        h.update(bytes.fromhex(digest))
+    return h.hexdigest()
+
+
+def raw_digest(path):
+    """Hash of a file's bytes as the sha256 of its blocks' sha256s."""
+    with open(path, 'rb') as f:
+        return combine_digests(hashlib.sha256(block).hexdigest()
+                               for block in iter(lambda: f.read(DIGEST_BLOCK_BYTES), b''))
+
+
+def upload_key(src_path, mode, digest=None):
+    """Key for a raw upload; pass digest when its raw_digest is already known."""
+    digest = digest or raw_digest(src_path)
+    return hashlib.sha256(f'upload:{REPORT_TEMPLATE_VERSION}:{mode}\n{digest}'.encode()).hexdigest()
+
+
+def _touch(key):
+    try:
+        os.utime(entry_dir(key))
+    except OSError:
+        pass
+
+
+def _write_json(path, data):
+    tmp = f'{path}.tmp-{uuid.uuid4().hex}'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def link_or_copy(src, dest):
+    """Hard-link src to dest (replacing dest), copying when links are not possible."""
+    tmp = f'{dest}.tmp-{uuid.uuid4().hex}'
+    try:
+        os.link(src, tmp)
+    except OSError:
+        # copy2 keeps the mtime, which the columnar source signature depends on
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dest)
+    return dest
+
+
+def _link_tree(src_dir, dest_dir):
+    tmp = f'{dest_dir}.tmp-{uuid.uuid4().hex}'
+    os.makedirs(tmp)
+    try:
+        for name in os.listdir(src_dir):
+            # only the files themselves; subdirectories hold per-dataset derived results
+            if os.path.isdir(os.path.join(src_dir, name)):
+                continue
+            link_or_copy(os.path.join(src_dir, name), os.path.join(tmp, name))
+        swap_into_place(tmp, dest_dir)
+    finally:
+        if os.path.exists(tmp):
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+def load_analytics(key):
+    data = _read_json(os.path.join(entry_dir(key), ANALYTICS_FILE))
+    if data is not None:
+        _touch(key)
+    return data
+
+
+def store_analytics(key, analytics):
+    os.makedirs(entry_dir(key), exist_ok=True)
+    _write_json(os.path.join(entry_dir(key), ANALYTICS_FILE), analytics)
+
+
+def store_dataset_files(key, clean_path, dataset_id):
+    """Add the cleaned CSV and columnar copy of a freshly ingested dataset to its entry."""
+    entry = entry_dir(key)
+    if os.path.exists(os.path.join(entry, 'columnar')):
+        return
+    os.makedirs(entry, exist_ok=True)
+    link_or_copy(clean_path, os.path.join(entry, CLEAN_FILE))
+    _link_tree(columnar_dir(dataset_id), os.path.join(entry, 'columnar'))
+
+
+def restore_dataset_files(key, clean_path, dataset_id):
+    """Link a cached cleaned CSV and columnar copy into place for a new dataset; False on a miss."""
+    entry = entry_dir(key)
+    if not os.path.exists(os.path.join(entry, CLEAN_FILE)) or not os.path.isdir(os.path.join(entry, 'columnar')):
+        return False
+    link_or_copy(os.path.join(entry, CLEAN_FILE), clean_path)
+    _link_tree(os.path.join(entry, 'columnar'), columnar_dir(dataset_id))
+    _touch(key)
+    return True
+
+
+def store_state(key, state_file):
+    """Keep a dataset's analytics state with its entry so re-uploads can append straight away."""
+    os.makedirs(entry_dir(key), exist_ok=True)
+    link_or_copy(state_file, os.path.join(entry_dir(key), STATE_FILE))
+
+
+def restore_state(key, dest):
+    cached = os.path.join(entry_dir(key), STATE_FILE)
+    if not os.path.exists(cached):
+        return None
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    return link_or_copy(cached, dest)
+
+
+def lookup_upload(raw_key):
+    """Return {'content_key', 'summary', 'coercion_errors'} for a previously seen upload, or None."""
+    alias = _read_json(os.path.join(cache_root(), 'uploads', f'{raw_key}.json'))
+    if alias is None or not os.path.isdir(entry_dir(alias.get('content_key', ''))):
+        return None
+    return alias
+
+
+def store_upload(raw_key, key, summary, coercion_errors):
+    uploads = os.path.join(cache_root(), 'uploads')
+    os.makedirs(uploads, exist_ok=True)
+    _write_json(os.path.join(uploads, f'{raw_key}.json'), {
+        'content_key': key, 'summary': summary, 'coercion_errors': coercion_errors,
+    })
+
+
+def chart_images(key):
+    """Return {chart key: png path} for a cached chart set, or None."""
+    entry = entry_dir(key)
+    names = _read_json(os.path.join(entry, CHARTS_FILE))
+    if names is None:
+        return None
+    images = {k: os.path.join(entry, 'charts', name) for k, name in names.items()}
+    if not all(os.path.exists(p) for p in images.values()):
+        return None
+    _touch(key)
+    return images
+
+
+def store_charts(key, images):
+    """Move rendered chart PNGs into the entry and return their new paths."""
+    charts_dir = os.path.join(entry_dir(key), 'charts')
+    os.makedirs(charts_dir, exist_ok=True)
+    names = {}
+    for chart, path in images.items():
+        names[chart] = os.path.basename(path)
+        link_or_copy(path, os.path.join(charts_dir, names[chart]))
+    _write_json(os.path.join(entry_dir(key), CHARTS_FILE), names)
+    return {k: os.path.join(charts_dir, name) for k, name in names.items()}
+
+
+def _report_name(dataset):
+    # The PDF cover and header print per-dataset metadata, so it is part of the key
+    fields = [
+        str(dataset.id), dataset.filename or '', dataset.uploaded_at.isoformat() if dataset.uploaded_at else '',
+        dataset.uploaded_by.username if dataset.uploaded_by else '',
+        repr((dataset.total_rows, dataset.avg_flowrate, dataset.avg_pressure, dataset.avg_temperature)),
+    ]
+    return hashlib.sha256('\n'.join(fields).encode()).hexdigest() + '.pdf'
+
+
+def restore_report(dataset, dest):
+    """Link a cached PDF for this dataset to dest; returns dest, or None on a miss."""
+    key = getattr(dataset, 'content_hash', None)
+    if not key:
+        return None
+    cached = os.path.join(entry_dir(key), 'reports', _report_name(dataset))
+    if not os.path.exists(cached):
+        return None
+    _touch(key)
+    return link_or_copy(cached, dest)
+
+
+def store_report(dataset, pdf_path):
+    key = getattr(dataset, 'content_hash', None)
+    if not key:
+        return
+    reports_dir = os.path.join(entry_dir(key), 'reports')
+    os.makedirs(reports_dir, exist_ok=True)
+    link_or_copy(pdf_path, os.path.join(reports_dir, _report_name(dataset)))
+
+
+def _tree_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def evict(max_bytes=None):
+    """Drop least-recently-used entries until the cache fits in max_bytes; returns the number removed."""
+    max_bytes = settings.DATASETS_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    root = cache_root()
+    if not os.path.isdir(root):
+        return 0
+
+    entries = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name == 'uploads' or '.tmp-' in name or not os.path.isdir(path):
+            continue
+        entries.append((os.path.getmtime(path), _tree_bytes(path), name))
+
+    total = sum(size for _, size, _ in entries)
+    removed = set()
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        total -= size
+        removed.add(name)
+
+    # Upload aliases are tiny; drop the ones whose entry just went away
+    uploads = os.path.join(root, 'uploads')
+    if removed and os.path.isdir(uploads):
+        for name in os.listdir(uploads):
+            alias = _read_json(os.path.join(uploads, name))
+            if alias is None or alias.get('content_key') in removed:
+                try:
+                    os.remove(os.path.join(uploads, name))
+                except OSError:
+                    pass
+    return len(removed)
@@ -0,0 +1,133 @@
+"""
+Whole-dataset scatter data for the charts, sized for the wire.
+
+Two shapes are offered over any pair of numeric columns:
+
+    sample   up to max_points rows chosen so the picture stays faithful: the
+             extremes of both axes, one point from every occupied cell of a
+             grid laid over the data (so sparse regions and outliers survive),
+             then a seeded random fill that follows the density.
+    density  a bins x bins count grid over the data's bounding box, returned
+             sparsely as [x bin, y bin, count] triples.
+
+Both are computed with numpy over the memory-mapped columnar copy and cached
+as JSON in the columnar directory, which is cleared whenever rows are appended.
+"""
+import json
+import os
+import uuid
+
+import numpy as np
+
+from .analytics import NUMERIC_COLS
+
+MODES = ('sample', 'density')
+DEFAULT_MAX_POINTS = 2000
+MAX_POINTS_LIMIT = 50000
+DEFAULT_BINS = 64
+MAX_BINS = 512
+
+
+def parse_scatter_params(params):
+    """Validate x, y, mode and resolution query parameters; raises ValueError with a client-facing message."""
+    x = (params.get('x') or 'temperature').lower()
+    y = (params.get('y') or 'flowrate').lower()
+    for axis in (x, y):
+        if axis not in NUMERIC_COLS:
+            raise ValueError(f'Unknown column {axis!r}; choose from {", ".join(NUMERIC_COLS)}.')
+    mode = params.get('mode', 'sample')
+    if mode not in MODES:
+        raise ValueError(f'mode must be one of {", ".join(MODES)}.')
+
+    # a sample needs room for the four axis extremes
+    name, default, low, limit = (('max_points', DEFAULT_MAX_POINTS, 10, MAX_POINTS_LIMIT) if mode == 'sample'
+                                 else ('bins', DEFAULT_BINS, 1, MAX_BINS))
+    try:
+        resolution = int(params.get(name, default))
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be an integer.')
+    if not low <= resolution <= limit:
+        raise ValueError(f'{name} must be between {low} and {limit}.')
+    return x, y, mode, resolution
+
+
+def _bounds(x, y):
+    return float(x.min()), float(x.max()), float(y.min()), float(y.max())
+
+
+def _grid_index(values, lo, hi, side):
+    scale = side / (hi - lo) if hi > lo else 0.0
+    return np.minimum(((values - lo) * scale).astype(np.int64), side - 1)
+
+
+def sample_indices(x, y, max_points, seed=0):
+    """Indices into x/y (finite pairs only) of an extrema-preserving, grid-stratified sample."""
+    valid = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+    if len(valid) <= max_points:
+        return valid
+    xs, ys = x[valid], y[valid]
+
+    chosen = np.zeros(len(valid), dtype=bool)
+    chosen[[xs.argmin(), xs.argmax(), ys.argmin(), ys.argmax()]] = True
+    budget = max_points - int(chosen.sum())
+
+    # side * side cells never exceed the budget, so every occupied cell keeps a point
+    side = max(int(np.sqrt(budget)), 1)
+    xmin, xmax, ymin, ymax = _bounds(xs, ys)
+    cells = _grid_index(xs, xmin, xmax, side) * side + _grid_index(ys, ymin, ymax, side)
+    _, first = np.unique(cells, return_index=True)
+    chosen[first] = True
+
+    remaining = max_points - int(chosen.sum())
+    if remaining > 0:
+        rest = np.flatnonzero(~chosen)
+        chosen[np.random.default_rng(seed).choice(rest, size=remaining, replace=False)] = True
+    return valid[chosen]
+
+
+def density_grid(x, y, bins):
+    """Counts of finite (x, y) pairs on a bins x bins grid; sparse cells plus the grid edges."""
+    finite = np.isfinite(x) & np.isfinite(y)
+    xs, ys = x[finite], y[finite]
+    if not len(xs):
+        return {'x_edges': [], 'y_edges': [], 'cells': [], 'max_count': 0}
+    xmin, xmax, ymin, ymax = _bounds(xs, ys)
+    # bincount over flattened cell ids; much cheaper than histogram2d's per-axis searchsorted
+    counts = np.bincount(
+        _grid_index(xs, xmin, xmax, bins) * bins + _grid_index(ys, ymin, ymax, bins), minlength=bins * bins,
+    )
+    occupied = np.flatnonzero(counts)
+    return {
+        'x_edges': np.linspace(xmin, xmax, bins + 1).tolist(),
+        'y_edges': np.linspace(ymin, ymax, bins + 1).tolist(),
+        'cells': np.column_stack([occupied // bins, occupied % bins, counts[occupied]]).tolist(),
+        'max_count': int(counts.max()),
+    }
+
+
+def scatter_data(frame, x, y, mode='sample', resolution=DEFAULT_MAX_POINTS):
+    """Scatter payload for a ColumnarFrame, served from its per-(axes, mode, resolution) cache when present."""
+    cache_path = frame.derived_path(f'scatter-{x}-{y}-{mode}-{resolution}.json')
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    xs = np.asarray(frame.column(x))
+    ys = np.asarray(frame.column(y))
+    data = {'x': x, 'y': y, 'mode': mode, 'rows': frame.rows,
+            'total': int(np.count_nonzero(np.isfinite(xs) & np.isfinite(ys)))}
+    if mode == 'sample':
+        indices = sample_indices(xs, ys, resolution)
+        data['max_points'] = resolution
+        data['points'] = np.column_stack([xs[indices], ys[indices]]).tolist()
+    else:
+        data['bins'] = resolution
+        data.update(density_grid(xs, ys, resolution))
+
+    tmp = f'{cache_path}.tmp-{uuid.uuid4().hex}'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, cache_path)
+    return data
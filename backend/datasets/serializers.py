@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Dataset
+from .models import Dataset, Job, UploadSession
+from .uploads import chunk_count, received_chunks
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -38,10 +39,68 @@ class DatasetSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class DatasetListSerializer(DatasetSerializer):
+    """
+    Catalog projection: everything but the analytics blob by default, or just
+    the fields named in ?fields= (analytics included if asked for explicitly).
+    """
+    DEFAULT_FIELDS = [f for f in DatasetSerializer.Meta.fields if f != 'analytics']
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        keep = set(fields or self.DEFAULT_FIELDS)
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
+
+
 class UploadSerializer(serializers.Serializer):
     file = serializers.FileField()
 
 
+class BatchUploadSerializer(serializers.Serializer):
+    # CSVs and/or .zip/.tar archives of CSVs, sent as repeated `files` fields
+    files = serializers.ListField(child=serializers.FileField(), allow_empty=False)
+
+
+class UploadSessionCreateSerializer(serializers.Serializer):
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    dataset = serializers.CharField(source='dataset_id', read_only=True)
+    job = serializers.CharField(source='job_id', read_only=True)
+    chunks = serializers.SerializerMethodField()
+    received = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id', 'status', 'filename', 'size', 'chunk_size', 'chunks', 'received', 'dataset', 'job', 'error',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+    def get_chunks(self, obj):
+        return chunk_count(obj)
+
+    def get_received(self, obj):
+        return received_chunks(obj)
+
+
+class JobSerializer(serializers.ModelSerializer):
+    dataset = serializers.CharField(source='dataset_id', read_only=True)
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'status', 'stage', 'progress', 'filename', 'dataset',
+            'result', 'error', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
@@ -0,0 +1,588 @@
+"""
+Chunked ingest for CSVs that do not fit in memory.
+
+The upload is read in bounded chunks; each chunk is cleaned, appended to the
+cleaned CSV and folded into mergeable accumulators, so peak memory is
+O(chunk size). A second pass over the memory-mapped columnar copy fills in
+what needs the final ranges (histograms, IQR outliers).
+
+Tolerances versus the in-memory analyze_dataframe:
+- row_count, missing_values, counts, min/max, type_distribution, top_values
+  and insight counts are exact (type_distribution ties may be ordered by
+  first appearance instead of pandas' hash order).
+- mean, std and correlation are exact up to floating-point summation order
+  (~1e-12 relative).
+- histograms use the exact final min/max range; counts are exact up to
+  values sitting on a bin edge.
+- median, and the quartiles behind the IQR outlier bounds, come from a
+  QuantileSketch; they are within ~0.5% rank error for the default capacity,
+  so outlier counts near the bounds can differ slightly.
+"""
+import contextlib
+import heapq
+import math
+
+import numpy as np
+import pandas as pd
+
+from .analytics import NUMERIC_COLS, REQUIRED_COLS, clean_dataframe, known_types, replace_special_floats, row_values
+from .parsing import clean_read_options, coerce_numeric, sniff_columns, typed_read_options
+
+DEFAULT_CHUNK_ROWS = 200_000
+TOP_K = 5
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch (a deterministic KLL-style compactor stack).
+    Each level holds at most `capacity` items of weight 2**level; when a level
+    overflows it is sorted and every other item is promoted to the next level.
+    """
+
+    def __init__(self, capacity=2048):
+        self.capacity = capacity
+        self.levels = []
+        self.count = 0
+        self._flip = 0
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self._push(0, values)
+
+    def _push(self, level, values):
+        while len(self.levels) <= level:
+            self.levels.append(np.empty(0, dtype='float64'))
+        merged = np.concatenate([self.levels[level], values])
+        if len(merged) <= self.capacity:
+            self.levels[level] = merged
+            return
+        merged.sort()
+        # keep an even-length prefix for promotion, alternating the offset to stay unbiased
+        odd = len(merged) % 2
+        keep, rest = merged[:odd], merged[odd:]
+        self._flip ^= 1
+        self.levels[level] = keep
+        self._push(level + 1, rest[self._flip::2])
+
+    def merge(self, other):
+        self.count += other.count
+        for level, values in enumerate(other.levels):
+            if len(values):
+                self._push(level, values)
+        return self
+
+    def _weighted(self):
+        values = np.concatenate(self.levels) if self.levels else np.empty(0)
+        weights = np.concatenate([np.full(len(v), 2.0 ** i) for i, v in enumerate(self.levels)]) if self.levels else np.empty(0)
+        order = np.argsort(values, kind='mergesort')
+        return values[order], weights[order]
+
+    def quantile(self, q):
+        if len(self.levels) <= 1:
+            # nothing compacted yet, so the sketch still holds every value
+            return float(np.quantile(self.levels[0], q)) if self.count else None
+        values, weights = self._weighted()
+        cum = np.cumsum(weights)
+        # rank of the q-quantile among the (weighted) items, mid-point convention
+        target = q * (cum[-1] - 1)
+        idx = int(np.searchsorted(cum - 1, target, side='left'))
+        return float(values[min(idx, len(values) - 1)])
+
+    def cdf(self, x, side='right'):
+        """Approximate number of values <= each x (< x with side='left')."""
+        values, weights = self._weighted()
+        cum = np.concatenate([[0.0], np.cumsum(weights)])
+        return cum[np.searchsorted(values, np.asarray(x, dtype='float64'), side=side)]
+
+    def copy(self):
+        return QuantileSketch.from_state(self.to_state())
+
+    def to_state(self):
+        return {'capacity': self.capacity, 'count': self.count, 'flip': self._flip,
+                'levels': [v.tolist() for v in self.levels]}
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(capacity=state['capacity'])
+        sketch.count = state['count']
+        sketch._flip = state.get('flip', 0)
+        sketch.levels = [np.asarray(v, dtype='float64') for v in state['levels']]
+        return sketch
+
+
+class ColumnAccumulator:
+    """Count, mean/M2 (Chan et al. merge), min/max, quantile sketch and top/bottom-k for one column."""
+
+    def __init__(self):
+        self.count = 0
+        self.missing = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketch = QuantileSketch()
+        # (value, row, name) candidates; only TOP_K are kept
+        self.top = []
+        self.low = []
+
+    def update(self, values, rows, names):
+        valid = ~np.isnan(values)
+        self.missing += int(len(values) - valid.sum())
+        values, rows, names = values[valid], rows[valid], names[valid]
+        n = len(values)
+        if n == 0:
+            return
+        mean = values.mean()
+        m2 = float(np.dot(values - mean, values - mean))
+        self._merge_moments(n, float(mean), m2)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.sketch.update(values)
+
+        hi = self._candidates(values, largest=True)
+        lo = self._candidates(values, largest=False)
+        self.top = self._select(self.top + [(float(values[i]), int(rows[i]), names[i]) for i in hi], largest=True)
+        self.low = self._select(self.low + [(float(values[i]), int(rows[i]), names[i]) for i in lo], largest=False)
+
+    @staticmethod
+    def _candidates(values, largest):
+        """Positions of the chunk's k most extreme values, earliest rows first among ties."""
+        k = min(TOP_K, len(values))
+        keys = -values if largest else values
+        kth = np.partition(keys, k - 1)[k - 1]
+        better = np.flatnonzero(keys < kth)
+        tied = np.flatnonzero(keys == kth)[:k - len(better)]
+        return np.concatenate([better, tied])
+
+    def _merge_moments(self, n, mean, m2):
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    @staticmethod
+    def _select(items, largest):
+        key = (lambda t: (-t[0], t[1])) if largest else (lambda t: (t[0], t[1]))
+        return heapq.nsmallest(TOP_K, items, key=key)
+
+    def merge(self, other):
+        self.missing += other.missing
+        if other.count:
+            self._merge_moments(other.count, other.mean, other.m2)
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self.sketch.merge(other.sketch)
+            self.top = self._select(self.top + other.top, largest=True)
+            self.low = self._select(self.low + other.low, largest=False)
+        return self
+
+    def to_state(self):
+        return {
+            'count': self.count, 'missing': self.missing, 'mean': self.mean, 'm2': self.m2,
+            'min': self.min if self.count else None, 'max': self.max if self.count else None,
+            'sketch': self.sketch.to_state(),
+            'top': [list(t) for t in self.top], 'low': [list(t) for t in self.low],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        acc = cls()
+        acc.count, acc.missing = state['count'], state['missing']
+        acc.mean, acc.m2 = state['mean'], state['m2']
+        if acc.count:
+            acc.min, acc.max = state['min'], state['max']
+        acc.sketch = QuantileSketch.from_state(state['sketch'])
+        acc.top = [tuple(t) for t in state['top']]
+        acc.low = [tuple(t) for t in state['low']]
+        return acc
+
+    def stats(self):
+        if self.count == 0:
+            return {'mean': None, 'median': None, 'std': None, 'min': None, 'max': None, 'count': 0}
+        return {
+            'mean': self.mean,
+            'median': self.sketch.quantile(0.5),
+            'std': math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else None,
+            'min': self.min,
+            'max': self.max,
+            'count': self.count,
+        }
+
+
+class CoMomentAccumulator:
+    """Pairwise-complete co-moments for the numeric columns, mergeable across chunks."""
+
+    def __init__(self, k=len(NUMERIC_COLS)):
+        self.n = np.zeros((k, k))
+        self.mean_x = np.zeros((k, k))   # mean of column i over rows where i and j are present
+        self.mean_y = np.zeros((k, k))   # mean of column j over the same rows
+        self.cxy = np.zeros((k, k))
+        self.m2x = np.zeros((k, k))
+        self.m2y = np.zeros((k, k))
+
+    def update(self, block):
+        valid = ~np.isnan(block)
+        k = block.shape[1]
+        other = CoMomentAccumulator(k)
+        for i in range(k):
+            for j in range(k):
+                both = valid[:, i] & valid[:, j]
+                x, y = block[both, i], block[both, j]
+                if len(x) == 0:
+                    continue
+                mx, my = x.mean(), y.mean()
+                dx, dy = x - mx, y - my
+                other.n[i, j] = len(x)
+                other.mean_x[i, j], other.mean_y[i, j] = mx, my
+                other.cxy[i, j] = np.dot(dx, dy)
+                other.m2x[i, j], other.m2y[i, j] = np.dot(dx, dx), np.dot(dy, dy)
+        self.merge(other)
+
+    def merge(self, other):
+        total = self.n + other.n
+        with np.errstate(divide='ignore', invalid='ignore'):
+            w = np.where(total > 0, self.n * other.n / total, 0.0)
+            dx = other.mean_x - self.mean_x
+            dy = other.mean_y - self.mean_y
+            self.cxy = self.cxy + other.cxy + dx * dy * w
+            self.m2x = self.m2x + other.m2x + dx * dx * w
+            self.m2y = self.m2y + other.m2y + dy * dy * w
+            frac = np.where(total > 0, other.n / total, 0.0)
+            self.mean_x = self.mean_x + dx * frac
+            self.mean_y = self.mean_y + dy * frac
+        self.n = total
+        return self
+
+    def to_state(self):
+        return {name: getattr(self, name).tolist() for name in ('n', 'mean_x', 'mean_y', 'cxy', 'm2x', 'm2y')}
+
+    @classmethod
+    def from_state(cls, state):
+        acc = cls(len(state['n']))
+        for name, value in state.items():
+            setattr(acc, name, np.asarray(value, dtype='float64'))
+        return acc
+
+    def correlation(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = np.clip(self.cxy / np.sqrt(self.m2x * self.m2y), -1.0, 1.0)
+        corr[(self.n < 2) | ~np.isfinite(corr)] = np.nan
+        out = {}
+        for j, col in enumerate(NUMERIC_COLS):
+            out[col] = {row: (0.0 if np.isnan(corr[i, j]) else float(corr[i, j])) for i, row in enumerate(NUMERIC_COLS)}
+        return out
+
+
+class AnalyticsAccumulator:
+    """Everything analyze_dataframe reports, accumulated chunk by chunk."""
+
+    def __init__(self):
+        self.rows = 0
+        self.text_missing = {'equipment name': 0, 'type': 0}
+        self.columns = {col: ColumnAccumulator() for col in NUMERIC_COLS}
+        self.comoments = CoMomentAccumulator()
+        self.type_counts = {}
+        self.zero_flow = 0
+        self.high_temp = 0
+        # filled by the second pass
+        self.histograms = None
+        self.outliers = None
+
+    def update(self, df_clean: pd.DataFrame):
+        """Fold one cleaned chunk in; row numbers continue from the previous chunks."""
+        n = len(df_clean)
+        rows = np.arange(self.rows, self.rows + n)
+        names = row_values(df_clean['equipment name'])
+        block = _numeric_block(df_clean)
+
+        for col in ('equipment name', 'type'):
+            self.text_missing[col] += int(df_clean[col].isna().sum())
+        for j, col in enumerate(NUMERIC_COLS):
+            self.columns[col].update(block[:, j], rows, names)
+        self.comoments.update(block)
+        for t, c in df_clean['type'].value_counts(dropna=True, sort=False).items():
+            if c:
+                self.type_counts[t] = self.type_counts.get(t, 0) + int(c)
+        self.zero_flow += int(np.count_nonzero(block[:, NUMERIC_COLS.index('flowrate')] == 0))
+        self.high_temp += int(np.count_nonzero(block[:, NUMERIC_COLS.index('temperature')] > 100))
+        self.rows += n
+
+    def outlier_bounds(self, col):
+        acc = self.columns[col]
+        if acc.count == 0:
+            return None
+        q1, q3 = acc.sketch.quantile(0.25), acc.sketch.quantile(0.75)
+        iqr = q3 - q1
+        return q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+    def histogram_edges(self, col, bins=10):
+        acc = self.columns[col]
+        if acc.count == 0:
+            return None
+        # same edges np.histogram derives from the full data's range
+        return np.histogram_bin_edges(np.array([acc.min, acc.max]), bins=bins)
+
+    def second_pass(self, slices):
+        """
+        Exact histograms and outlier counts/examples over the cleaned data.
+        slices yields (row_offset, block, names, types) in row order.
+        """
+        edges = {col: self.histogram_edges(col) for col in NUMERIC_COLS}
+        bounds = {col: self.outlier_bounds(col) for col in NUMERIC_COLS}
+        counts = {col: np.zeros(10, dtype=np.int64) for col in NUMERIC_COLS}
+        outliers = {col: {'count': 0, 'examples': []} for col in NUMERIC_COLS}
+
+        for offset, block, names, types in slices:
+            for j, col in enumerate(NUMERIC_COLS):
+                values = block[:, j]
+                if edges[col] is not None:
+                    finite = values[~np.isnan(values)]
+                    counts[col] += np.histogram(finite, bins=edges[col])[0]
+                if bounds[col] is not None:
+                    low, high = bounds[col]
+                    hits = np.flatnonzero((values < low) | (values > high))
+                    outliers[col]['count'] += int(len(hits))
+                    room = 10 - len(outliers[col]['examples'])
+                    for r in hits[:max(room, 0)]:
+                        outliers[col]['examples'].append(
+                            {'equipment name': names[r], 'type': types[r], col: float(values[r])}
+                        )
+
+        self.histograms = {
+            col: ({'bins': [float(e) for e in edges[col]], 'counts': [int(c) for c in counts[col]]}
+                  if edges[col] is not None else {'bins': [], 'counts': []})
+            for col in NUMERIC_COLS
+        }
+        self.outliers = outliers
+
+    def append(self, df_clean: pd.DataFrame):
+        """
+        Fold rows appended to a finished dataset in, keeping the histograms and
+        outliers current without revisiting earlier rows. Earlier values are
+        re-binned, or re-tested against moved IQR bounds, through the quantile
+        sketch, which is exact until a column exceeds its capacity.
+        """
+        before = {col: self.columns[col].sketch.copy() for col in NUMERIC_COLS}
+        old_histograms = self.histograms or {}
+        old_outliers = self.outliers or {}
+        self.update(df_clean)
+
+        block = _numeric_block(df_clean)
+        names = row_values(df_clean['equipment name'])
+        types = row_values(df_clean['type'])
+        histograms, outliers = {}, {}
+        for j, col in enumerate(NUMERIC_COLS):
+            values = block[:, j]
+            edges = self.histogram_edges(col)
+            if edges is None:
+                histograms[col] = {'bins': [], 'counts': []}
+            else:
+                previous = old_histograms.get(col) or {}
+                if previous.get('counts') and np.array_equal(np.asarray(previous['bins']), edges):
+                    counts = np.asarray(previous['counts'], dtype=np.int64)
+                else:
+                    counts = _sketch_histogram(before[col], edges)
+                counts = counts + np.histogram(values[~np.isnan(values)], bins=edges)[0]
+                histograms[col] = {'bins': [float(e) for e in edges], 'counts': [int(c) for c in counts]}
+
+            bounds = self.outlier_bounds(col)
+            if bounds is None:
+                outliers[col] = {'count': 0, 'examples': []}
+                continue
+            low, high = bounds
+            old = before[col]
+            count = int(round(old.cdf(low, side='left') + old.count - old.cdf(high))) if old.count else 0
+            examples = [e for e in (old_outliers.get(col) or {}).get('examples', []) if not low <= e[col] <= high]
+            hits = np.flatnonzero((values < low) | (values > high))
+            for r in hits[:max(10 - len(examples), 0)]:
+                examples.append({'equipment name': names[r], 'type': types[r], col: float(values[r])})
+            outliers[col] = {'count': count + int(len(hits)), 'examples': examples}
+
+        self.histograms = histograms
+        self.outliers = outliers
+
+    def to_state(self):
+        return {
+            'rows': self.rows,
+            'text_missing': self.text_missing,
+            'columns': {col: acc.to_state() for col, acc in self.columns.items()},
+            'comoments': self.comoments.to_state(),
+            'type_counts': self.type_counts,
+            'zero_flow': self.zero_flow,
+            'high_temp': self.high_temp,
+            'histograms': self.histograms,
+            'outliers': self.outliers,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        acc = cls()
+        acc.rows = state['rows']
+        acc.text_missing = dict(state['text_missing'])
+        acc.columns = {col: ColumnAccumulator.from_state(s) for col, s in state['columns'].items()}
+        acc.comoments = CoMomentAccumulator.from_state(state['comoments'])
+        acc.type_counts = dict(state['type_counts'])
+        acc.zero_flow, acc.high_temp = state['zero_flow'], state['high_temp']
+        acc.histograms, acc.outliers = state['histograms'], state['outliers']
+        return acc
+
+    def to_analytics(self):
+        corr = self.comoments.correlation()
+        insights = []
+        if self.zero_flow > 0:
+            insights.append(f"{self.zero_flow} equipment items have zero flowrate")
+        if self.high_temp > 0:
+            insights.append(f"{self.high_temp} rows have temperature > 100")
+        if abs(corr['flowrate']['temperature']) > 0.6:
+            insights.append('Strong correlation detected between Flowrate and Temperature')
+
+        missing = dict(self.text_missing)
+        missing.update({col: self.columns[col].missing for col in NUMERIC_COLS})
+        type_dist = dict(sorted(known_types(self.type_counts).items(), key=lambda kv: -kv[1]))
+
+        raw_analytics = {
+            'row_count': int(self.rows),
+            'missing_values': {c: missing[c] for c in REQUIRED_COLS},
+            'stats': {col: self.columns[col].stats() for col in NUMERIC_COLS},
+            'type_distribution': type_dist,
+            'outliers': self.outliers or {col: {'count': 0, 'examples': []} for col in NUMERIC_COLS},
+            'correlation_matrix': corr,
+            'top_values': {
+                col: {
+                    'top': [{'equipment name': name, col: value} for value, _, name in self.columns[col].top],
+                    'low': [{'equipment name': name, col: value} for value, _, name in self.columns[col].low],
+                }
+                for col in NUMERIC_COLS
+            },
+            'histograms': self.histograms or {col: {'bins': [], 'counts': []} for col in NUMERIC_COLS},
+            'insights': insights,
+        }
+        return replace_special_floats(raw_analytics)
+
+
+def _numeric_block(df_clean):
+    if not len(df_clean):
+        return np.empty((0, len(NUMERIC_COLS)))
+    return np.column_stack([df_clean[c].to_numpy(dtype='float64', na_value=np.nan) for c in NUMERIC_COLS])
+
+
+def _sketch_histogram(sketch, edges):
+    """Counts of the sketched values in np.histogram's bins (last bin closed)."""
+    if sketch.count == 0:
+        return np.zeros(len(edges) - 1, dtype=np.int64)
+    below = sketch.cdf(edges, side='left')
+    counts = np.diff(below)
+    counts[-1] = sketch.count - below[-2]
+    return np.rint(counts).astype(np.int64)
+
+
+def iter_csv_chunks(src_path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield raw chunks of just the required columns, under canonical names; the header is validated first."""
+    from .compression import sniff_compression
+
+    col_map = sniff_columns(src_path)
+    try:
+        reader = pd.read_csv(src_path, chunksize=chunk_rows, compression=sniff_compression(src_path), **typed_read_options(col_map))
+        for chunk in reader:
+            yield chunk.rename(columns=col_map)
+    except pd.errors.EmptyDataError as e:
+        raise ValueError(f'Error reading CSV: {e}')
+    except pd.errors.ParserError as e:
+        raise ValueError(f'Error reading CSV: {e}')
+    except (OSError, EOFError) as e:
+        # corrupt or truncated compressed upload
+        raise ValueError(f'Error reading CSV: {e}')
+
+
+def stream_ingest(src_path, clean_path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    First pass: read src_path chunk by chunk, write the cleaned CSV
+    incrementally and accumulate analytics. Returns the accumulator, the
+    coercion error counts and the legacy summary.
+    """
+    from .compression import open_csv_text
+
+    acc = AnalyticsAccumulator()
+    coercion_errors = {col: 0 for col in NUMERIC_COLS}
+    raw_rows = 0
+
+    with open_csv_text(clean_path, 'w') as out:
+        first = True
+        for chunk in iter_csv_chunks(src_path, chunk_rows):
+            raw_rows += len(chunk)
+            for col in NUMERIC_COLS:
+                chunk[col] = coerce_numeric(chunk[col])
+                coercion_errors[col] += int(chunk[col].isna().sum())
+            clean = clean_dataframe(chunk)
+            clean.to_csv(out, index=False, header=first)
+            first = False
+            acc.update(clean)
+
+    summary = {
+        'total_count': int(raw_rows),
+        'averages': {col: (acc.columns[col].mean if acc.columns[col].count else None) for col in NUMERIC_COLS},
+        'type_distribution': dict(sorted(known_types(acc.type_counts).items(), key=lambda kv: -kv[1])),
+        'min_max': {
+            col: ({'min': acc.columns[col].min, 'max': acc.columns[col].max} if acc.columns[col].count else None)
+            for col in NUMERIC_COLS
+        } if raw_rows > 0 else {col: None for col in NUMERIC_COLS},
+    }
+    return acc, coercion_errors, summary
+
+
+def iter_columnar_slices(frame, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield (row_offset, numeric block, names, types) slices of a ColumnarFrame."""
+    for start in range(0, len(frame), chunk_rows):
+        end = min(start + chunk_rows, len(frame))
+        block = np.column_stack([np.asarray(frame.column(c)[start:end]) for c in NUMERIC_COLS])
+        names = np.asarray(frame.column('equipment name')[start:end]).astype(object)
+        types = np.asarray(frame.column('type')[start:end]).astype(object)
+        yield start, block, names, types
+
+
+def report_sample(frame, max_rows):
+    """Bounded frame for the PDF: the first rows (for the log preview) plus an even sample of the rest."""
+    n = len(frame)
+    if n <= max_rows:
+        return frame.to_frame()
+    head = np.arange(min(30, n))
+    spread = np.linspace(0, n - 1, max_rows).astype(np.int64)
+    return frame.take(np.union1d(head, spread))
+
+
+def ingest_large_csv(src_path, clean_path, dataset_id, chunk_rows=DEFAULT_CHUNK_ROWS, sample_rows=200_000, stage=None):
+    """
+    Streaming counterpart of validate -> clean -> analyze -> persist. Writes
+    the cleaned CSV and the columnar copy; returns a bounded sample frame for
+    the PDF along with the coercion errors, legacy summary, analytics and the
+    accumulator state (kept for later appends). stage(name), if given, is
+    entered around each pass (see pipeline.StageTimings).
+    """
+    from .columnar import load_columnar, write_columnar_chunks
+
+    stage = stage or (lambda name: contextlib.nullcontext())
+    # parse, clean and the first analytics pass run together, chunk by chunk
+    with stage('parse'):
+        acc, coercion_errors, summary = stream_ingest(src_path, clean_path, chunk_rows)
+
+    with stage('persist'):
+        # Re-read the cleaned output chunk by chunk to fill the memory-mapped columns, text as text
+        cleaned_chunks = (
+            (clean_dataframe(c) for c in pd.read_csv(clean_path, chunksize=chunk_rows, **clean_read_options()))
+            if acc.rows else iter(())
+        )
+        write_columnar_chunks(cleaned_chunks, dataset_id, acc.rows, source_path=clean_path)
+
+    with stage('analyze'):
+        frame = load_columnar(dataset_id)
+        acc.second_pass(iter_columnar_slices(frame, chunk_rows))
+        analytics, state = acc.to_analytics(), acc.to_state()
+
+    with stage('render'):
+        sample = report_sample(frame, sample_rows)
+    return sample, coercion_errors, summary, analytics, state
@@ -1,7 +1,36 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth import get_user_model
+import base64
+import gzip
+import hashlib
 import io
+import json
+import os
+import tarfile
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from datetime import timedelta
+from unittest import mock
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from .analytics import NUMERIC_COLS, analyze_dataframe, clean_dataframe
+from .columnar import (
+    TextColumn, append_columnar, columnar_dir, load_columnar, remove_columnar, write_columnar, write_columnar_chunks,
+)
+from .incremental import append_rows, dataset_lock, read_rows
+from .jobs import _heartbeat, requeue_stale_jobs, worker_loop
+from .parsing import coerce_numeric, read_required_columns
+from .report_cache import entry_dir, evict as evict_cache
+from .streaming import QuantileSketch
+from .uploads import complete_upload
+from .utils import cleanup_media, generate_charts, process_csv_path, validate_and_read_csv
+from .models import Dataset, Job
 
 User = get_user_model()
 
@@ -30,3 +59,1224 @@ class UploadTest(TestCase):
         data = resp.json()
         self.assertIn('id', data)
         self.assertIn('summary', data)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='datasets-test-media-'))
+class ColumnarCacheTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cacheuser', password='pass')
+        self.client.force_login(self.user)
+        csv_content = (
+            b"Equipment Name,Type,Flowrate,Pressure,Temperature,Extra\n"
+            b"Pump A,Pump,10,1.2,45,x\n"
+            b"Valve B,Valve,5,0.8,30,y\n"
+            b"Reactor C,Reactor,abc,2.5,120,z\n"
+        )
+        resp = self.client.post(reverse('dataset-upload'), {'file': io.BytesIO(csv_content)})
+        self.assertEqual(resp.status_code, 201)
+        self.dataset_id = resp.json()['id']
+
+    def test_columnar_copy_written_at_upload(self):
+        frame = load_columnar(self.dataset_id)
+        self.assertIsNotNone(frame)
+        self.assertEqual(len(frame), 3)
+        self.assertEqual(frame.columns, ['equipment name', 'type', 'flowrate', 'pressure', 'temperature'])
+        self.assertTrue(np.isnan(frame.column('flowrate')[2]))
+
+    def test_table_pages_from_columnar_copy(self):
+        url = reverse('dataset-table', args=[self.dataset_id])
+        resp = self.client.get(url, {'page': 2, 'page_size': 2})
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(data['total'], 3)
+        self.assertEqual(data['rows'], [
+            {'equipment name': 'Reactor C', 'type': 'Reactor', 'flowrate': '', 'pressure': 2.5, 'temperature': 120.0},
+        ])
+
+        resp = self.client.get(url, {'sort': 'temperature', 'order': 'desc', 'page_size': 1})
+        self.assertEqual(resp.json()['rows'][0]['equipment name'], 'Reactor C')
+
+    def test_sort_index_pages_match_full_sort(self):
+        rng = np.random.default_rng(1)
+        df = clean_dataframe(pd.DataFrame({
+            'Equipment Name': [f'U{i % 37}' for i in range(500)],
+            'Type': rng.choice(['Pump', 'Valve', 'Mixer'], size=500),
+            'Flowrate': np.where(rng.random(500) < 0.1, np.nan, rng.integers(0, 20, size=500)),
+            'Pressure': rng.normal(size=500),
+            'Temperature': np.full(500, np.nan),
+        }))
+        write_columnar(df, 'sort-test')
+        frame = load_columnar('sort-test')
+        for col in frame.columns:
+            for ascending in (True, False):
+                # text columns are categorical in the frame but sort by their labels
+                values = df[col] if col in NUMERIC_COLS else df[col].astype(str)
+                expected = values.sort_values(ascending=ascending, kind='stable').to_numpy()
+                pages = [frame.sorted_slice(col, start, start + 64, ascending=ascending)[col].to_numpy()
+                         for start in range(0, 500, 64)]
+                got = np.concatenate(pages)
+                if got.dtype.kind == 'f':
+                    np.testing.assert_array_equal(got, expected.astype('float64'))
+                else:
+                    self.assertEqual(list(got), list(expected))
+        self.assertTrue(os.path.exists(os.path.join(frame.path, 'flowrate.order.npy')))
+
+    def test_text_columns_dictionary_encoded(self):
+        raw = pd.DataFrame({
+            'Equipment Name': ['P1', ' P2', 'P3', None, 'P5', 'P6'],
+            'Type': ['Valve', ' Pump', 'Pump ', None, 'Valve', 'Mixer'],
+            'Flowrate': [1, 2, 3, 4, 5, 6],
+            'Pressure': [1.0] * 6,
+            'Temperature': [1.0] * 6,
+        })
+        df = clean_dataframe(raw.copy())
+        self.assertIsInstance(df['type'].dtype, pd.CategoricalDtype)
+        self.assertEqual(list(df['type'].cat.categories), ['Valve', 'Pump', 'None', 'Mixer'])
+        plain = raw['Type'].astype(str).str.strip()
+        # a missing type stays a row label but is not counted as a type
+        known = plain[raw['Type'].notna()].value_counts().to_dict()
+        self.assertEqual(analyze_dataframe(raw)['type_distribution'], known)
+
+        write_columnar(df, 'encoded-test')
+        whole = load_columnar('encoded-test')
+        write_columnar_chunks((df.iloc[i:i + 4] for i in range(0, 6, 4)), 'encoded-chunks', 6)
+        chunked = load_columnar('encoded-chunks')
+        for frame in (whole, chunked):
+            types = frame.column('type')
+            self.assertEqual(types.codes.dtype, np.int32)
+            self.assertEqual(sorted(types.labels), ['Mixer', 'None', 'Pump', 'Valve'])
+            self.assertEqual(list(types[:]), list(plain))
+            self.assertEqual(list(np.flatnonzero(types.matches('in', ['Pump', 'Mixer'])[types.codes])), [1, 2, 5])
+            # unique names don't deduplicate, so they stay plain variable-width text
+            self.assertIsInstance(frame.column('equipment name'), TextColumn)
+            self.assertEqual(list(frame.column('equipment name')[[5, 0]]), ['P6', 'P1'])
+
+        append_columnar('encoded-test', clean_dataframe(pd.DataFrame({
+            'Equipment Name': ['Reactor-7'], 'Type': ['Reactor'], 'Flowrate': [7], 'Pressure': [1.0], 'Temperature': [1.0],
+        })))
+        frame = load_columnar('encoded-test')
+        self.assertEqual(list(frame.column('type')[4:]), ['Valve', 'Mixer', 'Reactor'])
+        self.assertEqual(list(frame.column('equipment name')[5:]), ['P6', 'Reactor-7'])
+        self.assertEqual(list(frame.sorted_slice('type', 0, 3)['type']), ['Mixer', 'None', 'Pump'])
+
+    def test_long_name_does_not_widen_every_row(self):
+        names = [f'P{i}' for i in range(1000)]
+        names[10] = 'Ä' * 5000
+        df = clean_dataframe(pd.DataFrame({
+            'Equipment Name': names, 'Type': ['Pump'] * 1000,
+            'Flowrate': [1.0] * 1000, 'Pressure': [1.0] * 1000, 'Temperature': [1.0] * 1000,
+        }))
+        for dataset_id, write in (('wide-whole', lambda i: write_columnar(df, i)),
+                                  ('wide-chunks', lambda i: write_columnar_chunks((df.iloc[j:j + 300] for j in range(0, 1000, 300)), i, 1000))):
+            write(dataset_id)
+            frame = load_columnar(dataset_id)
+            self.assertLess(os.path.getsize(os.path.join(frame.path, 'equipment_name.npy')), 20000)
+            self.assertEqual(list(frame.column('equipment name')[8:12]), ['P8', 'P9', 'Ä' * 5000, 'P11'])
+            self.assertEqual(frame.sorted_slice('equipment name', 0, 3)['equipment name'].tolist(), ['P0', 'P1', 'P100'])
+
+        append_columnar('wide-whole', clean_dataframe(pd.DataFrame({
+            'Equipment Name': ['Ωmega', ''], 'Type': ['Pump'] * 2, 'Flowrate': [1.0] * 2, 'Pressure': [1.0] * 2,
+            'Temperature': [1.0] * 2,
+        })))
+        frame = load_columnar('wide-whole')
+        self.assertEqual(list(frame.column('equipment name')[998:]), ['P998', 'P999', 'Ωmega', ''])
+
+    def test_rebuild_replaces_a_copy_swapped_in_concurrently(self):
+        df = clean_dataframe(pd.DataFrame({
+            'Equipment Name': ['P1'], 'Type': ['Pump'], 'Flowrate': [1.0], 'Pressure': [1.0], 'Temperature': [1.0],
+        }))
+        write_columnar(df, 'swap-test')
+        real_replace = os.replace
+        raced = []
+
+        def replace(src, dst):
+            # another rebuild lands between setting the old copy aside and renaming ours in
+            if dst == columnar_dir('swap-test') and not raced:
+                raced.append(True)
+                os.makedirs(dst)
+                open(os.path.join(dst, 'meta.json'), 'w').close()
+            return real_replace(src, dst)
+
+        with mock.patch('datasets.columnar.os.replace', side_effect=replace):
+            write_columnar(df, 'swap-test')
+        self.assertTrue(raced)
+        self.assertEqual(len(load_columnar('swap-test')), 1)
+        self.assertEqual([name for name in os.listdir(os.path.dirname(columnar_dir('swap-test')))
+                          if name.startswith('swap-test')], ['swap-test'])
+
+    def test_columnar_copy_rebuilt_when_missing(self):
+        remove_columnar(self.dataset_id)
+        resp = self.client.get(reverse('dataset-table', args=[self.dataset_id]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['total'], 3)
+        self.assertIsNotNone(load_columnar(self.dataset_id))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='datasets-test-media-'))
+class AsyncUploadTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='jobuser', password='pass')
+        self.client.force_login(self.user)
+
+    def upload(self, content):
+        return self.client.post(reverse('dataset-upload') + '?async=true', {'file': io.BytesIO(content)})
+
+    def test_upload_is_queued_and_processed_by_worker(self):
+        resp = self.upload(b"Equipment Name,Type,Flowrate,Pressure,Temperature\nPump A,Pump,10,1.2,45\n")
+        self.assertEqual(resp.status_code, 202)
+        job_id = resp.json()['job_id']
+        self.assertEqual(resp.json()['status'], Job.STATUS_QUEUED)
+        self.assertFalse(Dataset.objects.exists())
+
+        self.assertEqual(worker_loop(once=True), 1)
+
+        data = self.client.get(reverse('job-status', args=[job_id])).json()
+        self.assertEqual(data['status'], Job.STATUS_DONE)
+        self.assertEqual(data['progress'], 100)
+        dataset = Dataset.objects.get(pk=data['result']['id'])
+        self.assertEqual(str(dataset.id), data['dataset'])
+        self.assertEqual(dataset.total_rows, 1)
+
+    def test_worker_trims_once_per_job_and_keeps_its_dataset(self):
+        csv = b"Equipment Name,Type,Flowrate,Pressure,Temperature\nPump A,Pump,10,1.2,45\n"
+        job_ids = [self.upload(csv).json()['job_id'] for _ in range(2)]
+        with override_settings(DATASETS_KEEP_LATEST=1), \
+                mock.patch('datasets.jobs.process_csv_path', wraps=process_csv_path) as ingest, \
+                mock.patch('datasets.jobs.cleanup_media', wraps=cleanup_media) as cleanup:
+            self.assertEqual(worker_loop(once=True), 2)
+        self.assertTrue(all(call.kwargs['cleanup'] is False for call in ingest.call_args_list))
+        self.assertEqual(cleanup.call_count, 2)
+        last = self.client.get(reverse('job-status', args=[job_ids[-1]])).json()
+        self.assertEqual(list(Dataset.objects.values_list('id', flat=True)), [uuid.UUID(last['dataset'])])
+
+    def test_failed_job_reports_error(self):
+        resp = self.upload(b"name,value\na,1\n")
+        job_id = resp.json()['job_id']
+        worker_loop(once=True)
+        data = self.client.get(reverse('job-status', args=[job_id])).json()
+        self.assertEqual(data['status'], Job.STATUS_FAILED)
+        self.assertIn('Missing required columns', data['error'])
+
+    def test_heartbeat_keeps_long_jobs_from_being_requeued(self):
+        csv = b"Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+        slow, dead = (Job.objects.get(pk=self.upload(csv).json()['job_id']) for _ in range(2))
+        now = timezone.now()
+        # Both started two hours ago; only the slow one is still beating
+        Job.objects.filter(pk=slow.pk).update(status=Job.STATUS_RUNNING, started_at=now - timedelta(hours=2), updated_at=now)
+        Job.objects.filter(pk=dead.pk).update(
+            status=Job.STATUS_RUNNING, started_at=now - timedelta(hours=2), updated_at=now - timedelta(minutes=10)
+        )
+        self.assertEqual(requeue_stale_jobs(), 1)
+        self.assertEqual(Job.objects.get(pk=slow.pk).status, Job.STATUS_RUNNING)
+        self.assertEqual(Job.objects.get(pk=dead.pk).status, Job.STATUS_QUEUED)
+
+        with mock.patch('datasets.jobs._touch') as touch:
+            with _heartbeat(slow, interval=0.01):
+                time.sleep(0.2)
+            beats = touch.call_count
+            time.sleep(0.05)
+        self.assertGreater(beats, 1)
+        self.assertEqual(touch.call_count, beats)
+
+    def test_jobs_are_private_to_uploader(self):
+        job_id = self.upload(b"Equipment Name,Type,Flowrate,Pressure,Temperature\n").json()['job_id']
+        other = User.objects.create_user(username='other', password='pass')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('job-status', args=[job_id])).status_code, 404)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='datasets-test-media-'), DATASETS_BATCH_WORKERS=1)
+class BatchUploadTest(TestCase):
+    CSV = b"Equipment Name,Type,Flowrate,Pressure,Temperature\nPump A,Pump,10,1.2,45\nValve B,Valve,bad,2.0,60\n"
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='batchuser', password='pass')
+        self.client.force_login(self.user)
+
+    def named(self, content, name):
+        f = io.BytesIO(content)
+        f.name = name
+        return f
+
+    def test_files_and_archives_ingested_with_per_file_results(self):
+        zipped = io.BytesIO()
+        with zipfile.ZipFile(zipped, 'w') as zf:
+            zf.writestr('plant/2019.csv', self.CSV)
+            zf.writestr('plant/notes.txt', b'not data')
+            zf.writestr('__MACOSX/plant/._2019.csv', b'junk')
+        tarred = io.BytesIO()
+        with tarfile.open(fileobj=tarred, mode='w:gz') as tf:
+            info = tarfile.TarInfo('2020.csv')
+            info.size = len(self.CSV)
+            tf.addfile(info, io.BytesIO(self.CSV))
+
+        files = [
+            self.named(self.CSV, 'a.csv'),
+            self.named(b"name,value\na,1\n", 'bad.csv'),
+            self.named(zipped.getvalue(), 'plant.zip'),
+            self.named(tarred.getvalue(), 'more.tar.gz'),
+            self.named(b'not an archive', 'broken.zip'),
+        ]
+        resp = self.client.post(reverse('dataset-upload-batch'), {'files': files})
+        self.assertEqual(resp.status_code, 207)
+        data = resp.json()
+        self.assertEqual([r['filename'] for r in data['results']],
+                         ['a.csv', 'bad.csv', 'plant.zip/plant/2019.csv', 'more.tar.gz/2020.csv', 'broken.zip'])
+        self.assertEqual((data['created'], data['failed']), (3, 2))
+        self.assertIn('Missing required columns', data['results'][1]['error'])
+        self.assertIn('Unreadable archive', data['results'][4]['error'])
+        for result in (data['results'][0], data['results'][2], data['results'][3]):
+            self.assertEqual(result['summary']['total_count'], 2)
+            self.assertEqual(result['coercion_errors']['flowrate'], 1)
+            dataset = Dataset.objects.get(pk=result['id'])
+            self.assertEqual(dataset.uploaded_by, self.user)
+            self.assertIsNotNone(load_columnar(dataset.id))
+        self.assertEqual(Dataset.objects.count(), 3)
+
+    def test_batch_larger_than_keep_latest_survives_trim(self):
+        older = self.client.post(reverse('dataset-upload'), {'file': self.named(self.CSV, 'old.csv')}).json()['id']
+        with override_settings(DATASETS_KEEP_LATEST=2):
+            files = [self.named(self.CSV, f'{i}.csv') for i in range(4)]
+            resp = self.client.post(reverse('dataset-upload-batch'), {'files': files})
+        self.assertEqual(resp.status_code, 201)
+        ids = [r['id'] for r in resp.json()['results']]
+        self.assertEqual(len(ids), 4)
+        for dataset_id in ids:
+            self.assertEqual(self.client.get(reverse('dataset-summary', args=[dataset_id])).status_code, 200)
+        self.assertFalse(Dataset.objects.filter(pk=older).exists())
+
+    def test_batch_size_limit(self):
+        with override_settings(DATASETS_BATCH_MAX_FILES=1):
+            resp = self.client.post(reverse('dataset-upload-batch'),
+                                    {'files': [self.named(self.CSV, 'a.csv'), self.named(self.CSV, 'b.csv')]})
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(Dataset.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='datasets-test-media-'))
+class ResumableUploadTest(TestCase):
+    CSV = b"Equipment Name,Type,Flowrate,Pressure,Temperature\n" + b"".join(
+        f"Unit {i},{['Pump', 'Valve'][i % 2]},{i},1.5,{40 + i}\n".encode() for i in range(20)
+    )
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='chunkuser', password='pass')
+        self.client.force_login(self.user)
+        # small chunks so a tiny CSV spans several
+        for target in ('datasets.report_cache.DIGEST_BLOCK_BYTES', 'datasets.uploads.DIGEST_BLOCK_BYTES'):
+            patcher = mock.patch(target, 128)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def start(self):
+        resp = self.client.post(reverse('upload-session-create'), {'filename': 'big.csv', 'size': len(self.CSV)},
+                                content_type='application/json')
+        self.assertEqual(resp.status_code, 201)
+        return resp.json()
+
+    def put_chunk(self, session, index, data=None):
+        data = self.CSV[index * 128:(index + 1) * 128] if data is None else data
+        digest = base64.b64encode(hashlib.sha256(self.CSV[index * 128:(index + 1) * 128]).digest()).decode()
+        return self.client.put(reverse('upload-chunk', args=[session['id'], index]), data,
+                               content_type='application/octet-stream', HTTP_CONTENT_DIGEST=f'sha-256=:{digest}:')
+
+    def test_chunks_resume_and_assemble_in_place(self):
+        session = self.start()
+        chunks = session['chunks']
+        self.assertEqual((session['chunk_size'], chunks, session['received']), (128, -(-len(self.CSV) // 128), []))
+
+        # out of order; a chunk damaged in transit is refused and not counted
+        for index in reversed(range(1, chunks)):
+            self.assertEqual(self.put_chunk(session, index).status_code, 200)
+        self.assertEqual(self.put_chunk(session, 0, b'x' * 128).status_code, 400)
+        resp = self.client.post(reverse('upload-finalize', args=[session['id']]), {}, content_type='application/json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('1 chunk(s) missing: 0', resp.json()['error'])
+
+        # resuming: the session says what is still missing
+        state = self.client.get(reverse('upload-session', args=[session['id']])).json()
+        self.assertEqual(state['received'], list(range(1, chunks)))
+        self.assertEqual(self.put_chunk(session, 0).status_code, 200)
+        bad = self.client.post(reverse('upload-finalize', args=[session['id']]), {'digest': '0' * 64},
+                               content_type='application/json')
+        self.assertEqual(bad.status_code, 400)
+
+        digest = hashlib.sha256(b''.join(hashlib.sha256(self.CSV[i:i + 128]).digest()
+                                         for i in range(0, len(self.CSV), 128))).hexdigest()
+        resp = self.client.post(reverse('upload-finalize', args=[session['id']]), {'digest': digest},
+                                content_type='application/json')
+        self.assertEqual(resp.status_code, 201)
+        dataset = Dataset.objects.get(pk=resp.json()['id'])
+        self.assertEqual(dataset.total_rows, 20)
+        self.assertEqual(dataset.filename, 'big.csv')
+        with gzip.open(dataset.csv_file.path) as f:
+            self.assertEqual(f.read(), self.CSV)
+        # assembled in place, then replaced by the gzip copy like any upload
+        self.assertEqual(os.path.basename(dataset.csv_file.path), f'{dataset.id}.csv.gz')
+        for suffix in ('.csv', '.csv.part'):
+            self.assertFalse(os.path.exists(dataset.csv_file.path[:-len('.csv.gz')] + suffix))
+        self.assertEqual(self.client.post(reverse('upload-finalize', args=[session['id']])).status_code, 409)
+
+        # the digest built from the chunks is the one a plain upload of the same bytes hashes to
+        resp = self.client.post(reverse('dataset-upload'), {'file': io.BytesIO(self.CSV)})
+        self.assertEqual(Dataset.objects.get(pk=resp.json()['id']).ingest_timings['mode'], 'cached')
+
+    def test_concurrent_finalize_loses_with_409(self):
+        session = self.start()
+        for index in range(session['chunks']):
+            self.put_chunk(session, index)
+        url = reverse('upload-finalize', args=[session['id']])
+        racing = []
+
+        def complete_while_another_finalizes(*args, **kwargs):
+            # a second call arriving while the first is assembling the file
+            racing.append(self.client.post(url))
+            return complete_upload(*args, **kwargs)
+
+        with mock.patch('datasets.views.complete_upload', side_effect=complete_while_another_finalizes):
+            resp = self.client.post(url)
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(racing[0].status_code, 409)
+        self.assertEqual(Dataset.objects.count(), 1)
+
+    def test_async_finalize_and_privacy(self):
+        session = self.start()
+        other = User.objects.create_user(username='other', password='pass')
+        self.client.force_login(other)
+        self.assertEqual(self.put_chunk(session, 0).status_code, 404)
+        self.client.force_login(self.user)
+
+        resp = self.client.put(reverse('upload-chunk', args=[session['id'], 0]), self.CSV[:128],
+                               content_type='application/octet-stream')
+        self.assertEqual(resp.status_code, 400)
+        for index in range(session['chunks']):
+            self.put_chunk(session, index)
+        resp = self.client.post(reverse('upload-finalize', args=[session['id']]) + '?async=true')
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(worker_loop(once=True), 1)
+        job = self.client.get(resp.json()['status_url']).json()
+        self.assertEqual(job['status'], Job.STATUS_DONE)
+        self.assertEqual(Dataset.objects.get(pk=job['dataset']).total_rows, 20)
+
+
+class AnalyticsEngineTest(TestCase):
+    def make_frame(self):
+        return pd.DataFrame({
+            'Equipment Name': ['P1', 'P2', 'P3', 'P4', 'P5', 'P6', 'P7'],
+            'Type': ['Pump', 'Pump', 'Valve', 'Valve', 'Pump', 'Reactor', 'Pump'],
+            'Flowrate': [10, 10, 0, 4, np.nan, 300, 10],
+            'Pressure': [1.0, 2.0, 3.0, np.nan, 5.0, 6.0, 7.0],
+            'Temperature': [np.nan] * 7,
+        })
+
+    def test_matches_pandas_reference(self):
+        df = self.make_frame()
+        ref = clean_dataframe(df.copy())
+        out = analyze_dataframe(df)
+
+        self.assertEqual(out['row_count'], 7)
+        self.assertEqual(out['missing_values']['flowrate'], 1)
+        for col in ('flowrate', 'pressure'):
+            s = ref[col].dropna()
+            self.assertAlmostEqual(out['stats'][col]['mean'], s.mean())
+            self.assertAlmostEqual(out['stats'][col]['median'], s.median())
+            self.assertAlmostEqual(out['stats'][col]['std'], s.std())
+            self.assertEqual(out['stats'][col]['count'], len(s))
+            self.assertEqual(
+                out['top_values'][col]['top'],
+                ref[['equipment name', col]].dropna(subset=[col]).nlargest(5, col).to_dict(orient='records'),
+            )
+            self.assertEqual(
+                out['top_values'][col]['low'],
+                ref[['equipment name', col]].dropna(subset=[col]).nsmallest(5, col).to_dict(orient='records'),
+            )
+
+        corr = ref[NUMERIC_COLS].corr().fillna(0)
+        self.assertAlmostEqual(out['correlation_matrix']['flowrate']['pressure'], corr.loc['flowrate', 'pressure'])
+        self.assertEqual(out['correlation_matrix']['temperature']['temperature'], 0)
+        self.assertEqual(out['outliers']['flowrate']['count'], 1)
+        self.assertEqual(out['outliers']['flowrate']['examples'][0]['equipment name'], 'P6')
+
+    def test_empty_numeric_column(self):
+        out = analyze_dataframe(self.make_frame())
+        self.assertEqual(out['stats']['temperature']['count'], 0)
+        self.assertIsNone(out['stats']['temperature']['mean'])
+        self.assertEqual(out['histograms']['temperature'], {'bins': [], 'counts': []})
+        self.assertIn('1 equipment items have zero flowrate', out['insights'])
+
+
+class TypedParsingTest(TestCase):
+    CSV = (
+        "Site,Equipment Name,Batch,Type,Flowrate,Operator,Pressure,Temperature\n"
+        "North,Pump A,1,Pump,10, ann ,1.2,45\n"
+        "North,,2,Valve,n/a,bob,0.8,30\n"
+        "South,Reactor 1,3,Reactor, 1e2 ,cy,--,120\n"
+        "South,Pump C,4,,12.5,dee,inf,\n"
+        "East,Valve B,5,Valve,.5,eve,1_0,-4\n"
+    )
+
+    def write(self, text):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_matches_full_read(self):
+        path = self.write(self.CSV)
+        df, errors = validate_and_read_csv(path)
+
+        self.assertEqual(list(df.columns), ['equipment name', 'type', 'flowrate', 'pressure', 'temperature'])
+        ref = pd.read_csv(path)
+        ref.columns = [c.lower() for c in ref.columns]
+        ref = ref[list(df.columns)]
+        for col in NUMERIC_COLS:
+            expected = pd.to_numeric(ref[col], errors='coerce')
+            self.assertEqual(errors[col], int(expected.isna().sum()))
+            pd.testing.assert_series_equal(df[col], expected.astype('float64'), check_names=False)
+        pd.testing.assert_frame_equal(clean_dataframe(df), clean_dataframe(ref))
+
+    def test_ragged_rows_fall_back_to_c_engine(self):
+        path = self.write(self.CSV + "West,Pump D,6,Pump,7,fay,1.0\n")
+        df = read_required_columns(path)
+        self.assertEqual(len(df), 6)
+        self.assertTrue(np.isnan(coerce_numeric(df['temperature']).iloc[-1]))
+
+    def test_numeric_looking_text_same_on_both_engines(self):
+        path = self.write(
+            "Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+            "007,01,1,2,3\nNA,NA,1,2,3\n1e5,Pump,1,2,3\n0012,,4,5,6\n"
+        )
+        arrow = read_required_columns(path)
+        with mock.patch('datasets.parsing.pa', None):
+            c_engine = read_required_columns(path)
+        self.assertEqual(list(arrow['equipment name'][[0, 2, 3]]), ['007', '1e5', '0012'])
+        self.assertTrue(pd.isna(arrow['equipment name'][1]))
+        self.assertEqual(list(arrow['type'].astype(str)), ['01', 'nan', 'Pump', 'nan'])
+        pd.testing.assert_frame_equal(clean_dataframe(arrow), clean_dataframe(c_engine))
+
+    def test_coerce_numeric_matches_to_numeric(self):
+        values = pd.Series(['1', ' -2.5 ', '1e3', '+.5', 'abc', None, '0x10', 'NaN', '-inf', '', '7.'], dtype=object)
+        np.testing.assert_array_equal(
+            coerce_numeric(values).to_numpy(), pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64')
+        )
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='datasets-test-media-'))
+class StreamingIngestTest(TestCase):
+    CSV = (
+        b"Equipment Name,Type,Flowrate,Pressure,Temperature,Notes\n"
+        b"Pump A,Pump,10,1.2,45,a\n"
+        b"Valve B,Valve,5,0.8,30,b\n"
+        b"Reactor 1,Reactor,100,2.5,120,c\n"
+        b"Pump C,Pump,bad,1.1,40,d\n"
+        b"Sensor X,Sensor,0,0.1,\n"
+        b"Reactor 2,Reactor,95,2.6,125,e\n"
+        b"Cooling Tower,Cooling Unit,150,1.1,15,f\n"
+    )
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='streamuser', password='pass')
+        self.client.force_login(self.user)
+
+    def upload(self):
+        resp = self.client.post(reverse('dataset-upload'), {'file': io.BytesIO(self.CSV)})
+        self.assertEqual(resp.status_code, 201)
+        return resp.json()
+
+    def assertAnalyticsClose(self, a, b):
+        if isinstance(a, dict):
+            self.assertEqual(list(a.keys()), list(b.keys()))
+            for k in a:
+                self.assertAnalyticsClose(a[k], b[k])
+        elif isinstance(a, list):
+            self.assertEqual(len(a), len(b))
+            for x, y in zip(a, b):
+                self.assertAnalyticsClose(x, y)
+        elif isinstance(a, float):
+            self.assertAlmostEqual(a, b, places=9)
+        else:
+            self.assertEqual(a, b)
+
+    def test_streaming_matches_in_memory_path(self):
+        in_memory = self.upload()
+        with self.settings(DATASETS_STREAMING_THRESHOLD_BYTES=0, DATASETS_STREAMING_CHUNK_ROWS=2):
+            streamed = self.upload()
+
+        self.assertEqual(streamed['coercion_errors'], in_memory['coercion_errors'])
+        self.assertAnalyticsClose(streamed['analytics'], in_memory['analytics'])
+
+        table = self.client.get(reverse('dataset-table', args=[streamed['id']]), {'page_size': 3}).json()
+        self.assertEqual(table['total'], 7)
+        self.assertEqual(table['rows'][2]['equipment name'], 'Reactor 1')
+
+    def test_numeric_looking_names_kept_as_text(self):
+        csv = (b"Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+               b"007,01,1,2,3\nNA,Pump,1,2,3\n1e5,Pump,1,2,3\n0012,Valve,4,5,6\n")
+        expected = [['007', '01'], ['nan', 'Pump'], ['1e5', 'Pump'], ['0012', 'Valve']]
+        for threshold in (1 << 30, 0):
+            with self.subTest(threshold=threshold), self.settings(DATASETS_STREAMING_THRESHOLD_BYTES=threshold):
+                dataset_id = self.client.post(reverse('dataset-upload'), {'file': io.BytesIO(csv)}).json()['id']
+                table = reverse('dataset-table', args=[dataset_id])
+                rows = self.client.get(table).json()['rows']
+                self.assertEqual([[r['equipment name'], r['type']] for r in rows], expected)
+                # a copy rebuilt from the cleaned CSV reads the text the same way
+                remove_columnar(dataset_id)
+                rows = self.client.get(table).json()['rows']
+                self.assertEqual([[r['equipment name'], r['type']] for r in rows], expected)
+
+    def test_blank_types_not_counted_as_a_type(self):
+        csv = b"Equipment Name,Type,Flowrate,Pressure,Temperature\nPump A,Pump,10,1.2,45\nMystery,,5,0.8,30\n"
+        for threshold in (1 << 30, 0):
+            with self.subTest(threshold=threshold), self.settings(DATASETS_STREAMING_THRESHOLD_BYTES=threshold):
+                data = self.client.post(reverse('dataset-upload'), {'file': io.BytesIO(csv)}).json()
+                self.assertEqual(data['summary']['type_distribution'], {'Pump': 1})
+                self.assertEqual(data['analytics']['type_distribution'], {'Pump': 1})
+                self.assertEqual(Dataset.objects.get(pk=data['id']).type_distribution, {'Pump': 1})
+
+    def test_stage_timings_recorded_and_frame_cleaned_once(self):
+        with mock.patch('datasets.utils.clean_dataframe', wraps=clean_dataframe) as clean:
+            in_memory = self.upload()
+        self.assertEqual(clean.call_count, 1)
+        with self.settings(DATASETS_STREAMING_THRESHOLD_BYTES=0, DATASETS_STREAMING_CHUNK_ROWS=2):
+            streamed = self.upload()
+
+        dataset = Dataset.objects.get(pk=in_memory['id'])
+        timings = dataset.ingest_timings
+        self.assertEqual(timings['mode'], 'memory')
+        self.assertEqual(list(timings['stages']), ['parse', 'clean', 'analyze', 'persist', 'render'])
+        self.assertTrue(all(s['ms'] > 0 and s['peak_mb'] > 0 for s in timings['stages'].values()))
+        self.assertGreaterEqual(timings['total_ms'], sum(s['ms'] for s in timings['stages'].values()))
+        self.assertEqual(Dataset.objects.get(pk=streamed['id']).ingest_timings['mode'], 'stream')
+
+        # the summary is read off the analytics, not recomputed
+        stats = in_memory['analytics']['stats']
+        self.assertEqual(in_memory['summary']['averages'], {col: stats[col]['mean'] for col in NUMERIC_COLS})
+        self.assertEqual(in_memory['summary']['type_distribution'], in_memory['analytics']['type_distribution'])
+
+        admin = User.objects.create_superuser(username='streamadmin', password='pass')
+        self.client.force_login(admin)
+        page = self.client.get(reverse('admin:datasets_dataset_change', args=[dataset.pk]))
+        self.assertContains(page, 'Ingest Stages')
+        self.assertContains(page, '<td>analyze</td>', html=False)
+
+    def test_quantile_sketch_rank_error(self):
+        rng = np.random.default_rng(1)
+        values = rng.normal(size=300_000)
+        sketch = QuantileSketch()
+        other = QuantileSketch()
+        for chunk in np.array_split(values[:150_000], 7):
+            sketch.update(chunk)
+        other.update(values[150_000:])
+        sketch.merge(other)
+
+        self.assertEqual(sketch.count, len(values))
+        ordered = np.sort(values)
+        for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+            rank = np.searchsorted(ordered, sketch.quantile(q)) / len(values)
+            self.assertLess(abs(rank - q), 0.005)
+
+        restored = QuantileSketch.from_state(sketch.to_state())
+        self.assertEqual(restored.quantile(0.5), sketch.quantile(0.5))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='datasets-test-media-'))
+class ChartRenderingTest(TestCase):
+    def test_all_charts_render_in_pool_and_in_process(self):
+        df = clean_dataframe(pd.DataFrame({
+            'Equipment Name': ['A', 'B', 'C', 'D'],
+            'Type': ['Pump', 'Valve', 'Pump', 'Mixer'],
+            'Flowrate': [1.0, 2.0, 3.5, 8.0],
+            'Pressure': [0.5, 0.7, 0.6, 1.2],
+            'Temperature': [20.0, 35.0, 30.0, 80.0],
+        }))
+        expected = {'type_dist', 'flow_vs_temp', 'flowrate_hist', 'pressure_hist', 'temperature_hist', 'correlation'}
+        for workers in (1, 2):
+            with tempfile.TemporaryDirectory() as tmpdir:
+                images = generate_charts(df, tmpdir, workers=workers)
+                self.assertEqual(set(images), expected)
+                for path in images.values():
+                    with open(path, 'rb') as f:
+                        self.assertEqual(f.read(8), b'\x89PNG\r\n\x1a\n')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='datasets-test-media-'))
+class ReportCacheTest(TestCase):
+    csv_content = (
+        b"Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+        b"Pump A,Pump,10,1.2,45\nValve B,Valve,5,0.8,30\nReactor C,Reactor,7,2.5,120\n"
+    )
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reportcacheuser', password='pass')
+        self.client.force_login(self.user)
+
+    def upload(self, content):
+        resp = self.client.post(reverse('dataset-upload'), {'file': io.BytesIO(content)})
+        self.assertEqual(resp.status_code, 201)
+        return resp.json()
+
+    def test_reupload_reuses_analytics_and_charts(self):
+        first = self.upload(self.csv_content)
+        with mock.patch('datasets.utils.generate_charts', side_effect=AssertionError('charts re-rendered')), \
+                mock.patch('datasets.utils.analyze_clean_dataframe', side_effect=AssertionError('analytics recomputed')):
+            second = self.upload(self.csv_content)
+            # Same cleaned data behind different raw bytes (an extra column) also hits the cache
+            third = self.upload(self.csv_content.replace(b'Temperature\n', b'Temperature,Note\n'))
+
+        a, b, c = (Dataset.objects.get(pk=r['id']) for r in (first, second, third))
+        self.assertEqual(a.content_hash, b.content_hash)
+        self.assertEqual(a.content_hash, c.content_hash)
+        self.assertEqual(second['analytics'], first['analytics'])
+        self.assertEqual(second['summary'], first['summary'])
+        self.assertEqual(load_columnar(b.id).rows, 3)
+        resp = self.client.get(reverse('dataset-table', args=[b.id]))
+        self.assertEqual(resp.json()['rows'][2]['equipment name'], 'Reactor C')
+
+        resp = self.client.get(reverse('dataset-report', args=[b.id]), {'refresh': 'true'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(b''.join(resp.streaming_content)[:4], b'%PDF')
+
+    def test_lru_eviction_by_bytes(self):
+        first = self.upload(self.csv_content)
+        key = Dataset.objects.get(pk=first['id']).content_hash
+        self.assertTrue(os.path.isdir(entry_dir(key)))
+        self.assertGreater(evict_cache(max_bytes=0), 0)
+        self.assertFalse(os.path.isdir(entry_dir(key)))
+
+        # Datasets keep their own links, so eviction never breaks existing reads
+        resp = self.client.get(reverse('dataset-table', args=[first['id']]))
+        self.assertEqual(resp.json()['total'], 3)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='datasets-test-media-'))
+class TableQueryTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='queryuser', password='pass')
+        self.client.force_login(self.user)
+        rng = np.random.default_rng(3)
+        self.df = clean_dataframe(pd.DataFrame({
+            'Equipment Name': [f'Pump-{i}' if i % 3 else f'Valve-{i}' for i in range(1000)],
+            'Type': rng.choice(['Pump', 'Valve', 'Mixer', 'Reactor'], size=1000),
+            'Flowrate': np.where(rng.random(1000) < 0.05, np.nan, rng.uniform(0, 100, size=1000)),
+            'Pressure': rng.uniform(0, 10, size=1000),
+            'Temperature': rng.uniform(20, 200, size=1000),
+        })).reset_index(drop=True)
+        self.dataset = Dataset.objects.create(filename='query.csv', uploaded_by=self.user)
+        write_columnar(self.df, self.dataset.id)
+        self.url = reverse('dataset-table', args=[self.dataset.id])
+
+    def expected(self, sort=None, ascending=True):
+        df = self.df
+        df = df[df['type'].isin(['Pump', 'Valve']) & (df['flowrate'] >= 20) & (df['flowrate'] < 80)
+                & df['equipment name'].str.lower().str.contains('valve')]
+        if sort:
+            df = df.sort_values(sort, ascending=ascending, kind='stable')
+        return list(df['equipment name'])
+
+    def test_offset_filters_match_pandas(self):
+        params = {'type__in': 'Pump,Valve', 'flowrate__gte': '20', 'flowrate__lt': '80', 'name__contains': 'VALVE',
+                  'sort': 'pressure', 'page_size': 25}
+        expected = self.expected(sort='pressure')
+        resp = self.client.get(self.url, {**params, 'page': 2})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['total'], len(expected))
+        self.assertEqual([r['equipment name'] for r in resp.json()['rows']], expected[25:50])
+
+        resp = self.client.get(self.url, {'type': 'Mixer', 'page_size': 1000})
+        self.assertEqual(resp.json()['total'], int((self.df['type'] == 'Mixer').sum()))
+
+    def test_cursor_walk_matches_offset_pages(self):
+        params = {'type__in': 'Pump,Valve', 'flowrate__gte': '20', 'flowrate__lt': '80', 'name__contains': 'valve',
+                  'sort': 'temperature', 'order': 'desc', 'page_size': 7}
+        names, cursor, first = [], '', None
+        while cursor is not None:
+            data = self.client.get(self.url, {**params, 'cursor': cursor}).json()
+            first = first or data
+            names += [r['equipment name'] for r in data['rows']]
+            cursor = data['next_cursor']
+        self.assertEqual(names, self.expected(sort='temperature', ascending=False))
+        self.assertEqual(first['total'], len(names))
+
+    def test_column_layout_matches_rows(self):
+        params = {'type': 'Pump', 'sort': 'flowrate', 'page_size': 300}
+        rows = self.client.get(self.url, params).json()['rows']
+        resp = self.client.get(self.url, {**params, 'layout': 'columns'})
+        columns = resp.json()['columns']
+        self.assertEqual(list(columns), list(rows[0]))
+        for col, values in columns.items():
+            # missing readings are null here and '' in row objects
+            self.assertEqual(values, [r[col] if r[col] != '' else None for r in rows])
+        self.assertIn(None, columns['flowrate'])
+        self.assertEqual(self.client.get(self.url, {'layout': 'grid'}).status_code, 400)
+
+    def test_arrow_stream_matches_json(self):
+        params = {'type': 'Pump', 'sort': 'flowrate', 'page_size': 300}
+        columns = self.client.get(self.url, {**params, 'layout': 'columns'}).json()['columns']
+        resp = self.client.get(self.url, params, HTTP_ACCEPT='application/vnd.apache.arrow.stream')
+        self.assertEqual(resp['Content-Type'], 'application/vnd.apache.arrow.stream')
+        table = pa.ipc.open_stream(resp.content).read_all()
+        self.assertEqual(table.to_pydict(), columns)
+        metadata = {k.decode(): json.loads(v) for k, v in table.schema.metadata.items()}
+        self.assertEqual(metadata, {'total': int((self.df['type'] == 'Pump').sum()), 'page': 1, 'page_size': 300})
+
+        # keyset pages carry their cursor; errors stay JSON
+        resp = self.client.get(self.url, {'cursor': '', 'page_size': 10, 'format': 'arrow'})
+        self.assertIsNotNone(json.loads(pa.ipc.open_stream(resp.content).schema.metadata[b'next_cursor']))
+        resp = self.client.get(self.url, {'cursor': 'junk', 'format': 'arrow'})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp['Content-Type'], 'application/json')
+        self.assertIn('error', resp.json())
+
+    def test_export_streams_filtered_sorted_rows(self):
+        export = reverse('dataset-export', args=[self.dataset.id])
+        params = {'type__in': 'Pump,Valve', 'flowrate__gte': '20', 'flowrate__lt': '80', 'name__contains': 'valve',
+                  'sort': 'temperature', 'order': 'desc'}
+        with mock.patch('datasets.query.EXPORT_BLOCK_ROWS', 100):
+            resp = self.client.get(export, params)
+            self.assertTrue(resp.streaming)
+            self.assertEqual(resp['Content-Type'], 'text/csv')
+            df = pd.read_csv(io.BytesIO(b''.join(resp.streaming_content)))
+        self.assertEqual(list(df.columns), list(self.df.columns))
+        self.assertEqual(list(df['equipment name']), self.expected(sort='temperature', ascending=False))
+
+        resp = self.client.get(export, {'type': 'Pump', 'format': 'ndjson'})
+        self.assertEqual(resp['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(resp.streaming_content).splitlines()]
+        pumps = self.df[self.df['type'] == 'Pump']
+        self.assertEqual([r['equipment name'] for r in lines], list(pumps['equipment name']))
+        self.assertEqual(sum(r['flowrate'] is None for r in lines), int(pumps['flowrate'].isna().sum()))
+
+        empty = self.client.get(export, {'type': 'Nothing'}, HTTP_ACCEPT='text/csv')
+        self.assertEqual(b''.join(empty.streaming_content).decode().strip(), ','.join(self.df.columns))
+        resp = self.client.get(export, {'flowrate__gte': 'high'})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('error', resp.json())
+
+    def test_invalid_cursor_and_filter_values(self):
+        data = self.client.get(self.url, {'cursor': '', 'page_size': 10}).json()
+        self.assertEqual(data['total'], 1000)
+        resp = self.client.get(self.url, {'cursor': data['next_cursor'], 'type': 'Pump'})
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.get(self.url, {'pressure__gte': 'high'})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_page_size_validated_in_both_modes(self):
+        # a zero or negative page_size would hand back a cursor that never advances
+        for params in ({'page_size': 0}, {'page_size': -5}, {'page_size': 10001}, {'page_size': 'ten'}, {'page': 'x'},
+                       {'page': 0}):
+            for mode in ({}, {'cursor': ''}):
+                with self.subTest(**params, **mode):
+                    resp = self.client.get(self.url, {**params, **mode})
+                    self.assertEqual(resp.status_code, 400)
+                    self.assertIn('error', resp.json())
+        data = self.client.get(self.url, {'cursor': '', 'page_size': 1}).json()
+        self.assertEqual(len(data['rows']), 1)
+        self.assertIsNotNone(data['next_cursor'])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='datasets-test-media-'))
+class AppendTest(TestCase):
+    HEADER = b"Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+    BASE = HEADER + b"".join(
+        f"Unit {i},{['Pump', 'Valve', 'Mixer'][i % 3]},{10 + i * 3},{1 + (i % 7) * 0.2:.1f},{40 + i}\n".encode()
+        for i in range(40)
+    )
+    # widens the flowrate range, adds a missing reading and a new type
+    BATCH = HEADER + b"Unit 40,Pump,500,1.4,90\nUnit 41,Reactor,bad,2.5,130\nUnit 42,Valve,0,0.1,\n"
+
+    assertAnalyticsClose = StreamingIngestTest.assertAnalyticsClose
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='appenduser', password='pass')
+        self.client.force_login(self.user)
+        resp = self.client.post(reverse('dataset-upload'), {'file': io.BytesIO(self.BASE)})
+        self.dataset_id = resp.json()['id']
+        self.url = reverse('dataset-append', args=[self.dataset_id])
+
+    def assertMatchesFullRecompute(self, analytics, raw):
+        expected = analyze_dataframe(pd.read_csv(io.BytesIO(raw)))
+        self.assertEqual(analytics.pop('type_distribution'), expected.pop('type_distribution'))
+        for col in NUMERIC_COLS:
+            self.assertEqual(analytics['outliers'][col]['count'], expected['outliers'][col]['count'])
+        analytics.pop('outliers'), expected.pop('outliers')
+        self.assertAnalyticsClose(analytics, expected)
+
+    def test_append_csv_updates_analytics_and_data(self):
+        resp = self.client.post(self.url, {'file': io.BytesIO(self.BATCH)})
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(data['appended'], 3)
+        self.assertEqual(data['total_rows'], 43)
+        self.assertEqual(data['coercion_errors']['flowrate'], 1)
+        self.assertMatchesFullRecompute(data['analytics'], self.BASE + self.BATCH[len(self.HEADER):])
+
+        d = Dataset.objects.get(pk=self.dataset_id)
+        self.assertIsNone(d.content_hash)
+        self.assertEqual(len(pd.read_csv(d.cleaned_csv.path)), 43)
+        table = self.client.get(reverse('dataset-table', args=[self.dataset_id]), {'sort': 'flowrate', 'order': 'desc', 'page_size': 1})
+        self.assertEqual(table.json()['total'], 43)
+        self.assertEqual(table.json()['rows'][0]['equipment name'], 'Unit 40')
+        resp = self.client.get(reverse('dataset-report', args=[self.dataset_id]))
+        self.assertEqual(resp.status_code, 200)
+
+    def test_append_json_rows_and_rebuild_missing_state(self):
+        d = Dataset.objects.get(pk=self.dataset_id)
+        os.remove(d.analytics_state.path)
+        rows = [{'Equipment Name': 'Unit 50', 'Type': 'Mixer', 'Flowrate': 42, 'Pressure': 1.0, 'Temperature': 60}]
+        resp = self.client.post(self.url, {'rows': rows}, content_type='application/json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertMatchesFullRecompute(resp.json()['analytics'], self.BASE + b"Unit 50,Mixer,42,1.0,60\n")
+
+        resp = self.client.post(self.url, {'rows': [{'name': 'x'}]}, content_type='application/json')
+        self.assertEqual(resp.status_code, 400)
+
+    def test_appended_csv_parsed_like_an_upload(self):
+        batch = self.HEADER + b"007,01,1,2,3\nNA,Pump,1,2,3\n"
+        resp = self.client.post(self.url, {'file': io.BytesIO(batch)})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual((resp.json()['appended'], resp.json()['total_rows']), (2, 42))
+        rows = self.client.get(reverse('dataset-table', args=[self.dataset_id]), {'page': 21, 'page_size': 2}).json()['rows']
+        self.assertEqual([[r['equipment name'], r['type']] for r in rows], [['007', '01'], ['nan', 'Pump']])
+        d = Dataset.objects.get(pk=self.dataset_id)
+        self.assertEqual(d.total_rows, len(load_columnar(self.dataset_id)))
+        self.assertEqual(d.analytics['row_count'], 42)
+
+    def test_failed_append_leaves_files_and_row_unchanged(self):
+        d = Dataset.objects.get(pk=self.dataset_id)
+        with open(d.cleaned_csv.path, 'rb') as f:
+            clean_before = f.read()
+        with open(d.analytics_state.path, 'rb') as f:
+            state_before = f.read()
+        with mock.patch.object(Dataset, 'save', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                append_rows(d, read_rows(io.BytesIO(self.BATCH)))
+
+        d.refresh_from_db()
+        self.assertEqual(d.total_rows, 40)
+        with open(d.cleaned_csv.path, 'rb') as f:
+            self.assertEqual(f.read(), clean_before)
+        with open(d.analytics_state.path, 'rb') as f:
+            self.assertEqual(f.read(), state_before)
+        self.assertFalse([n for n in os.listdir(os.path.dirname(d.cleaned_csv.path)) if '.tmp-' in n])
+        table = self.client.get(reverse('dataset-table', args=[self.dataset_id]))
+        self.assertEqual(table.json()['total'], 40)
+
+        resp = self.client.post(self.url, {'file': io.BytesIO(self.BATCH)})
+        self.assertEqual(resp.json()['total_rows'], 43)
+        self.assertEqual(len(pd.read_csv(d.cleaned_csv.path)), 43)
+
+    def test_dataset_lock_is_exclusive(self):
+        order = []
+        held = threading.Event()
+
+        def first():
+            with dataset_lock(self.dataset_id):
+                held.set()
+                time.sleep(0.2)
+                order.append('first')
+
+        thread = threading.Thread(target=first)
+        thread.start()
+        held.wait()
+        with dataset_lock(self.dataset_id):
+            order.append('second')
+        thread.join()
+        self.assertEqual(order, ['first', 'second'])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='datasets-test-media-'))
+class ScatterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='scatteruser', password='pass')
+        self.client.force_login(self.user)
+        rng = np.random.default_rng(5)
+        n = 20000
+        df = pd.DataFrame({
+            'equipment name': [f'Unit-{i}' for i in range(n)],
+            'type': 'Pump',
+            'flowrate': rng.normal(100, 5, size=n),
+            'pressure': rng.uniform(0, 10, size=n),
+            'temperature': rng.normal(80, 3, size=n),
+        })
+        # one far outlier and a few missing readings
+        df.loc[123, ['temperature', 'flowrate']] = [400.0, 900.0]
+        df.loc[[5, 6, 7], 'flowrate'] = np.nan
+        self.df = df
+        self.dataset = Dataset.objects.create(filename='scatter.csv', uploaded_by=self.user)
+        write_columnar(df, self.dataset.id)
+        self.url = reverse('dataset-scatter', args=[self.dataset.id])
+
+    def test_sample_keeps_extremes_within_budget(self):
+        data = self.client.get(self.url, {'x': 'temperature', 'y': 'flowrate', 'max_points': 500}).json()
+        finite = self.df.dropna(subset=['temperature', 'flowrate'])
+        self.assertEqual(data['total'], len(finite))
+        self.assertEqual(len(data['points']), 500)
+        xs, ys = zip(*data['points'])
+        self.assertIn([400.0, 900.0], data['points'])
+        self.assertEqual(min(xs), finite['temperature'].min())
+        self.assertEqual(min(ys), finite['flowrate'].min())
+
+    def test_density_grid_counts_every_row_and_cache_resets_on_append(self):
+        from .columnar import append_columnar
+        data = self.client.get(self.url, {'mode': 'density', 'bins': 16}).json()
+        self.assertEqual(sum(c[2] for c in data['cells']), data['total'])
+        self.assertEqual(len(data['x_edges']), 17)
+        self.assertTrue(os.listdir(os.path.join(load_columnar(self.dataset.id).path, 'derived')))
+
+        append_columnar(self.dataset.id, self.df.tail(10))
+        again = self.client.get(self.url, {'mode': 'density', 'bins': 16}).json()
+        self.assertEqual(again['total'], data['total'] + 10)
+
+        for params in ({'x': 'type'}, {'mode': 'hexbin'}, {'max_points': 'all'}, {'mode': 'density', 'bins': 10000}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='datasets-test-media-'))
+class DistributionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='distuser', password='pass')
+        self.client.force_login(self.user)
+        rng = np.random.default_rng(9)
+        n = 5000
+        self.df = pd.DataFrame({
+            'equipment name': [f'Unit-{i}' for i in range(n)],
+            'type': 'Valve',
+            'flowrate': rng.gamma(2.0, 40.0, size=n),
+            'pressure': np.where(rng.random(n) < 0.1, np.nan, rng.normal(5, 2, size=n).round(1)),
+            'temperature': rng.uniform(20, 200, size=n),
+        })
+        self.dataset = Dataset.objects.create(filename='dist.csv', uploaded_by=self.user)
+        write_columnar(self.df, self.dataset.id)
+
+    def test_histogram_and_quantiles_match_numpy(self):
+        pressure = self.df['pressure'].dropna().to_numpy()
+        url = reverse('dataset-histogram', args=[self.dataset.id])
+        for params, kwargs in (({'bins': 50}, {'bins': 50}), ({'bins': 7, 'range': '3,6'}, {'bins': 7, 'range': (3, 6)})):
+            data = self.client.get(url, {'col': 'pressure', **params}).json()
+            counts, edges = np.histogram(pressure, **kwargs)
+            self.assertEqual(data['counts'], counts.tolist())
+            np.testing.assert_allclose(data['bins'], edges)
+        self.assertEqual(data['missing'], int(self.df['pressure'].isna().sum()))
+
+        qs = [0, 0.01, 0.5, 0.937, 1]
+        data = self.client.get(reverse('dataset-quantiles', args=[self.dataset.id]),
+                               {'col': 'flowrate', 'q': ','.join(map(str, qs))}).json()
+        np.testing.assert_allclose([r['value'] for r in data['quantiles']], np.quantile(self.df['flowrate'], qs))
+
+    def test_sorted_columns_built_at_ingest_and_dropped_on_append(self):
+        csv = b"Equipment Name,Type,Flowrate,Pressure,Temperature\nA,Pump,1,2,3\nB,Valve,4,,6\n"
+        dataset_id = self.client.post(reverse('dataset-upload'), {'file': io.BytesIO(csv)}).json()['id']
+        path = load_columnar(dataset_id).path
+        self.assertTrue(os.path.exists(os.path.join(path, 'pressure.sorted.npy')))
+
+        rows = [{'Equipment Name': 'C', 'Type': 'Pump', 'Flowrate': 9, 'Pressure': 0.5, 'Temperature': 7}]
+        self.client.post(reverse('dataset-append', args=[dataset_id]), {'rows': rows}, content_type='application/json')
+        self.assertFalse(os.path.exists(os.path.join(path, 'pressure.sorted.npy')))
+        data = self.client.get(reverse('dataset-quantiles', args=[dataset_id]), {'col': 'pressure', 'q': '0,1'}).json()
+        self.assertEqual([r['value'] for r in data['quantiles']], [0.5, 2.0])
+
+        url = reverse('dataset-histogram', args=[dataset_id])
+        for params in ({'col': 'type'}, {'col': 'pressure', 'bins': 0}, {'col': 'pressure', 'range': '5,1'}):
+            self.assertEqual(self.client.get(url, params).status_code, 400)
+        resp = self.client.get(reverse('dataset-quantiles', args=[dataset_id]), {'col': 'pressure', 'q': '1.5'})
+        self.assertEqual(resp.status_code, 400)
+
+
+class CatalogListTest(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='pass')
+        self.bob = User.objects.create_user(username='bob', password='pass')
+        self.client.force_login(self.alice)
+        for i in range(30):
+            Dataset.objects.create(
+                filename=f'{"pump" if i % 3 == 0 else "valve"}-{i:02d}.csv',
+                uploaded_by=self.alice if i % 2 else self.bob,
+                total_rows=i, analytics={'stats': {'flowrate': {'mean': float(i)}}},
+            )
+        self.url = reverse('dataset-list')
+
+    def test_keyset_pages_walk_newest_first_without_analytics(self):
+        first = self.client.get(self.url, {'page_size': 20}).json()
+        self.assertEqual(len(first['results']), 20)
+        self.assertNotIn('analytics', first['results'][0])
+        self.assertEqual(first['results'][0]['uploaded_by'], 'alice')
+        second = self.client.get(first['next']).json()
+        self.assertIsNone(second['next'])
+
+        names = [d['filename'] for d in first['results'] + second['results']]
+        expected = list(Dataset.objects.order_by('-uploaded_at', '-id').values_list('filename', flat=True))
+        self.assertEqual(names, expected)
+
+    def test_bare_request_keeps_the_original_array(self):
+        data = self.client.get(self.url).json()
+        self.assertIsInstance(data, list)
+        expected = list(Dataset.objects.order_by('-uploaded_at', '-id').values_list('filename', flat=True)[:5])
+        self.assertEqual([d['filename'] for d in data], expected)
+        self.assertIn('stats', data[0]['analytics'])
+
+    def test_fields_and_search(self):
+        data = self.client.get(self.url, {'fields': 'id,filename', 'page_size': 5}).json()
+        self.assertEqual(len(data['results']), 5)
+        self.assertEqual(set(data['results'][0]), {'id', 'filename'})
+        data = self.client.get(self.url, {'fields': 'id,analytics', 'page_size': 1}).json()
+        self.assertIn('stats', data['results'][0]['analytics'])
+        self.assertEqual(self.client.get(self.url, {'fields': 'id,secret'}).status_code, 400)
+
+        data = self.client.get(self.url, {'search': 'PUMP', 'page_size': 100}).json()
+        self.assertEqual(len(data['results']), 10)
+        self.assertTrue(all(d['filename'].startswith('pump') for d in data['results']))
+        data = self.client.get(self.url, {'search': 'bob', 'page_size': 100}).json()
+        self.assertEqual(len(data['results']), 15)
+        data = self.client.get(self.url, {'uploaded_by': 'alice', 'search': 'pump', 'page_size': 100}).json()
+        self.assertEqual({d['uploaded_by'] for d in data['results']}, {'alice'})
+        self.assertEqual(len(data['results']), 5)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='datasets-test-media-'))
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='etaguser', password='pass')
+        self.client.force_login(self.user)
+        csv = b"Equipment Name,Type,Flowrate,Pressure,Temperature\nA,Pump,1,2,3\nB,Valve,4,5,6\n"
+        self.dataset_id = self.client.post(reverse('dataset-upload'), {'file': io.BytesIO(csv)}).json()['id']
+
+    def test_reads_revalidate_until_an_append(self):
+        summary = reverse('dataset-summary', args=[self.dataset_id])
+        table = reverse('dataset-table', args=[self.dataset_id])
+        report = reverse('dataset-report', args=[self.dataset_id])
+
+        resp = self.client.get(summary)
+        etag = resp['ETag']
+        self.assertIn('no-cache', resp['Cache-Control'])
+        self.assertIn('private', resp['Cache-Control'])
+        resp = self.client.get(summary, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.content, b'')
+        resp = self.client.get(summary, HTTP_IF_MODIFIED_SINCE=resp['Last-Modified'])
+        self.assertEqual(resp.status_code, 304)
+
+        # query parameters are part of the representation
+        page_1 = self.client.get(table, {'page_size': 1})['ETag']
+        self.assertNotEqual(page_1, self.client.get(table, {'page_size': 2})['ETag'])
+        pdf = self.client.get(report)
+        self.assertEqual(self.client.get(report, HTTP_IF_NONE_MATCH=pdf['ETag']).status_code, 304)
+
+        rows = [{'Equipment Name': 'C', 'Type': 'Pump', 'Flowrate': 7, 'Pressure': 8, 'Temperature': 9}]
+        self.client.post(reverse('dataset-append', args=[self.dataset_id]), {'rows': rows}, content_type='application/json')
+        resp = self.client.get(summary, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], etag)
+        self.assertEqual(self.client.get(table, {'page_size': 1}, HTTP_IF_NONE_MATCH=page_1).status_code, 200)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(summary, HTTP_IF_NONE_MATCH=etag).status_code, 401)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='datasets-test-media-'))
+class CompressedStorageTest(TestCase):
+    CSV = b"Equipment Name,Type,Flowrate,Pressure,Temperature\nA,Pump,1,2,3\nB,Valve,4,5,6\n"
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='gzipuser', password='pass')
+        self.client.force_login(self.user)
+        self.dataset_id = self.client.post(reverse('dataset-upload'), {'file': io.BytesIO(self.CSV)}).json()['id']
+
+    def test_cleaned_csv_stored_and_served_compressed(self):
+        dataset = Dataset.objects.get(pk=self.dataset_id)
+        self.assertTrue(dataset.cleaned_csv.name.endswith('.csv.gz'))
+        self.assertTrue(dataset.csv_file.name.endswith('.csv.gz'))
+        download = reverse('dataset-download-clean', args=[self.dataset_id])
+
+        resp = self.client.get(download, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', resp['Vary'])
+        compressed = b''.join(resp.streaming_content)
+        plain = self.client.get(download)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(gzip.decompress(compressed), b''.join(plain.streaming_content))
+        self.assertEqual(pd.read_csv(io.BytesIO(gzip.decompress(compressed)))['equipment name'].tolist(), ['A', 'B'])
+
+        rows = [{'Equipment Name': 'C', 'Type': 'Pump', 'Flowrate': 7, 'Pressure': 8, 'Temperature': 9}]
+        self.client.post(reverse('dataset-append', args=[self.dataset_id]), {'rows': rows}, content_type='application/json')
+        appended = b''.join(self.client.get(download, HTTP_ACCEPT_ENCODING='gzip').streaming_content)
+        self.assertEqual(pd.read_csv(io.BytesIO(gzip.decompress(appended)))['equipment name'].tolist(), ['A', 'B', 'C'])
+
+    def test_compressed_uploads_parsed_and_kept_as_sent(self):
+        for method, suffix, threshold in (('gzip', '.csv.gz', 1 << 30), ('bz2', '.csv.bz2', 1)):
+            with self.subTest(method=method), override_settings(DATASETS_STREAMING_THRESHOLD_BYTES=threshold):
+                raw = io.BytesIO()
+                pd.read_csv(io.BytesIO(self.CSV)).to_csv(raw, index=False, compression={'method': method})
+                upload = io.BytesIO(raw.getvalue())
+                upload.name = 'plant.csv'
+                resp = self.client.post(reverse('dataset-upload'), {'file': upload})
+                self.assertEqual(resp.status_code, 201, resp.content)
+                dataset = Dataset.objects.get(pk=resp.json()['id'])
+                self.assertEqual(dataset.total_rows, 2)
+                self.assertTrue(dataset.csv_file.name.endswith(suffix))
+                with open(dataset.csv_file.path, 'rb') as f:
+                    self.assertEqual(f.read(), raw.getvalue())
+
+        zstd = io.BytesIO(b'\x28\xb5\x2f\xfd' + b'\0' * 16)
+        zstd.name = 'plant.csv'
+        with mock.patch('datasets.compression.zstandard', None):
+            resp = self.client.post(reverse('dataset-upload'), {'file': zstd})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('zstandard', resp.json()['error'])
+
+    def test_json_responses_compressed_when_accepted(self):
+        # the summary is several KB; tiny bodies may stay uncompressed (GZipMiddleware pads with random bytes)
+        summary = reverse('dataset-summary', args=[self.dataset_id])
+        resp = self.client.get(summary, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(resp.content)), self.client.get(summary).json())
+        self.assertFalse(self.client.get(summary).has_header('Content-Encoding'))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='datasets-test-media-'))
+class RangeDownloadTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='rangeuser', password='pass')
+        self.client.force_login(self.user)
+        csv = b"Equipment Name,Type,Flowrate,Pressure,Temperature\nA,Pump,1,2,3\nB,Valve,4,5,6\n"
+        self.dataset_id = self.client.post(reverse('dataset-upload'), {'file': io.BytesIO(csv)}).json()['id']
+        self.report = reverse('dataset-report', args=[self.dataset_id])
+
+    def test_ranges_resume_the_same_bytes(self):
+        full = self.client.get(self.report)
+        body = b''.join(full.streaming_content)
+        self.assertEqual(full['Accept-Ranges'], 'bytes')
+
+        head = self.client.get(self.report, HTTP_RANGE='bytes=0-99')
+        self.assertEqual(head.status_code, 206)
+        self.assertEqual(head['Content-Range'], f'bytes 0-99/{len(body)}')
+        tail = self.client.get(self.report, HTTP_RANGE='bytes=100-', HTTP_IF_RANGE=full['ETag'])
+        self.assertEqual(tail.status_code, 206)
+        self.assertEqual(b''.join(head.streaming_content) + b''.join(tail.streaming_content), body)
+        suffix = self.client.get(self.report, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(suffix.streaming_content), body[-10:])
+
+        self.assertEqual(self.client.get(self.report, HTTP_RANGE=f'bytes={len(body)}-').status_code, 416)
+        # a stale validator or several ranges get the whole file
+        self.assertEqual(self.client.get(self.report, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"').status_code, 200)
+        self.assertEqual(self.client.get(self.report, HTTP_RANGE='bytes=0-1,5-6').status_code, 200)
+
+        # gzip-stored CSVs take ranges over the compressed bytes sent
+        download = reverse('dataset-download-clean', args=[self.dataset_id])
+        gz = b''.join(self.client.get(download, HTTP_ACCEPT_ENCODING='gzip').streaming_content)
+        part = self.client.get(download, HTTP_ACCEPT_ENCODING='gzip', HTTP_RANGE='bytes=10-')
+        self.assertEqual(part['Content-Encoding'], 'gzip')
+        self.assertEqual(b''.join(part.streaming_content), gz[10:])
+
+    def test_sendfile_offload(self):
+        with self.settings(DATASETS_SENDFILE='x-accel-redirect', DATASETS_SENDFILE_PREFIX='/protected-media/'):
+            resp = self.client.get(self.report)
+            self.assertEqual(resp['X-Accel-Redirect'], f'/protected-media/reports/{self.dataset_id}.pdf')
+            self.assertEqual(resp.content, b'')
+            self.assertIn('attachment', resp['Content-Disposition'])
+        with self.settings(DATASETS_SENDFILE='x-sendfile'):
+            resp = self.client.get(self.report)
+            self.assertTrue(os.path.isabs(resp['X-Sendfile']))
+            self.assertTrue(os.path.exists(resp['X-Sendfile']))
@@ -0,0 +1,180 @@
+"""
+Resumable chunked uploads for large CSVs.
+
+    POST  uploads/                    {filename, size}: opens a session (id,
+                                      chunk_size, chunks, received)
+    GET   uploads/<id>/               the session, with the chunks received
+    PUT   uploads/<id>/chunks/<n>/    raw bytes of chunk n, with
+                                      Content-Digest: sha-256=:<base64>:
+    POST  uploads/<id>/finalize/      {digest?, async?}: the dataset (201) or
+                                      its queued job (202)
+
+Chunks are DIGEST_BLOCK_BYTES long, except the last, and may arrive in any
+order, in parallel or more than once. Each one is streamed from the request
+to its offset in media/uploads/<dataset id>.csv.part and hashed on the way.
+A chunk whose sha256 does not match its Content-Digest is not recorded, so
+the client sends it again. After a dropped connection the client reads the
+session and sends only the chunks missing from `received`.
+
+Finalize first claims the session with a conditional update, so of two
+concurrent finalize calls only one proceeds and the other gets 409. It then
+checks that every chunk arrived. The recorded chunk digests combine
+into the upload's raw_digest, which keys the report cache, so the file is
+never read again just to hash it. If the client sent a digest, it must
+match. The part file is then renamed to media/uploads/<dataset id>.csv,
+where queued uploads live. From there it is ingested in the request or
+queued for run_jobs. Each byte is written to disk once; ingest then keeps
+the usual gzip copy.
+
+Starting a session deletes sessions that have not been finalized and have
+been idle for DATASETS_UPLOAD_EXPIRY_HOURS, along with their part files.
+"""
+import base64
+import binascii
+import hashlib
+import os
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import UploadChunk, UploadSession
+from .report_cache import DIGEST_BLOCK_BYTES, combine_digests
+from .utils import ensure_media_dirs
+
+CONTENT_DIGEST = re.compile(r'(?:^|,)\s*sha-256=:([A-Za-z0-9+/=]+):')
+# Bytes read from the request per write
+STREAM_BLOCK_BYTES = 1024 * 1024
+
+
+def parse_content_digest(header):
+    """Hex sha256 from a `Content-Digest: sha-256=:<base64>:` header, or None."""
+    match = CONTENT_DIGEST.search(header or '')
+    if not match:
+        return None
+    try:
+        digest = base64.b64decode(match.group(1), validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    return digest.hex() if len(digest) == 32 else None
+
+
+def part_path(session):
+    return os.path.join(settings.MEDIA_ROOT, 'uploads', f'{session.dataset_id_reserved}.csv.part')
+
+
+def final_path(session):
+    return os.path.join(settings.MEDIA_ROOT, 'uploads', f'{session.dataset_id_reserved}.csv')
+
+
+def chunk_count(session):
+    return -(-session.size // session.chunk_size)
+
+
+def received_chunks(session):
+    return list(session.chunks.order_by('index').values_list('index', flat=True))
+
+
+def expire_sessions():
+    """Delete unfinished sessions idle for DATASETS_UPLOAD_EXPIRY_HOURS, and their part files."""
+    cutoff = timezone.now() - timedelta(hours=settings.DATASETS_UPLOAD_EXPIRY_HOURS)
+    stale = UploadSession.objects.exclude(status=UploadSession.STATUS_FINALIZED).filter(updated_at__lt=cutoff)
+    for session in stale:
+        try:
+            os.remove(part_path(session))
+        except OSError:
+            pass
+    return stale.delete()[0]
+
+
+def start_session(filename, size, uploader=None):
+    """Open a session for size bytes, with its part file allocated (sparse) at full length."""
+    if size <= 0:
+        raise ValueError('size must be a positive number of bytes.')
+    if size > settings.DATASETS_UPLOAD_MAX_BYTES:
+        raise ValueError(f'Uploads are limited to {settings.DATASETS_UPLOAD_MAX_BYTES} bytes.')
+    expire_sessions()
+    ensure_media_dirs()
+    session = UploadSession.objects.create(
+        filename=filename, size=size, chunk_size=DIGEST_BLOCK_BYTES, uploaded_by=uploader,
+    )
+    with open(part_path(session), 'wb') as f:
+        f.truncate(size)
+    return session
+
+
+def write_chunk(session, index, stream, sha256):
+    """
+    Write chunk index from stream to its place in the part file, checking
+    its length and sha256 (hex). Raises ValueError if either is off.
+    """
+    if session.status != UploadSession.STATUS_OPEN:
+        raise ValueError('Upload is no longer open.')
+    if not 0 <= index < chunk_count(session):
+        raise ValueError(f'Chunk index must be between 0 and {chunk_count(session) - 1}.')
+    start = index * session.chunk_size
+    length = min(session.chunk_size, session.size - start)
+
+    h = hashlib.sha256()
+    written = 0
+    with open(part_path(session), 'r+b') as f:
+        f.seek(start)
+        while written <= length:
+            block = stream.read(min(STREAM_BLOCK_BYTES, length + 1 - written))
+            if not block:
+                break
+            h.update(block)
+            f.write(block[:max(length - written, 0)])
+            written += len(block)
+
+    if written != length or h.hexdigest() != sha256:
+        # the bytes at this offset are no longer the ones recorded, if any were
+        UploadChunk.objects.filter(session=session, index=index).delete()
+        if written != length:
+            raise ValueError(f'Chunk {index} must be {length} bytes.')
+        raise ValueError(f'Chunk {index} does not match its Content-Digest.')
+    UploadChunk.objects.update_or_create(session=session, index=index, defaults={'sha256': sha256})
+    session.save(update_fields=['updated_at'])
+
+
+def claim_upload(session):
+    """
+    Atomically move an open session to finalized, so only one finalize call
+    assembles it. Returns False if another call claimed it first.
+    """
+    claimed = UploadSession.objects.filter(pk=session.pk, status=UploadSession.STATUS_OPEN).update(
+        status=UploadSession.STATUS_FINALIZED, updated_at=timezone.now()
+    )
+    if claimed:
+        session.status = UploadSession.STATUS_FINALIZED
+    return bool(claimed)
+
+
+def complete_upload(session, digest=None):
+    """
+    Check that every chunk arrived (and digest, if given) and move the part
+    file to media/uploads/<dataset id>.csv. Returns (path, raw_digest or None).
+
+    The session must have been claimed with claim_upload. If a check fails it
+    is reopened, so the client can send the missing chunks and finalize again.
+    """
+    if session.status != UploadSession.STATUS_FINALIZED:
+        raise ValueError('Upload must be claimed before it is completed.')
+    try:
+        digests = dict(session.chunks.values_list('index', 'sha256'))
+        missing = [i for i in range(chunk_count(session)) if i not in digests]
+        if missing:
+            shown = ', '.join(str(i) for i in missing[:20]) + (', ...' if len(missing) > 20 else '')
+            raise ValueError(f'{len(missing)} chunk(s) missing: {shown}.')
+        combined = combine_digests(digests[i] for i in range(chunk_count(session)))
+        if digest and digest.lower() != combined:
+            raise ValueError('Upload digest does not match the chunks received.')
+    except ValueError:
+        UploadSession.objects.filter(pk=session.pk).update(status=UploadSession.STATUS_OPEN, updated_at=timezone.now())
+        session.status = UploadSession.STATUS_OPEN
+        raise
+    path = final_path(session)
+    os.replace(part_path(session), path)
+    # chunks of another size (DIGEST_BLOCK_BYTES changed mid-upload) don't combine into raw_digest
+    return path, combined if session.chunk_size == DIGEST_BLOCK_BYTES else None
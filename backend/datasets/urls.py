@@ -1,16 +1,30 @@
 from django.urls import path
 from .views import (
     DatasetUploadView, DatasetListView, DatasetSummaryView, 
-    DatasetTableView, DatasetReportView, DatasetCleanDownloadView, SignupView
+    DatasetTableView, DatasetReportView, DatasetCleanDownloadView, SignupView,
+    JobStatusView, DatasetAppendView, DatasetScatterView, DatasetHistogramView, DatasetQuantilesView,
+    DatasetExportView, DatasetBatchUploadView, UploadSessionCreateView, UploadSessionView, UploadChunkView,
+    UploadFinalizeView,
 )
 
 urlpatterns = [
     path('signup/', SignupView.as_view(), name='signup'),
     path('datasets/upload/', DatasetUploadView.as_view(), name='dataset-upload'),
+    path('datasets/upload/batch/', DatasetBatchUploadView.as_view(), name='dataset-upload-batch'),
+    path('uploads/', UploadSessionCreateView.as_view(), name='upload-session-create'),
+    path('uploads/<uuid:pk>/', UploadSessionView.as_view(), name='upload-session'),
+    path('uploads/<uuid:pk>/chunks/<int:index>/', UploadChunkView.as_view(), name='upload-chunk'),
+    path('uploads/<uuid:pk>/finalize/', UploadFinalizeView.as_view(), name='upload-finalize'),
+    path('jobs/<uuid:pk>/', JobStatusView.as_view(), name='job-status'),
     path('datasets/', DatasetListView.as_view(), name='dataset-list'),
     path('datasets/<uuid:pk>/analytics/', DatasetSummaryView.as_view(), name='dataset-analytics'),
     path('datasets/<uuid:pk>/summary/', DatasetSummaryView.as_view(), name='dataset-summary'),
+    path('datasets/<uuid:pk>/append/', DatasetAppendView.as_view(), name='dataset-append'),
     path('datasets/<uuid:pk>/table/', DatasetTableView.as_view(), name='dataset-table'),
+    path('datasets/<uuid:pk>/scatter/', DatasetScatterView.as_view(), name='dataset-scatter'),
+    path('datasets/<uuid:pk>/histogram/', DatasetHistogramView.as_view(), name='dataset-histogram'),
+    path('datasets/<uuid:pk>/quantiles/', DatasetQuantilesView.as_view(), name='dataset-quantiles'),
     path('datasets/<uuid:pk>/report/', DatasetReportView.as_view(), name='dataset-report'),
     path('datasets/<uuid:pk>/download_clean/', DatasetCleanDownloadView.as_view(), name='dataset-download-clean'),
+    path('datasets/<uuid:pk>/export/', DatasetExportView.as_view(), name='dataset-export'),
 ]
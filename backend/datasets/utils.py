@@ -2,19 +2,27 @@ import os
 import uuid
 import tempfile
 import shutil
+import numpy as np
 import pandas as pd
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib import colors
 from django.conf import settings
 from .models import Dataset
-from .analytics import analyze_dataframe, clean_dataframe
-
-REQUIRED_COLUMNS = ['equipment name', 'type', 'flowrate', 'pressure', 'temperature']
-
+from .analytics import NUMERIC_COLS, analyze_clean_dataframe, clean_dataframe, known_types
+from .columnar import load_columnar, presort_columns, write_columnar, remove_columnar
+from .streaming import ingest_large_csv, report_sample
+from .report_cache import (
+    chart_images, content_key, evict as evict_cache, load_analytics, lookup_upload, restore_dataset_files,
+    restore_report, restore_state, store_analytics, store_charts, store_dataset_files, store_report, store_state,
+    store_upload, upload_key,
+)
+from .locks import file_lock
+from .incremental import lock_path, state_from_frame, state_path, write_state
+from .compression import GZIP_SUFFIX, RAW_SUFFIXES, compress_file, expanded_size, open_csv_text, sniff_compression
+from .charts import default_workers, render_charts
+from .parsing import coerce_numeric, read_required_columns
+from .pipeline import StageTimings
 
 def ensure_media_dirs():
     uploads = os.path.join(settings.MEDIA_ROOT, 'uploads')
@@ -25,36 +33,17 @@ def ensure_media_dirs():
 
 
 def validate_and_read_csv(infile):
-    # Read with pandas, check columns case-insensitively
-    try:
-        df = pd.read_csv(infile)
-    except Exception as e:
-        raise ValueError(f'Error reading CSV: {e}')
-
-    # Normalize columns
-    cols_lower = [c.strip().lower() for c in df.columns]
-    missing = [c for c in REQUIRED_COLUMNS if c not in cols_lower]
-    if missing:
-        raise ValueError(f'Missing required columns: {missing}. Found columns: {df.columns.tolist()}')
-
-    # Map existing columns to canonical names
-    col_map = {}
-    for orig in df.columns:
-        lower = orig.strip().lower()
-        if lower in REQUIRED_COLUMNS:
-            col_map[orig] = lower
-
-    df = df.rename(columns=col_map)
+    """
+    Parse an upload into its five required columns (canonical names, numerics
+    as float) and count the blank or unparseable readings per numeric column.
+    Only those columns are parsed; see parsing.py.
+    """
+    df = read_required_columns(infile)
 
-    # Coerce numeric columns
-    numeric_cols = ['flowrate', 'pressure', 'temperature']
     coercion_errors = {}
-    for col in numeric_cols:
-        # Coerce and note NaNs
-        coerced = pd.to_numeric(df[col], errors='coerce')
-        n_invalid = coerced.isna().sum()
-        coercion_errors[col] = int(n_invalid)
-        df[col] = coerced
+    for col in NUMERIC_COLS:
+        df[col] = coerce_numeric(df[col])
+        coercion_errors[col] = int(df[col].isna().sum())
 
     return df, coercion_errors
 
@@ -80,122 +69,109 @@ def compute_summary_from_df(df):
     }
 
 
+def summary_from_analytics(analytics):
+    """The legacy summary, read off the analytics instead of recomputed from the frame."""
+    stats = analytics['stats']
+    return {
+        'total_count': analytics['row_count'],
+        'averages': {col: stats[col]['mean'] for col in NUMERIC_COLS},
+        'type_distribution': analytics['type_distribution'],
+        'min_max': {
+            col: ({'min': stats[col]['min'], 'max': stats[col]['max']} if stats[col]['count'] else None)
+            for col in NUMERIC_COLS
+        },
+    }
+
+
 def save_csv_file(src_path, dest_dir, dataset_id):
-    dest = os.path.join(dest_dir, f"{dataset_id}.csv")
-    shutil.copy(src_path, dest)
+    """
+    Keep a gzip copy of the raw upload as <dataset_id>.csv.gz; a queued
+    upload's own file is replaced by it. An upload that arrived compressed is
+    kept byte for byte, as <dataset_id>.csv.gz, .csv.bz2 or .csv.zst.
+    """
+    method = sniff_compression(src_path)
+    dest = os.path.join(dest_dir, f"{dataset_id}.csv{RAW_SUFFIXES.get(method, GZIP_SUFFIX)}")
+    in_place = os.path.abspath(src_path) == os.path.abspath(os.path.join(dest_dir, f"{dataset_id}.csv"))
+    if method is None:
+        compress_file(src_path, dest)
+        if in_place:
+            os.remove(src_path)
+    elif in_place:
+        os.replace(src_path, dest)
+    else:
+        shutil.copyfile(src_path, dest)
     return dest
 
 
-def generate_charts(df, tmpdir, analytics=None):
+def generate_charts(df, tmpdir, analytics=None, workers=None):
     """
     Generate professional, high-fidelity chart images for the PDF report.
     Args:
         df: Processed pandas DataFrame.
         tmpdir: Directory to save PNGs.
-        analytics: Pre-calculated analysis dictionary.
+        analytics: Pre-calculated analysis dictionary; when given, the type
+            counts and correlations are taken from it rather than recomputed.
+        workers: Chart render processes (defaults to DATASETS_CHART_WORKERS).
     Returns:
         Dict mapping chart keys to absolute file paths.
     """
-    images = {}
-    plt.rcParams.update({'font.size': 10, 'figure.titlesize': 12, 'axes.titlesize': 11})
-    
+    if workers is None:
+        workers = settings.DATASETS_CHART_WORKERS or default_workers()
+    numeric_cols = ['flowrate', 'pressure', 'temperature']
+    tasks = []
+
     # 1. Equipment Type Distribution (Bar Chart)
-    try:
-        type_counts = df['type'].value_counts()
-        if not type_counts.empty:
-            plt.figure(figsize=(7, 5), dpi=120)
-            colors_list = plt.cm.get_cmap('tab10')(np.linspace(0, 1, len(type_counts)))
-            type_counts.plot(kind='bar', color='#6366f1', alpha=0.9, edgecolor='white')
-            plt.title('Equipment Inventory by Category', fontweight='bold', pad=20)
-            plt.xlabel('Equipment Type', labelpad=10)
-            plt.ylabel('Unit Count', labelpad=10)
-            plt.xticks(rotation=45, ha='right')
-            plt.grid(axis='y', linestyle='--', alpha=0.3)
-            plt.tight_layout()
-            
-            img_path = os.path.join(tmpdir, 'type_dist.png')
-            plt.savefig(img_path, bbox_inches='tight')
-            plt.close()
-            images['type_dist'] = img_path
-    except Exception as e:
-        print(f"[PDF] System Error during Type Distribution render: {e}")
+    if analytics:
+        type_counts = pd.Series(analytics['type_distribution'], dtype='int64')
+    else:
+        type_counts = pd.Series(known_types(df['type'].value_counts()), dtype='int64')
+    if not type_counts.empty:
+        tasks.append(('type_dist', 'type_distribution', {
+            'path': os.path.join(tmpdir, 'type_dist.png'),
+            'labels': [str(t) for t in type_counts.index],
+            'counts': type_counts.to_numpy(),
+        }))
 
     # 2. Operating Envelope: Flowrate vs Temperature (Scatter)
-    try:
-        if not df[['temperature', 'flowrate']].dropna().empty:
-            plt.figure(figsize=(7, 5), dpi=120)
-            plt.scatter(df['temperature'], df['flowrate'], color='#fb7185', alpha=0.6, edgecolors='none', s=40)
-            plt.title('Operational Correlation: Flowrate vs. Temperature', fontweight='bold', pad=20)
-            plt.xlabel('Measured Temperature (°C)', labelpad=10)
-            plt.ylabel('Measured Flowrate (units/hr)', labelpad=10)
-            plt.grid(True, linestyle=':', alpha=0.4)
-            plt.tight_layout()
-            
-            img_path = os.path.join(tmpdir, 'flow_vs_temp.png')
-            plt.savefig(img_path, bbox_inches='tight')
-            plt.close()
-            images['flow_vs_temp'] = img_path
-    except Exception as e:
-        print(f"[PDF] System Error during Flow vs Temp render: {e}")
-
-    # 3. Parameter Distributions (Histograms)
+    if not df[['temperature', 'flowrate']].dropna().empty:
+        tasks.append(('flow_vs_temp', 'scatter', {
+            'path': os.path.join(tmpdir, 'flow_vs_temp.png'),
+            'x': df['temperature'].to_numpy(dtype='float64', na_value=np.nan),
+            'y': df['flowrate'].to_numpy(dtype='float64', na_value=np.nan),
+        }))
+
+    # 3. Parameter Distributions (Histograms), binned here so only counts go to the workers
     hist_specs = [
-        ('flowrate', 'Flowrate', '#818cf8'), 
-        ('pressure', 'Pressure', '#34d399'), 
+        ('flowrate', 'Flowrate', '#818cf8'),
+        ('pressure', 'Pressure', '#34d399'),
         ('temperature', 'Temperature', '#f472b6')
     ]
     for key, label, color in hist_specs:
-        try:
-            plt.figure(figsize=(7, 4), dpi=120)
-            data = df[key].dropna().astype(float)
-            if not data.empty:
-                plt.hist(data, bins=15, color=color, alpha=0.8, edgecolor='white')
-                plt.title(f'{label} Frequency Distribution', fontweight='bold', pad=15)
-                plt.xlabel(label, labelpad=8)
-                plt.ylabel('Frequency', labelpad=8)
-                plt.grid(axis='y', linestyle='--', alpha=0.2)
-                plt.tight_layout()
-                
-                img_path = os.path.join(tmpdir, f'{key}_hist.png')
-                plt.savefig(img_path, bbox_inches='tight')
-                plt.close()
-                images[f'{key}_hist'] = img_path
-        except Exception as e:
-            print(f"[PDF] Failure rendering histogram for {key}: {e}")
-            plt.close()
-
-    # 4. Feature Inter-dependency (Correlation Matrix)
-    try:
-        numeric_cols = ['flowrate', 'pressure', 'temperature']
+        data = df[key].dropna().astype(float)
+        if not data.empty:
+            counts, edges = np.histogram(data, bins=15)
+            tasks.append((f'{key}_hist', 'histogram', {
+                'path': os.path.join(tmpdir, f'{key}_hist.png'),
+                'edges': edges, 'counts': counts, 'label': label, 'color': color,
+            }))
+
+    # 4. Feature Inter-dependency (Correlation Matrix), the one the analytics already hold
+    if analytics:
+        corr = analytics['correlation_matrix']
+        matrix = np.array([[corr[col][row] for col in numeric_cols] for row in numeric_cols])
+        enough = all(analytics['stats'][col]['count'] > 1 for col in numeric_cols)
+    else:
         valid_df = df[numeric_cols].dropna()
-        if len(valid_df) > 1:
-            corr_df = valid_df.corr()
-            plt.figure(figsize=(6, 5), dpi=120)
-            im = plt.imshow(corr_df.values, cmap='RdBu_r', vmin=-1, vmax=1)
-            plt.colorbar(im, fraction=0.046, pad=0.04)
-            
-            plt.xticks(range(len(numeric_cols)), [c.title() for c in numeric_cols], rotation=0)
-            plt.yticks(range(len(numeric_cols)), [c.title() for c in numeric_cols])
-            
-            # Annotate values
-            for i in range(len(numeric_cols)):
-                for j in range(len(numeric_cols)):
-                    val = corr_df.iloc[i, j]
-                    plt.text(j, i, f"{val:.2f}", ha='center', va='center', 
-                             color='white' if abs(val) > 0.5 else 'black', fontweight='bold')
-            
-            plt.title('Parameter Correlation Heatmap', fontweight='bold', pad=20)
-            plt.tight_layout()
-            
-            img_path = os.path.join(tmpdir, 'correlation.png')
-            plt.savefig(img_path, bbox_inches='tight')
-            plt.close()
-            images['correlation'] = img_path
-    except Exception as e:
-        print(f"[PDF] Correlation Matrix engine failure: {e}")
-        plt.close()
+        matrix = valid_df.corr().to_numpy()
+        enough = len(valid_df) > 1
+    if enough:
+        tasks.append(('correlation', 'correlation', {
+            'path': os.path.join(tmpdir, 'correlation.png'),
+            'matrix': matrix,
+            'labels': numeric_cols,
+        }))
 
-    return images
+    return render_charts(tasks, workers=workers)
 
 
 def create_pdf_report(dataset: Dataset, df):
@@ -205,18 +181,29 @@ def create_pdf_report(dataset: Dataset, df):
     """
     ensure_media_dirs()
     reports_dir = os.path.join(settings.MEDIA_ROOT, 'reports')
+    pdf_path = os.path.join(reports_dir, f"{dataset.id}.pdf")
+
+    # Same cleaned data, template and cover metadata -> same PDF
+    if restore_report(dataset, pdf_path):
+        print(f"[PDF] Reusing cached report for dataset {dataset.id}")
+        return pdf_path
+
     tmpdir = tempfile.mkdtemp()
     
     try:
         analytics = getattr(dataset, 'analytics', None) or {}
         print(f"[PDF] Initializing professional report generation for dataset {dataset.id}...")
         
-        # 1. Generate High-Fidelity Charts
-        images = generate_charts(df, tmpdir, analytics=analytics)
-        pdf_path = os.path.join(reports_dir, f"{dataset.id}.pdf")
-
-        # 2. Setup Canvas
-        c = canvas.Canvas(pdf_path, pagesize=letter)
+        # 1. Generate High-Fidelity Charts (shared by every dataset with the same cleaned data)
+        images = chart_images(dataset.content_hash) if dataset.content_hash else None
+        if images is None:
+            images = generate_charts(df, tmpdir, analytics=analytics)
+            if dataset.content_hash:
+                images = store_charts(dataset.content_hash, images)
+
+        # 2. Setup Canvas; render beside the target and swap in, since the old file may be a cache link
+        tmp_pdf_path = os.path.join(tmpdir, 'report.pdf')
+        c = canvas.Canvas(tmp_pdf_path, pagesize=letter)
         width, height = letter
         page_num = 1
 
@@ -400,8 +387,9 @@ def create_pdf_report(dataset: Dataset, df):
         c.setFillColor(colors.black)
         c.setFont('Helvetica', 8)
         
-        # Loop through rows
-        for idx, row in enumerate(df.head(30).fillna('-').to_dict(orient='records')):
+        # Loop through rows (as objects: a categorical column can't take the '-' placeholder)
+        preview = df.head(30).astype(object)
+        for idx, row in enumerate(preview.where(preview.notna(), '-').to_dict(orient='records')):
             if idx % 2 == 1:
                 c.setFillColor(colors.HexColor("#f8fafc"))
                 c.rect(40, y-3, 530, 14, fill=1, stroke=0)
@@ -421,6 +409,9 @@ def create_pdf_report(dataset: Dataset, df):
                 y = height - 80
         
         c.save()
+        shutil.move(tmp_pdf_path, pdf_path + '.tmp')
+        os.replace(pdf_path + '.tmp', pdf_path)
+        store_report(dataset, pdf_path)
         print(f"[PDF] Professional Report finalized: {pdf_path}")
         return pdf_path
         
@@ -436,7 +427,10 @@ def create_pdf_report(dataset: Dataset, df):
 
 def process_csv_and_create_dataset(uploaded_file, uploader=None):
     ensure_media_dirs()
-    uploads_dir = os.path.join(settings.MEDIA_ROOT, 'uploads')
+    filename = getattr(uploaded_file, 'name', 'uploaded.csv')
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        # Django already spooled a large upload to disk; read that file rather than copying it
+        return process_csv_path(uploaded_file.temporary_file_path(), filename, uploader=uploader)
 
     # Write uploaded file to temp file for pandas
     tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.csv')
@@ -446,60 +440,192 @@ def process_csv_and_create_dataset(uploaded_file, uploader=None):
         tmp.flush()
         tmp.close()
 
-        df, coercion_errors = validate_and_read_csv(tmp.name)
+        return process_csv_path(tmp.name, filename, uploader=uploader)
+    finally:
+        try:
+            os.unlink(tmp.name)
+        except Exception:
+            pass
+
 
-        # Clean dataframe and compute enhanced analytics
-        df_clean = clean_dataframe(df)
-        analytics = analyze_dataframe(df)
+def process_csv_path(src_path, filename, uploader=None, dataset_id=None, progress=None, cleanup=True, digest=None):
+    """
+    Run the ingest pipeline (see pipeline.py) on a CSV already on disk and
+    create the Dataset, with its per-stage timings. If src_path is already
+    media/uploads/<dataset_id>.csv it is used in place.
+    progress(stage, percent) is called as the pipeline advances. With
+    cleanup=False old datasets are not trimmed and the cache is not evicted
+    afterwards; batch ingest does that once for the whole batch, and job
+    workers once per job (see cleanup_media). digest is
+    the upload's raw_digest when the caller already has it.
+    """
+    report = progress or (lambda stage, percent: None)
+    ensure_media_dirs()
+    uploads_dir = os.path.join(settings.MEDIA_ROOT, 'uploads')
 
-        # Compute summary (legacy simple summary) for compatibility
-        summary = compute_summary_from_df(df)
+    clean_dir = os.path.join(settings.MEDIA_ROOT, 'clean')
+    os.makedirs(clean_dir, exist_ok=True)
+    dataset_id = dataset_id or uuid.uuid4()
+    clean_path = os.path.join(clean_dir, f"{dataset_id}.csv{GZIP_SUFFIX}")
 
-        # Create Dataset record
+    # Files too large to hold in memory go through the chunked ingest path (compressed ones by their likely size)
+    streaming = expanded_size(src_path) >= settings.DATASETS_STREAMING_THRESHOLD_BYTES
+    mode = 'stream' if streaming else 'memory'
+    timings = StageTimings(mode)
+
+    try:
+        # Byte-identical re-uploads reuse the cached cleaned data, analytics and charts
+        with timings.stage('persist'):
+            raw_key = upload_key(src_path, mode, digest)
+            cached = lookup_upload(raw_key)
+            if cached and restore_dataset_files(cached['content_key'], clean_path, dataset_id):
+                report('analyzing', 20)
+                content_hash = cached['content_key']
+                summary, coercion_errors = cached['summary'], cached['coercion_errors']
+                analytics = load_analytics(content_hash)
+            else:
+                cached = None
+
+        if cached is None or analytics is None:
+            # Never write through a link restored from the cache
+            if os.path.exists(clean_path):
+                os.remove(clean_path)
+            content_hash, df_clean, coercion_errors, summary, analytics, state = _ingest(
+                src_path, clean_path, dataset_id, streaming, report, timings
+            )
+            with timings.stage('persist'):
+                # Sorted numeric columns ride along in the cache, so re-uploads get them for free
+                presort_columns(dataset_id)
+                store_dataset_files(content_hash, clean_path, dataset_id)
+                store_upload(raw_key, content_hash, summary, coercion_errors)
+        else:
+            timings.mode = 'cached'
+            with timings.stage('render'):
+                df_clean = _report_frame(content_hash, dataset_id, streaming)
+            state = None
+    except Exception:
+        if os.path.exists(clean_path):
+            os.remove(clean_path)
+        remove_columnar(dataset_id)
+        raise
+
+    # Create Dataset record
+    report('saving', 50)
+    with timings.stage('persist'):
         dataset = Dataset.objects.create(
-            filename=getattr(uploaded_file, 'name', 'uploaded.csv'),
+            id=dataset_id,
+            filename=filename,
             uploaded_by=uploader,
             total_rows=summary['total_count'],
             avg_flowrate=summary['averages']['flowrate'],
             avg_pressure=summary['averages']['pressure'],
             avg_temperature=summary['averages']['temperature'],
-            type_distribution=summary['type_distribution']
+            type_distribution=summary['type_distribution'],
+            content_hash=content_hash,
         )
 
         # Save original CSV to media/uploads/<uuid>.csv
-        dest_csv = save_csv_file(tmp.name, uploads_dir, dataset.id)
+        dest_csv = save_csv_file(src_path, uploads_dir, dataset.id)
         dataset.csv_file.name = os.path.relpath(dest_csv, settings.MEDIA_ROOT).replace('\\', '/')
-
-        # Save cleaned CSV to media/clean/<uuid>.csv
-        clean_dir = os.path.join(settings.MEDIA_ROOT, 'clean')
-        os.makedirs(clean_dir, exist_ok=True)
-        clean_path = os.path.join(clean_dir, f"{dataset.id}.csv")
-        df_clean.to_csv(clean_path, index=False)
         dataset.cleaned_csv.name = os.path.relpath(clean_path, settings.MEDIA_ROOT).replace('\\', '/')
 
-        # Attach analytics to dataset and generate PDF (use cleaned dataframe for charts)
-        dataset.analytics = analytics
+        # Mergeable analytics state so later appends only process the new rows
+        if state is not None:
+            store_state(content_hash, write_state(dataset, state))
+        elif restore_state(content_hash, state_path(dataset.id)):
+            dataset.analytics_state.name = os.path.relpath(state_path(dataset.id), settings.MEDIA_ROOT).replace('\\', '/')
 
+    # Attach analytics to dataset and generate PDF (use cleaned dataframe for charts)
+    dataset.analytics = analytics
+
+    report('rendering', 70)
+    with timings.stage('render'):
         pdf_path = create_pdf_report(dataset, df_clean)
-        dataset.summary_pdf.name = os.path.relpath(pdf_path, settings.MEDIA_ROOT).replace('\\', '/')
+    dataset.summary_pdf.name = os.path.relpath(pdf_path, settings.MEDIA_ROOT).replace('\\', '/')
 
-        dataset.save()
+    dataset.ingest_timings = timings.as_dict()
+    dataset.save()
 
-        # Trim to last 5 datasets
-        trim_old_datasets()
+    if cleanup:
+        cleanup_media(keep=[dataset.id])
 
-        return dataset, coercion_errors, summary, analytics
-    finally:
-        try:
-            os.unlink(tmp.name)
-        except Exception:
-            pass
+    report('done', 100)
+    return dataset, coercion_errors, summary, analytics
+
+
+def _ingest(src_path, clean_path, dataset_id, streaming, report, timings):
+    """
+    Parse, clean and analyze an upload, writing the cleaned CSV and columnar
+    copy, each step under its stage in timings. Returns (content_hash,
+    df_clean, coercion_errors, summary, analytics, accumulator state).
+    """
+    if streaming:
+        report('analyzing', 10)
+        df_clean, coercion_errors, summary, analytics, state = ingest_large_csv(
+            src_path, clean_path, dataset_id,
+            chunk_rows=settings.DATASETS_STREAMING_CHUNK_ROWS,
+            sample_rows=settings.DATASETS_REPORT_SAMPLE_ROWS,
+            stage=timings.stage,
+        )
+        with timings.stage('persist'):
+            content_hash = content_key(clean_path, 'stream')
+            store_analytics(content_hash, analytics)
+        return content_hash, df_clean, coercion_errors, summary, analytics, state
+
+    report('validating', 5)
+    with timings.stage('parse'):
+        df, coercion_errors = validate_and_read_csv(src_path)
 
+    with timings.stage('clean'):
+        df_clean = clean_dataframe(df)
+        del df
+        # Save cleaned CSV to media/clean/<uuid>.csv.gz; its bytes are the cache key
+        with open_csv_text(clean_path, 'w') as out:
+            df_clean.to_csv(out, index=False)
+        content_hash = content_key(clean_path, 'memory')
+
+    # Identical cleaned data uploaded before (e.g. a re-export) shares its analytics
+    report('analyzing', 20)
+    with timings.stage('analyze'):
+        analytics = load_analytics(content_hash)
+        if analytics is None:
+            analytics = analyze_clean_dataframe(df_clean)
+            store_analytics(content_hash, analytics)
+        summary = summary_from_analytics(analytics)
+        state = state_from_frame(df_clean, analytics)
+
+    with timings.stage('persist'):
+        # Typed columnar copy so table/report reads can memory-map instead of re-parsing
+        write_columnar(df_clean, dataset_id, source_path=clean_path)
+    return content_hash, df_clean, coercion_errors, summary, analytics, state
+
+
+def _report_frame(content_hash, dataset_id, streaming):
+    """Rows the PDF needs for a cache hit: just the log preview when the charts are cached too."""
+    frame = load_columnar(dataset_id)
+    if chart_images(content_hash) is not None:
+        return frame.slice(0, 30)
+    if streaming:
+        return report_sample(frame, settings.DATASETS_REPORT_SAMPLE_ROWS)
+    return frame.to_frame()
+
+
+def cleanup_media(keep=()):
+    """
+    Trim old datasets (never those in keep) and evict the report cache, one
+    process at a time: concurrent trims could delete what another just made.
+    """
+    with file_lock(os.path.join(settings.MEDIA_ROOT, 'state', 'cleanup.lock')):
+        trim_old_datasets(keep=keep)
+        evict_cache()
 
-def trim_old_datasets():
-    qs = Dataset.objects.order_by('-uploaded_at')
-    keep = qs[:5]
-    keep_ids = [d.id for d in keep]
+
+def trim_old_datasets(keep=()):
+    """Delete all but the DATASETS_KEEP_LATEST newest datasets; ids in keep are never deleted."""
+    if settings.DATASETS_KEEP_LATEST <= 0:
+        return
+    keep_ids = list(Dataset.objects.order_by('-uploaded_at').values_list('id', flat=True)[:settings.DATASETS_KEEP_LATEST])
+    keep_ids.extend(keep)
     to_delete = Dataset.objects.exclude(id__in=keep_ids)
     # Delete files then records
     for d in to_delete:
@@ -508,9 +634,24 @@ def trim_old_datasets():
                 os.remove(d.csv_file.path)
         except Exception:
             pass
+        try:
+            if d.cleaned_csv and os.path.exists(d.cleaned_csv.path):
+                os.remove(d.cleaned_csv.path)
+        except Exception:
+            pass
         try:
             if d.summary_pdf and os.path.exists(d.summary_pdf.path):
                 os.remove(d.summary_pdf.path)
         except Exception:
             pass
+        try:
+            if d.analytics_state and os.path.exists(d.analytics_state.path):
+                os.remove(d.analytics_state.path)
+        except Exception:
+            pass
+        try:
+            os.remove(lock_path(d.id))
+        except OSError:
+            pass
+        remove_columnar(d.id)
     to_delete.delete()
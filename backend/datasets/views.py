@@ -1,18 +1,46 @@
+import gzip
+import io
 import os
-import pandas as pd
+import numpy as np
 from django.conf import settings
-from django.http import HttpResponse, FileResponse
+from django.db.models import Q
+from django.http import HttpResponse, FileResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics, permissions
-from rest_framework.parsers import MultiPartParser, FormParser
-from .serializers import DatasetSerializer, UploadSerializer, UserSerializer
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.settings import api_settings
+from .serializers import (
+    BatchUploadSerializer, DatasetSerializer, DatasetListSerializer, UploadSerializer, UserSerializer, JobSerializer,
+    UploadSessionCreateSerializer, UploadSessionSerializer,
+)
+from .pagination import DatasetCursorPagination
+from .renderers import ArrowStreamRenderer, CSVExportRenderer, NDJSONExportRenderer
 import logging
 from rest_framework_simplejwt.tokens import RefreshToken
 
 logger = logging.getLogger(__name__)
-from .models import Dataset
-from .utils import process_csv_and_create_dataset
+from .models import Dataset, Job, UploadSession
+from .utils import process_csv_and_create_dataset, process_csv_path, compute_summary_from_df, ensure_media_dirs
+from .columnar import open_columnar
+from .report_cache import restore_report
+from .query import (
+    decode_cursor, encode_cursor, filter_mask, offset_page, page_arrays, page_payload, parse_filters, parse_page_params,
+    query_signature, scan_page,
+)
+from .scatter import parse_scatter_params, scatter_data
+from .distribution import histogram, parse_histogram_params, parse_quantile_params, quantiles
+from .http_cache import conditional_dataset_get
+from .compression import accepts_gzip, is_gzip
+from .downloads import serve_file
+from .export import FORMATS as EXPORT_FORMATS, export_chunks
+from .jobs import enqueue_path, enqueue_upload
+from .batch import ingest_uploads
+from .uploads import claim_upload, complete_upload, parse_content_digest, start_session, write_chunk
+from .incremental import append_rows, read_rows
 
 class SignupView(generics.CreateAPIView):
     serializer_class = UserSerializer
@@ -33,6 +61,18 @@ class SignupView(generics.CreateAPIView):
             'refresh': refresh_token,
         }, status=status.HTTP_201_CREATED)
 
+def _wants_async(request):
+    async_param = request.query_params.get('async', request.data.get('async'))
+    return settings.DATASETS_ASYNC_UPLOADS if async_param is None else str(async_param).lower() in ('1', 'true', 'yes')
+
+
+def _job_accepted(request, job):
+    data = JobSerializer(job).data
+    data['job_id'] = str(job.id)
+    data['status_url'] = request.build_absolute_uri(reverse('job-status', args=[job.id]))
+    return Response(data, status=status.HTTP_202_ACCEPTED)
+
+
 class DatasetUploadView(APIView):
     parser_classes = (MultiPartParser, FormParser)
     permission_classes = (permissions.IsAuthenticated,)
@@ -43,6 +83,10 @@ class DatasetUploadView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         f = serializer.validated_data['file']
+
+        if _wants_async(request):
+            return _job_accepted(request, enqueue_upload(f, uploader=request.user))
+
         try:
             dataset, coercion_errors, summary, analytics = process_csv_and_create_dataset(f, uploader=request.user)
         except ValueError as e:
@@ -64,17 +108,255 @@ class DatasetUploadView(APIView):
         return Response(data, status=status.HTTP_201_CREATED)
 
 
+class DatasetBatchUploadView(APIView):
+    """
+    Many CSVs at once, as repeated `files` fields and/or zip/tar archives of
+    CSVs, ingested in parallel (see batch.py). 201 when every CSV was
+    ingested, 207 when some failed, 400 when none could be.
+    """
+    parser_classes = (MultiPartParser, FormParser)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request, format=None):
+        serializer = BatchUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            results = ingest_uploads(serializer.validated_data['files'], uploader=request.user)
+        except ValueError as e:
+            logger.warning('Validation error during batch upload: %s', e)
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        created = sum(1 for r in results if 'id' in r)
+        if created == len(results):
+            code = status.HTTP_201_CREATED
+        elif created:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response({'created': created, 'failed': len(results) - created, 'results': results}, status=code)
+
+
+def _user_session(request, pk):
+    sessions = UploadSession.objects.all()
+    if not request.user.is_staff:
+        sessions = sessions.filter(uploaded_by=request.user)
+    return sessions.filter(pk=pk).first()
+
+
+class UploadSessionCreateView(APIView):
+    """Open a resumable chunked upload (see uploads.py)."""
+    parser_classes = (JSONParser, FormParser, MultiPartParser)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request, format=None):
+        serializer = UploadSessionCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            session = start_session(serializer.validated_data['filename'], serializer.validated_data['size'],
+                                    uploader=request.user)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+
+class UploadSessionView(APIView):
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request, pk, format=None):
+        session = _user_session(request, pk)
+        if session is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(UploadSessionSerializer(session).data)
+
+
+class UploadChunkView(APIView):
+    """PUT the raw bytes of one chunk, with `Content-Digest: sha-256=:<base64>:`."""
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def put(self, request, pk, index, format=None):
+        session = _user_session(request, pk)
+        if session is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        sha256 = parse_content_digest(request.headers.get('Content-Digest'))
+        if sha256 is None:
+            return Response({'error': 'A `Content-Digest: sha-256=:<base64>:` header is required.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # the body is streamed to disk, never parsed into request.data
+            write_chunk(session, index, request.stream or io.BytesIO(), sha256)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'index': index, 'received': session.chunks.count()})
+
+
+class UploadFinalizeView(APIView):
+    """Assemble a complete chunked upload and ingest it, or queue it with ?async=true."""
+    parser_classes = (JSONParser, FormParser, MultiPartParser)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    @staticmethod
+    def failed(session, path, error):
+        # The dataset was never created, so the assembled file would be orphaned
+        if os.path.exists(path):
+            os.remove(path)
+        session.status, session.error = UploadSession.STATUS_FAILED, str(error)
+        session.save()
+
+    def post(self, request, pk, format=None):
+        session = _user_session(request, pk)
+        if session is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        if not claim_upload(session):
+            session.refresh_from_db(fields=['status'])
+            return Response({'error': f'Upload is {session.status}.'}, status=status.HTTP_409_CONFLICT)
+        try:
+            path, digest = complete_upload(session, request.data.get('digest'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if _wants_async(request):
+            session.job = enqueue_path(path, session.filename, session.dataset_id_reserved, uploader=session.uploaded_by)
+            session.save()
+            return _job_accepted(request, session.job)
+
+        try:
+            dataset, coercion_errors, summary, analytics = process_csv_path(
+                path, session.filename, uploader=session.uploaded_by, dataset_id=session.dataset_id_reserved,
+                digest=digest,
+            )
+        except ValueError as e:
+            logger.warning('Validation error during chunked upload %s: %s', pk, e)
+            self.failed(session, path, e)
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.exception('Processing error while finalizing chunked upload %s', pk)
+            self.failed(session, path, e)
+            return Response({'error': f'Processing error: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        session.dataset = dataset
+        session.save()
+        return Response({
+            'id': str(dataset.id),
+            'summary': summary,
+            'analytics': analytics,
+            'coercion_errors': coercion_errors,
+        }, status=status.HTTP_201_CREATED)
+
+
+class DatasetAppendView(APIView):
+    parser_classes = (MultiPartParser, FormParser, JSONParser)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request, pk, format=None):
+        try:
+            d = Dataset.objects.get(pk=pk)
+        except Dataset.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        if d.uploaded_by_id not in (None, request.user.id) and not request.user.is_staff:
+            return Response({'error': 'Only the uploader can append to this dataset.'}, status=status.HTTP_403_FORBIDDEN)
+
+        # New rows come as a CSV `file` (same columns as the original upload) or a JSON `rows` list
+        f = request.FILES.get('file')
+        rows = request.data.get('rows') if f is None else None
+        if f is None and not isinstance(rows, list):
+            return Response({'error': 'Provide a CSV `file` or a JSON `rows` list.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            df = read_rows(infile=f, rows=rows)
+            d, appended, coercion_errors, analytics = append_rows(d, df)
+        except ValueError as e:
+            logger.warning('Validation error during append: %s', e)
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.exception('Processing error while appending to dataset %s', pk)
+            return Response({'error': f'Processing error: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response({
+            'id': str(d.id),
+            'appended': appended,
+            'total_rows': d.total_rows,
+            'analytics': analytics,
+            'coercion_errors': coercion_errors,
+        })
+
+
+class JobStatusView(APIView):
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request, pk, format=None):
+        jobs = Job.objects.all()
+        if not request.user.is_staff:
+            jobs = jobs.filter(uploaded_by=request.user)
+        try:
+            job = jobs.get(pk=pk)
+        except Job.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(JobSerializer(job).data)
+
+
 class DatasetListView(generics.ListAPIView):
-    serializer_class = DatasetSerializer
+    """
+    Keyset-paged catalog. A request with none of CATALOG_PARAMS gets the
+    original response instead: a bare array of the LEGACY_LIST_SIZE newest
+    datasets, analytics included, so older clients keep working.
+    """
+    serializer_class = DatasetListSerializer
+    pagination_class = DatasetCursorPagination
     permission_classes = (permissions.IsAuthenticated,)
+    CATALOG_PARAMS = ('cursor', 'page_size', 'fields', 'search', 'uploaded_by')
+    LEGACY_LIST_SIZE = 5
+
+    def is_legacy(self):
+        return not any(p in self.request.query_params for p in self.CATALOG_PARAMS)
+
+    def paginate_queryset(self, queryset):
+        if self.is_legacy():
+            return None
+        return super().paginate_queryset(queryset)
+
+    def requested_fields(self):
+        if self.is_legacy():
+            return DatasetSerializer.Meta.fields
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+        fields = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = sorted(set(fields) - set(DatasetSerializer.Meta.fields))
+        if unknown:
+            raise ValidationError({'fields': f'Unknown fields: {", ".join(unknown)}.'})
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs['fields'] = self.requested_fields()
+        return super().get_serializer(*args, **kwargs)
 
     def get_queryset(self):
-        return Dataset.objects.all().order_by('-uploaded_at')[:5]
+        if self.is_legacy():
+            return Dataset.objects.select_related('uploaded_by').order_by('-uploaded_at', '-id')[:self.LEGACY_LIST_SIZE]
+        fields = self.requested_fields() or DatasetListSerializer.DEFAULT_FIELDS
+        # Load only the projected columns; the keyset needs uploaded_at and id
+        columns = {'id', 'uploaded_at'} | {'uploaded_by__username' if f == 'uploaded_by' else f for f in fields}
+        qs = Dataset.objects.all()
+        if 'uploaded_by' in fields:
+            qs = qs.select_related('uploaded_by')
+        qs = qs.only(*columns)
+
+        params = self.request.query_params
+        if params.get('uploaded_by'):
+            qs = qs.filter(uploaded_by__username=params['uploaded_by'])
+        search = (params.get('search') or '').strip()
+        if search:
+            qs = qs.filter(Q(filename__icontains=search) | Q(uploaded_by__username__icontains=search))
+        return qs
 
 
 class DatasetSummaryView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
+    @conditional_dataset_get
     def get(self, request, pk, format=None):
         try:
             d = Dataset.objects.get(pk=pk)
@@ -85,6 +367,11 @@ class DatasetSummaryView(APIView):
             return Response(d.analytics)
 
         # Fallback: return the simple legacy summary
+        if d.total_rows is None:
+            frame = open_columnar(d)
+            if frame is not None:
+                return Response(compute_summary_from_df(frame.to_frame()))
+
         summary = {
             'total_rows': d.total_rows,
             'averages': {'flowrate': d.avg_flowrate, 'pressure': d.avg_pressure, 'temperature': d.avg_temperature},
@@ -95,44 +382,156 @@ class DatasetSummaryView(APIView):
 
 class DatasetTableView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
+    # Accept: application/vnd.apache.arrow.stream (or ?format=arrow) returns the page as an Arrow IPC stream
+    renderer_classes = (*api_settings.DEFAULT_RENDERER_CLASSES, ArrowStreamRenderer)
 
+    @conditional_dataset_get
     def get(self, request, pk, format=None):
-        page = int(request.query_params.get('page', 1))
-        page_size = int(request.query_params.get('page_size', 50))
+        try:
+            page, page_size = parse_page_params(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         sort = request.query_params.get('sort')
         order = request.query_params.get('order', 'asc')
+        cursor = request.query_params.get('cursor')
+        # ?layout=columns returns {column: [values]} instead of a list of row objects
+        layout = request.query_params.get('layout', 'rows')
+        if layout not in ('rows', 'columns'):
+            return Response({'error': 'layout must be rows or columns.'}, status=status.HTTP_400_BAD_REQUEST)
+        arrow = request.accepted_renderer.format == ArrowStreamRenderer.format
+        payload_key = 'columns' if layout == 'columns' or arrow else 'rows'
 
         try:
             d = Dataset.objects.get(pk=pk)
         except Dataset.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
 
-        csv_path = os.path.join(settings.MEDIA_ROOT, d.csv_file.name)
-        if not os.path.exists(csv_path):
+        frame = open_columnar(d)
+        if frame is None:
             return Response({'error': 'CSV file missing on server.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        df = pd.read_csv(csv_path)
-        # Normalize column names to lowercase for consistent keys
-        df.columns = [c.strip().lower() for c in df.columns]
+        if sort not in frame.columns:
+            sort = None
+        ascending = (order == 'asc')
+        try:
+            filters = parse_filters(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        if sort:
-            ascending = (order == 'asc')
+        if cursor is not None:
+            # Keyset paging: resume the scan where the previous page stopped (?cursor= for the first page)
+            signature = query_signature(filters, sort, ascending)
             try:
-                df = df.sort_values(by=sort, ascending=ascending)
-            except Exception:
-                pass
+                position = decode_cursor(cursor, signature) if cursor else 0
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            indices, next_position = scan_page(frame, filters, position, page_size, sort=sort, ascending=ascending)
+            data = {
+                'page_size': page_size,
+                payload_key: page_arrays(frame, indices) if arrow else page_payload(frame, indices, layout),
+                'next_cursor': encode_cursor(next_position, signature) if next_position is not None else None,
+            }
+            if not filters:
+                data['total'] = len(frame)
+            elif not cursor:
+                # Counting filtered matches needs a full pass, so only the first page carries it
+                data['total'] = int(filter_mask(frame, filters, np.arange(len(frame))).sum())
+            return Response(data)
 
-        total = len(df)
         start = (page - 1) * page_size
         end = start + page_size
-        rows = df.iloc[start:end].fillna('').to_dict(orient='records')
 
-        return Response({'total': total, 'page': page, 'page_size': page_size, 'rows': rows})
+        if sort or filters:
+            # Gather just this page through the persisted sort index and filter mask
+            rows, total = offset_page(frame, filters, start, end, sort=sort, ascending=ascending)
+        else:
+            # Only the requested slice is read from the memory-mapped columns
+            total = len(frame)
+            rows = slice(start, end)
+
+        page_data = page_arrays(frame, rows) if arrow else page_payload(frame, rows, layout)
+        return Response({'total': total, 'page': page, 'page_size': page_size, payload_key: page_data})
+
+
+class DatasetScatterView(APIView):
+    permission_classes = (permissions.IsAuthenticated,)
+
+    @conditional_dataset_get
+    def get(self, request, pk, format=None):
+        try:
+            x, y, mode, resolution = parse_scatter_params(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            d = Dataset.objects.get(pk=pk)
+        except Dataset.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        frame = open_columnar(d)
+        if frame is None:
+            return Response({'error': 'CSV file missing on server.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        # Computed over every row, then cached per (axes, mode, resolution) until the data changes
+        return Response(scatter_data(frame, x, y, mode, resolution))
+
+
+class DatasetHistogramView(APIView):
+    permission_classes = (permissions.IsAuthenticated,)
+
+    @conditional_dataset_get
+    def get(self, request, pk, format=None):
+        try:
+            col, bins, value_range = parse_histogram_params(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            d = Dataset.objects.get(pk=pk)
+        except Dataset.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        frame = open_columnar(d)
+        if frame is None:
+            return Response({'error': 'CSV file missing on server.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        values = frame.sorted_values(col)
+        data = {'col': col, 'count': len(values), 'missing': frame.rows - len(values)}
+        data.update(histogram(values, bins, value_range))
+        return Response(data)
+
+
+class DatasetQuantilesView(APIView):
+    permission_classes = (permissions.IsAuthenticated,)
+
+    @conditional_dataset_get
+    def get(self, request, pk, format=None):
+        try:
+            col, qs = parse_quantile_params(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            d = Dataset.objects.get(pk=pk)
+        except Dataset.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        frame = open_columnar(d)
+        if frame is None:
+            return Response({'error': 'CSV file missing on server.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        values = frame.sorted_values(col)
+        return Response({
+            'col': col,
+            'count': len(values),
+            'quantiles': [{'q': q, 'value': v} for q, v in zip(qs, quantiles(values, qs))],
+        })
 
 
 class DatasetReportView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
+    @conditional_dataset_get
     def get(self, request, pk, format=None):
         try:
             d = Dataset.objects.get(pk=pk)
@@ -147,29 +546,67 @@ class DatasetReportView(APIView):
         if not file_path or request.query_params.get('refresh') == 'true':
             try:
                 print(f"[REGEN] Re-generating PDF for dataset {d.id}...")
-                if d.csv_file and os.path.exists(d.csv_file.path):
-                    import pandas as pd
+                _, reports_dir = ensure_media_dirs()
+                # Unchanged data and template: the content-addressed cache already has this PDF
+                new_pdf_path = restore_report(d, os.path.join(reports_dir, f"{d.id}.pdf"))
+                if new_pdf_path is None:
+                    frame = open_columnar(d)
+                    if frame is None:
+                        return Response({'error': 'Source CSV missing, cannot regenerate.'}, status=status.HTTP_404_NOT_FOUND)
                     from .utils import create_pdf_report
-                    df = pd.read_csv(d.csv_file.path)
-                    new_pdf_path = create_pdf_report(d, df)
-                    d.summary_pdf.name = os.path.relpath(new_pdf_path, settings.MEDIA_ROOT).replace('\\', '/')
-                    d.save()
-                    file_path = new_pdf_path
-                else:
-                    return Response({'error': 'Source CSV missing, cannot regenerate.'}, status=status.HTTP_404_NOT_FOUND)
+                    new_pdf_path = create_pdf_report(d, frame.to_frame())
+                d.summary_pdf.name = os.path.relpath(new_pdf_path, settings.MEDIA_ROOT).replace('\\', '/')
+                d.save()
+                file_path = new_pdf_path
             except Exception as e:
                 return Response({'error': f'Regeneration failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        response = FileResponse(open(file_path, 'rb'), content_type='application/pdf')
+        response = serve_file(request, pk, file_path, 'application/pdf')
         # Cleaner filename: strip existing .csv if present
         clean_name = d.filename.replace('.csv', '') if d.filename else str(d.id)
         response['Content-Disposition'] = f'attachment; filename="{clean_name}.pdf"'
         return response
 
 
+class DatasetExportView(APIView):
+    permission_classes = (permissions.IsAuthenticated,)
+    # ?format=csv|ndjson (or Accept: text/csv / application/x-ndjson); CSV by default
+    renderer_classes = (CSVExportRenderer, NDJSONExportRenderer)
+
+    @conditional_dataset_get
+    def get(self, request, pk, format=None):
+        try:
+            d = Dataset.objects.get(pk=pk)
+        except Dataset.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        frame = open_columnar(d)
+        if frame is None:
+            return Response({'error': 'CSV file missing on server.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        # Same filters and sort as the table endpoint
+        sort = request.query_params.get('sort')
+        if sort not in frame.columns:
+            sort = None
+        ascending = request.query_params.get('order', 'asc') == 'asc'
+        try:
+            filters = parse_filters(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        fmt = request.accepted_renderer.format
+        response = StreamingHttpResponse(
+            export_chunks(frame, fmt, filters, sort=sort, ascending=ascending), content_type=EXPORT_FORMATS[fmt],
+        )
+        name = d.filename.replace('.csv', '') if d.filename else str(d.id)
+        response['Content-Disposition'] = f'attachment; filename="{name}-export.{fmt}"'
+        return response
+
+
 class DatasetCleanDownloadView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
+    @conditional_dataset_get
     def get(self, request, pk, format=None):
         try:
             d = Dataset.objects.get(pk=pk)
@@ -180,6 +617,15 @@ class DatasetCleanDownloadView(APIView):
             return Response({'error': 'Cleaned file not found.'}, status=status.HTTP_404_NOT_FOUND)
 
         file_path = os.path.join(settings.MEDIA_ROOT, d.cleaned_csv.name)
-        response = FileResponse(open(file_path, 'rb'), content_type='text/csv')
+        if not is_gzip(file_path):
+            response = serve_file(request, pk, file_path, 'text/csv')
+        elif accepts_gzip(request):
+            # Stored compressed: send the bytes as they are and let the client inflate them
+            response = serve_file(request, pk, file_path, 'text/csv', content_encoding='gzip')
+        else:
+            # Inflated on the fly, so byte offsets into the stored file do not apply
+            response = FileResponse(gzip.open(file_path, 'rb'), content_type='text/csv')
+            response['Accept-Ranges'] = 'none'
+        patch_vary_headers(response, ('Accept-Encoding',))
         response['Content-Disposition'] = f'attachment; filename="cleaned_{d.filename or d.id}.csv"'
         return response
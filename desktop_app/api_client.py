@@ -1,9 +1,19 @@
+import base64
+import contextlib
+import gzip
+import hashlib
 import json
 import os
+import shutil
+import time
+import pyarrow as pa
 import requests
+import urllib3
 from typing import Optional
 from config import BASE_API_URL, TOKENS_FILE
 
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+
 class ApiClient:
     def __init__(self, base_url: str = BASE_API_URL):
         self.base_url = base_url.rstrip('/')
@@ -11,6 +21,8 @@ class ApiClient:
         self.tokens_path = os.path.join(os.path.dirname(__file__), TOKENS_FILE)
         self.access = None
         self.refresh = None
+        # (path, params) -> (ETag, body) of dataset reads, revalidated instead of refetched
+        self._etag_cache = {}
         self._load_tokens()
 
     def _load_tokens(self):
@@ -64,6 +76,28 @@ class ApiClient:
                 r = self.session.request(method, url, **kwargs)
         return r
 
+    def _get_cached(self, path, params=None, accept='application/json', decode=None, **kwargs):
+        """GET a dataset read endpoint; a cached copy is revalidated by ETag and reused on 304."""
+        key = (path, accept, tuple(sorted((params or {}).items())))
+        cached = self._etag_cache.get(key)
+        headers = {'Accept': accept}
+        if cached:
+            headers['If-None-Match'] = cached[0]
+        r = self._request('GET', path, params=params, headers=headers, **kwargs)
+        if r.status_code == 304 and cached:
+            return cached[1]
+        if r.status_code != 200:
+            raise Exception(r.text)
+        data = decode(r.content) if decode else r.json()
+        if r.headers.get('ETag'):
+            if len(self._etag_cache) >= 256:
+                self._etag_cache.pop(next(iter(self._etag_cache)))
+            self._etag_cache[key] = (r.headers['ETag'], data)
+        return data
+
+    def _get_json(self, path, params=None, **kwargs):
+        return self._get_cached(path, params, **kwargs)
+
     # Auth
     def login(self, username: str, password: str) -> Optional[dict]:
         url = '/api/auth/login/'
@@ -99,56 +133,241 @@ class ApiClient:
             raise Exception(r.text)
 
     # Datasets
-    def upload_csv(self, file_path: str):
+    def upload_csv(self, file_path: str, async_mode: bool = False):
         url = '/api/datasets/upload/'
+        if async_mode:
+            url += '?async=true'
         with open(file_path, 'rb') as f:
             files = {'file': (os.path.basename(file_path), f, 'text/csv')}
             r = self._request('POST', url, files=files, timeout=60)
-            if r.status_code in (200, 201):
+            if r.status_code in (200, 201, 202):
                 return r.json()
             raise Exception(r.text)
 
-    def list_datasets(self):
-        url = '/api/datasets/'
-        r = self._request('GET', url)
-        if r.status_code == 200:
+    def upload_resumable(self, file_path: str, async_mode: bool = False, attempts: int = 5):
+        """
+        Upload a large CSV in checksummed chunks. A chunk that fails is retried;
+        an upload interrupted for good resumes on the next call with the same
+        file, whose session is kept in file_path + '.upload.json' until the
+        upload is finalized. Returns the same payload as upload_csv.
+        """
+        size = os.path.getsize(file_path)
+        state_path = file_path + '.upload.json'
+        signature = {'size': size, 'mtime': os.path.getmtime(file_path)}
+        session = None
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+            if state.get('file') == signature:
+                r = self._request('GET', f"/api/uploads/{state['id']}/", timeout=30)
+                if r.status_code == 200 and r.json().get('status') == 'open':
+                    session = r.json()
+        except (OSError, ValueError):
+            pass
+        if session is None:
+            r = self._request('POST', '/api/uploads/', json={'filename': os.path.basename(file_path), 'size': size},
+                              timeout=30)
+            if r.status_code != 201:
+                raise Exception(r.text)
+            session = r.json()
+            with open(state_path, 'w') as f:
+                json.dump({'id': session['id'], 'file': signature}, f)
+
+        received = set(session['received'])
+        digests = []
+        with open(file_path, 'rb') as f:
+            for index in range(session['chunks']):
+                data = f.read(session['chunk_size'])
+                digest = hashlib.sha256(data).digest()
+                digests.append(digest)
+                if index in received:
+                    continue
+                headers = {'Content-Digest': f"sha-256=:{base64.b64encode(digest).decode()}:",
+                           'Content-Type': 'application/octet-stream'}
+                for attempt in range(attempts):
+                    try:
+                        r = self._request('PUT', f"/api/uploads/{session['id']}/chunks/{index}/", data=data,
+                                          headers=headers, timeout=120)
+                        # 400 on a sound request means the bytes were damaged on the way: send them again
+                        if r.status_code == 200 or attempt == attempts - 1:
+                            break
+                    except (requests.RequestException, urllib3.exceptions.HTTPError):
+                        if attempt == attempts - 1:
+                            raise
+                    time.sleep(min(2 ** attempt, 30))
+                if r.status_code != 200:
+                    raise Exception(r.text)
+
+        url = f"/api/uploads/{session['id']}/finalize/"
+        if async_mode:
+            url += '?async=true'
+        r = self._request('POST', url, json={'digest': hashlib.sha256(b''.join(digests)).hexdigest()}, timeout=600)
+        if r.status_code in (201, 202, 400):
+            # the upload is finished either way; a 400 here is the CSV failing validation
+            os.remove(state_path)
+        if r.status_code in (201, 202):
             return r.json()
         raise Exception(r.text)
 
-    def get_summary(self, dataset_id: str):
-        url = f'/api/datasets/{dataset_id}/summary/'
-        r = self._request('GET', url)
+    def upload_many(self, file_paths, timeout: float = 600):
+        """
+        Upload several CSVs and/or zip/tar archives of CSVs in one request; the
+        server ingests them in parallel. Returns {'created', 'failed', 'results'}
+        with one result per CSV ({'filename', 'id', ...} or {'filename', 'error'}).
+        """
+        url = '/api/datasets/upload/batch/'
+        with contextlib.ExitStack() as stack:
+            files = [
+                ('files', (os.path.basename(p), stack.enter_context(open(p, 'rb')),
+                           'text/csv' if p.lower().endswith('.csv') else 'application/octet-stream'))
+                for p in file_paths
+            ]
+            r = self._request('POST', url, files=files, timeout=timeout)
+            # 207: some files failed, their errors are in the results
+            if r.status_code in (201, 207):
+                return r.json()
+            raise Exception(r.text)
+
+    def append_csv(self, dataset_id: str, file_path: str):
+        """Append the rows of a CSV (same columns as the original upload) to an existing dataset."""
+        url = f'/api/datasets/{dataset_id}/append/'
+        with open(file_path, 'rb') as f:
+            files = {'file': (os.path.basename(file_path), f, 'text/csv')}
+            r = self._request('POST', url, files=files, timeout=60)
+            if r.status_code == 200:
+                return r.json()
+            raise Exception(r.text)
+
+    def get_job(self, job_id: str):
+        url = f'/api/jobs/{job_id}/'
+        r = self._request('GET', url, timeout=10)
         if r.status_code == 200:
             return r.json()
         raise Exception(r.text)
 
-    def get_table(self, dataset_id: str, page=1, page_size=200):
-        url = f'/api/datasets/{dataset_id}/table/?page={page}&page_size={page_size}'
-        r = self._request('GET', url, timeout=30)
+    def wait_for_job(self, job_id: str, poll_interval: float = 1.0, timeout: float = 600):
+        """Poll a queued upload until it finishes; returns the job's result payload."""
+        deadline = time.time() + timeout
+        while True:
+            job = self.get_job(job_id)
+            if job.get('status') == 'done':
+                return job.get('result')
+            if job.get('status') == 'failed':
+                raise Exception(job.get('error') or 'Upload processing failed')
+            if time.time() > deadline:
+                raise Exception(f"Timed out waiting for job {job_id} ({job.get('stage')})")
+            time.sleep(poll_interval)
+
+    def list_datasets(self, search=None, page_size=20, cursor=None):
+        """
+        One page of the catalog, newest first: {'next', 'previous', 'results'}.
+        search matches filename or uploader on the server; pass a response's
+        'next' cursor back as cursor for the following page.
+        """
+        url = '/api/datasets/'
+        params = {k: v for k, v in (('search', search), ('page_size', page_size), ('cursor', cursor)) if v}
+        r = self._request('GET', url, params=params)
         if r.status_code == 200:
             return r.json()
         raise Exception(r.text)
 
+    def get_summary(self, dataset_id: str):
+        return self._get_json(f'/api/datasets/{dataset_id}/summary/')
+
+    @staticmethod
+    def _table_params(page, page_size, cursor, filters):
+        params = {'page_size': page_size, **filters}
+        if cursor is None:
+            params['page'] = page
+        else:
+            params['cursor'] = cursor
+        return params
+
+    def get_table(self, dataset_id: str, page=1, page_size=200, cursor=None, **filters):
+        """
+        Fetch a page of rows. Pass cursor='' (then each response's next_cursor) for
+        keyset paging; filters are forwarded as query params, e.g. type='Pump',
+        flowrate__gte=10, name__contains='pump'.
+        """
+        url = f'/api/datasets/{dataset_id}/table/'
+        return self._get_json(url, params=self._table_params(page, page_size, cursor, filters), timeout=30)
+
+    def get_table_frame(self, dataset_id: str, page=1, page_size=200, cursor=None, **filters):
+        """
+        Same page as get_table, as a DataFrame decoded from an Arrow stream (missing
+        readings are NaN). total, page / next_cursor and page_size are in df.attrs.
+        """
+        url = f'/api/datasets/{dataset_id}/table/'
+        params = self._table_params(page, page_size, cursor, filters)
+        table = self._get_cached(url, params, accept=ARROW_STREAM, decode=lambda body: pa.ipc.open_stream(body).read_all(),
+                                 timeout=60)
+        df = table.to_pandas()
+        df.attrs = {k.decode(): json.loads(v) for k, v in (table.schema.metadata or {}).items()}
+        return df
+
+    def get_histogram(self, dataset_id: str, col: str, bins=10, value_range=None):
+        """Histogram of a numeric column over the whole dataset; value_range is an optional (low, high)."""
+        url = f'/api/datasets/{dataset_id}/histogram/'
+        params = {'col': col, 'bins': bins}
+        if value_range is not None:
+            params['range'] = f'{value_range[0]},{value_range[1]}'
+        return self._get_json(url, params=params, timeout=30)
+
+    def get_quantiles(self, dataset_id: str, col: str, qs=(0.25, 0.5, 0.75)):
+        url = f'/api/datasets/{dataset_id}/quantiles/'
+        return self._get_json(url, params={'col': col, 'q': ','.join(str(q) for q in qs)}, timeout=30)
+
+    def _download(self, path, dest_path, what, attempts=3):
+        """
+        Stream a file endpoint to dest_path, resuming with Range (guarded by If-Range)
+        after a dropped connection. The partial file and its validator are kept as
+        dest_path + '.part' / '.part.json' until done, so a later call resumes too.
+        Bytes are saved as sent; a gzip Content-Encoding is inflated at the end.
+        """
+        part, state_path = dest_path + '.part', dest_path + '.part.json'
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+
+        for attempt in range(attempts):
+            offset = os.path.getsize(part) if state.get('etag') and os.path.exists(part) else 0
+            headers = {'Range': f'bytes={offset}-', 'If-Range': state['etag']} if offset else {}
+            try:
+                with self._request('GET', path, headers=headers, stream=True, timeout=60) as r:
+                    if r.status_code == 416 and offset:
+                        if r.headers.get('Content-Range') == f'bytes */{offset}':
+                            break  # everything arrived last time; only the final step was missed
+                        state = {}
+                        continue
+                    if r.status_code not in (200, 206):
+                        raise Exception(f"Failed to download {what} (HTTP {r.status_code}): {r.text[:200]}")
+                    if r.status_code == 200 or not r.headers.get('Content-Range', '').startswith(f'bytes {offset}-'):
+                        # fresh copy: the file changed since the partial download, or there was none
+                        offset = 0
+                        state = {'etag': r.headers.get('ETag'), 'encoding': r.headers.get('Content-Encoding', '')}
+                        with open(state_path, 'w') as f:
+                            json.dump(state, f)
+                    with open(part, 'ab' if offset else 'wb') as f:
+                        for chunk in r.raw.stream(1024 * 64, decode_content=False):
+                            f.write(chunk)
+                break
+            except (requests.RequestException, urllib3.exceptions.HTTPError):
+                if attempt == attempts - 1:
+                    raise
+
+        if state.get('encoding') == 'gzip':
+            with gzip.open(part, 'rb') as src, open(dest_path, 'wb') as out:
+                shutil.copyfileobj(src, out, 1024 * 1024)
+            os.remove(part)
+        else:
+            os.replace(part, dest_path)
+        os.remove(state_path)
+        return dest_path
+
     def download_report(self, dataset_id: str, dest_path: str):
-        url = f'/api/datasets/{dataset_id}/report/'
-        r = self._request('GET', url, stream=True)
-        if r.status_code == 200:
-            with open(dest_path, 'wb') as f:
-                for chunk in r.iter_content(1024 * 32):
-                    f.write(chunk)
-            return dest_path
-        
-        err_msg = r.text[:200]
-        raise Exception(f"Failed to download report (HTTP {r.status_code}): {err_msg}")
+        return self._download(f'/api/datasets/{dataset_id}/report/', dest_path, 'report')
 
     def download_clean_csv(self, dataset_id: str, dest_path: str):
-        url = f'/api/datasets/{dataset_id}/download_clean/'
-        r = self._request('GET', url, stream=True)
-        if r.status_code == 200:
-            with open(dest_path, 'wb') as f:
-                for chunk in r.iter_content(1024 * 32):
-                    f.write(chunk)
-            return dest_path
-        
-        err_msg = r.text[:200]
-        raise Exception(f"Failed to download data (HTTP {r.status_code}): {err_msg}")
+        return self._download(f'/api/datasets/{dataset_id}/download_clean/', dest_path, 'data')
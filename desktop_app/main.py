@@ -6,10 +6,11 @@ import json
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
     QPushButton, QFileDialog, QListWidget, QListWidgetItem, QMessageBox, QStackedWidget,
-    QTableWidget, QTableWidgetItem, QDialog, QProgressBar, QTextEdit,
+    QTableView, QDialog, QProgressBar, QTextEdit,
     QTabWidget, QTabBar, QScrollArea, QFrame, QSplitter
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer, QAbstractTableModel, QModelIndex
+from PyQt5.QtGui import QBrush
 
 # Matplotlib Qt5 backend
 import matplotlib
@@ -22,6 +23,9 @@ import numpy as np
 import seaborn as sns
 from api_client import ApiClient
 
+# Rows fetched per page as the dataset dialog's data explorer scrolls
+TABLE_PAGE_ROWS = 1000
+
 # Logging
 _log_path = os.path.join(os.path.dirname(__file__), 'desktop_app_run.log')
 def _log(msg: str):
@@ -182,7 +186,7 @@ QListWidget::item:selected {
     border: 1px solid #2d3748;
 }
 
-QTableWidget {
+QTableView {
     background-color: #161e2e;
     border: 1px solid #2d3748;
     gridline-color: #2d3748;
@@ -489,6 +493,91 @@ class UploadWidget(QWidget):
             self.progress.setVisible(False)
 
 
+# =============================
+# Table model
+# =============================
+class DataFrameModel(QAbstractTableModel):
+    """Read-only view over a DataFrame; cells are formatted only when Qt paints them."""
+
+    def __init__(self, df=None):
+        super().__init__()
+        self._df = df if df is not None else pd.DataFrame()
+        self._columns = [np.asarray(self._df[c]) for c in self._df.columns]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._df)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._df.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            value = self._columns[index.column()][index.row()]
+            return "" if pd.isna(value) else str(value)
+        if role == Qt.ForegroundRole:
+            return QBrush(Qt.white)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return str(self._df.columns[section])
+        return str(section + 1)
+
+
+class PagedTableModel(DataFrameModel):
+    """
+    A dataset's rows, fetched one keyset (cursor) page at a time: Qt calls
+    fetchMore as the view scrolls near the last loaded row.
+    """
+
+    def __init__(self, client, dataset_id, page_size=TABLE_PAGE_ROWS):
+        super().__init__()
+        self._client = client
+        self._dataset_id = dataset_id
+        self._page_size = page_size
+        self._cursor = ''
+        # the first page is fetched here so load errors reach the caller
+        self._append(self._next_page())
+
+    def _next_page(self):
+        page = self._client.get_table_frame(self._dataset_id, page_size=self._page_size, cursor=self._cursor)
+        self._cursor = page.attrs.get('next_cursor')
+        page.attrs = {}
+        return page
+
+    def _append(self, page):
+        first = self._df.empty
+        if first:
+            # the columns arrive with the first page
+            self.beginResetModel()
+            self._df = page
+        else:
+            self.beginInsertRows(QModelIndex(), len(self._df), len(self._df) + len(page) - 1)
+            self._df = pd.concat([self._df, page], ignore_index=True)
+        self._columns = [np.asarray(self._df[c]) for c in self._df.columns]
+        if first:
+            self.endResetModel()
+        else:
+            self.endInsertRows()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._cursor is not None
+
+    def fetchMore(self, parent=QModelIndex()):
+        try:
+            page = self._next_page()
+        except Exception as e:
+            # an exception escaping a Qt override would abort the app; the next scroll retries
+            _log(f"Table page fetch failed: {e}")
+            return
+        if len(page):
+            self._append(page)
+
+
 # =============================
 # Dataset Dialog
 # =============================
@@ -604,9 +693,10 @@ class DatasetDialog(QDialog):
         table_top.addStretch()
         data_layout.addLayout(table_top)
         
-        self.table = QTableWidget()
+        self.table = QTableView()
+        self.table.setModel(DataFrameModel())
         self.table.setAlternatingRowColors(True)
-        self.table.setStyleSheet("QTableWidget { background-color: #161e2e; }")
+        self.table.setStyleSheet("QTableView { background-color: #161e2e; }")
         self.table.horizontalHeader().setStretchLastSection(True)
         data_layout.addWidget(self.table)
         
@@ -700,26 +790,19 @@ class DatasetDialog(QDialog):
                     spine.set_color('#2d3748')
 
                 hk = hist.get(key, {})
-                if isinstance(hk, dict) and hk.get("counts"):
-                    bins = hk.get("bins", [])
-                    counts = hk.get("counts", [])
-                    if bins and counts:
-                        lefts = bins[:-1]
-                        widths = [bins[j+1] - bins[j] for j in range(len(bins) - 1)]
-                        ax.bar(lefts, counts, width=widths, align="edge", color=accent_color, alpha=0.8)
-                        ax.set_title(key.title(), color=text_color, fontsize=10, fontweight='bold')
-                else:
-                    t = self.client.get_table(self.dataset["id"]) or {}
-                    rows = t.get("rows", [])
-                    vals = []
-                    for r in rows:
-                        try:
-                            vals.append(float(r.get(key) or r.get(key.title()) or 0))
-                        except Exception:
-                            pass
-                    if vals:
-                        ax.hist(vals, bins=12, color=accent_color, alpha=0.8)
-                        ax.set_title(key.title(), color=text_color, fontsize=10, fontweight='bold')
+                if not (isinstance(hk, dict) and hk.get("counts")):
+                    # Older analytics lack stored bins; the server bins the full column on demand
+                    try:
+                        hk = self.client.get_histogram(self.dataset["id"], key, bins=12) or {}
+                    except Exception:
+                        hk = {}
+                bins = hk.get("bins", [])
+                counts = hk.get("counts", [])
+                if bins and counts:
+                    lefts = bins[:-1]
+                    widths = [bins[j+1] - bins[j] for j in range(len(bins) - 1)]
+                    ax.bar(lefts, counts, width=widths, align="edge", color=accent_color, alpha=0.8)
+                    ax.set_title(key.title(), color=text_color, fontsize=10, fontweight='bold')
 
             # correlation heatmap
             ax_heat.clear()
@@ -784,22 +867,8 @@ class DatasetDialog(QDialog):
                     card_v.addWidget(row)
                 self.ins_v.addWidget(card)
 
-            # Fill table
-            tb = self.client.get_table(self.dataset["id"]) or {}
-            rows = tb.get("rows", [])
-            cols = list(rows[0].keys()) if rows else []
-
-            self.table.clear()
-            self.table.setColumnCount(len(cols))
-            self.table.setRowCount(len(rows))
-            if cols:
-                self.table.setHorizontalHeaderLabels(cols)
-
-            for i, r in enumerate(rows):
-                for j, c in enumerate(cols):
-                    item = QTableWidgetItem(str(r.get(c, "")))
-                    item.setForeground(Qt.white)
-                    self.table.setItem(i, j, item)
+            # Fill table: Arrow pages fetched as the view scrolls, shown through a model instead of an item per cell
+            self.table.setModel(PagedTableModel(self.client, self.dataset["id"]))
 
         except Exception as e:
             QMessageBox.warning(self, "Load Error", str(e))
@@ -845,6 +914,7 @@ class DashboardWidget(QWidget):
         super().__init__()
         self.client = client
         self.open_fn = open_fn
+        self._current_items = []
 
         layout = QVBoxLayout(self)
         layout.setContentsMargins(40, 30, 40, 30)
@@ -887,6 +957,11 @@ class DashboardWidget(QWidget):
         self.search_input.setPlaceholderText("Search datasets by name...")
         self.search_input.setStyleSheet("background: transparent; border: none; padding: 0;")
         self.search_input.textChanged.connect(self.on_search)
+        # Search runs on the server; wait for a pause in typing before asking
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(250)
+        self._search_timer.timeout.connect(self.load)
         search_layout.addWidget(self.search_input)
         
         layout.addWidget(search_container)
@@ -902,25 +977,14 @@ class DashboardWidget(QWidget):
 
     def load(self):
         try:
-            resp = self.client.list_datasets()
+            resp = self.client.list_datasets(search=self.search_input.text().strip() or None)
             data = resp.get("results") if isinstance(resp, dict) else resp
-            self._all_items = data or []
-            self.apply_filter()
+            self.display_data(data or [])
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
 
     def on_search(self):
-        self.apply_filter()
-
-    def apply_filter(self):
-        query = self.search_input.text().lower().strip()
-        filtered = []
-        for d in self._all_items:
-            name = (d.get('filename') or d.get('id') or "").lower()
-            if query in name:
-                filtered.append(d)
-        
-        self.display_data(filtered)
+        self._search_timer.start()
 
     def display_data(self, data):
         self._current_items = data
@@ -1051,7 +1115,7 @@ class MainWindow(QWidget):
     def on_uploaded(self, ds_id):
         self.dashboard_widget.load()
         if ds_id:
-            for d in self.dashboard_widget._all_items:
+            for d in self.dashboard_widget._current_items:
                 if str(d.get("id")) == str(ds_id):
                     self.open_dataset(d)
                     break
@@ -25,6 +25,35 @@ api.interceptors.request.use(config => {
   return config
 })
 
+// Dataset reads carry ETags: resend the last one and reuse the cached body on 304,
+// so reopening a dashboard costs a header round-trip
+const etagCache = new Map()
+const MAX_ETAG_ENTRIES = 200
+
+api.interceptors.request.use(config => {
+  if ((config.method || 'get').toLowerCase() !== 'get' || config.responseType === 'blob') return config
+  const cached = etagCache.get(api.getUri(config))
+  if (cached) {
+    config.headers['If-None-Match'] = cached.etag
+    config.validateStatus = status => (status >= 200 && status < 300) || status === 304
+  }
+  return config
+})
+
+api.interceptors.response.use(res => {
+  const key = api.getUri(res.config)
+  if (res.status === 304) {
+    const cached = etagCache.get(key)
+    return cached ? { ...res, status: 200, data: cached.data } : res
+  }
+  const etag = res.headers && res.headers.etag
+  if (etag && (res.config.method || 'get').toLowerCase() === 'get' && res.config.responseType !== 'blob') {
+    if (etagCache.size >= MAX_ETAG_ENTRIES) etagCache.delete(etagCache.keys().next().value)
+    etagCache.set(key, { etag, data: res.data })
+  }
+  return res
+})
+
 api.interceptors.response.use(
   res => res,
   err => {
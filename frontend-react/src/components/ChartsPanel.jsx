@@ -20,7 +20,7 @@ ChartJS.register(CategoryScale, LinearScale, BarElement, PointElement, LineEleme
 export default function ChartsPanel({ dataset }) {
   const [summary, setSummary] = useState(null)
   const [renderError, setRenderError] = useState(null)
-  const [scatterRows, setScatterRows] = useState([])
+  const [scatterPoints, setScatterPoints] = useState([])
 
   useEffect(() => {
     if (!dataset) return
@@ -29,9 +29,10 @@ export default function ChartsPanel({ dataset }) {
 
   useEffect(() => {
     if (!dataset) return
-    api.get(`/api/datasets/${dataset.id}/table/?page=1&page_size=200`)
-      .then(r => setScatterRows(r.data.rows || []))
-      .catch(() => setScatterRows([]))
+    // Sampled server-side over the whole dataset, extremes and sparse regions included
+    api.get(`/api/datasets/${dataset.id}/scatter/?x=temperature&y=flowrate&max_points=2000`)
+      .then(r => setScatterPoints((r.data.points || []).map(([x, y]) => ({ x, y }))))
+      .catch(() => setScatterPoints([]))
   }, [dataset])
 
   async function fetchSummary() {
@@ -70,11 +71,6 @@ export default function ChartsPanel({ dataset }) {
   }
 
   // 3. Scatter (Flow vs Temp)
-  const scatterPoints = (scatterRows && scatterRows.length > 0)
-    ? scatterRows.map(r => ({ x: parseFloat(r.temperature), y: parseFloat(r.flowrate) }))
-      .filter(p => Number.isFinite(p.x) && Number.isFinite(p.y))
-    : []
-
   const scatterData = {
     datasets: [{
       label: 'Flowrate vs Temperature',
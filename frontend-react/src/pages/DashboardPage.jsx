@@ -15,12 +15,16 @@ export default function DashboardPage() {
   const [showModal, setShowModal] = useState(false)
   const [activeTab, setActiveTab] = useState('datasets') // 'datasets' or 'analytics'
   const [analyticsDatasetId, setAnalyticsDatasetId] = useState('')
+  const [search, setSearch] = useState('')
+  const [nextPage, setNextPage] = useState(null)
   // Sidebar collapsed state (icons only)
   const [sidebarCollapsed, setSidebarCollapsed] = useState(false)
 
   useEffect(() => {
-    fetchDatasets()
-  }, [])
+    // searched on the server; wait for a pause in typing
+    const timer = setTimeout(() => fetchDatasets(), search ? 250 : 0)
+    return () => clearTimeout(timer)
+  }, [search])
 
   useEffect(() => {
     if (datasets.length > 0 && !analyticsDatasetId) {
@@ -28,12 +32,17 @@ export default function DashboardPage() {
     }
   }, [datasets, analyticsDatasetId])
 
-  async function fetchDatasets() {
+  async function fetchDatasets(more = false) {
     try {
-      const resp = await api.get('/api/datasets/')
+      // `next` is a keyset cursor URL for the following page of the catalog
+      const resp = more
+        ? await api.get(nextPage)
+        : await api.get('/api/datasets/', { params: search ? { page_size: 20, search } : { page_size: 20 } })
       const data = resp.data && resp.data.results ? resp.data.results : resp.data
-      const arr = Array.isArray(data) ? data : []
+      const page = Array.isArray(data) ? data : []
+      const arr = more ? [...datasets, ...page] : page
       setDatasets(arr)
+      setNextPage(resp.data && resp.data.next ? resp.data.next : null)
 
       const last = localStorage.getItem('last_uploaded_id')
       if (last) {
@@ -118,10 +127,25 @@ export default function DashboardPage() {
                   </Button>
                 </div>
 
+                <input
+                  className="dataset-search"
+                  type="search"
+                  placeholder="Search by filename or uploader..."
+                  value={search}
+                  onChange={(e) => setSearch(e.target.value)}
+                  style={{ width: '100%', marginBottom: '1rem' }}
+                />
+
                 <DatasetList
                   datasets={datasets}
                   onSelect={(d) => { setSelected(d); setShowModal(true) }}
                 />
+
+                {nextPage && (
+                  <div className="text-center" style={{ marginTop: '1rem' }}>
+                    <Button variant="secondary" onClick={() => fetchDatasets(true)}>Load more</Button>
+                  </div>
+                )}
               </Card>
             </>
           ) : (